@@ -8,9 +8,20 @@ import configparser
 import select
 import os
 import sys
+import queue
 import psutil
 from datetime import datetime
 
+from control_protocol import CONTROL_PORT, send_request
+
+# The log view keeps at most this many lines; the oldest are trimmed first
+MAX_LOG_LINES = 2000
+# How often the Tk main loop moves queued log lines into the widget, and how many per pass
+LOG_DRAIN_INTERVAL_MS = 100
+LOG_DRAIN_BATCH = 500
+# Lines waiting for the main loop; beyond this worker threads drop lines instead of waiting
+LOG_QUEUE_SIZE = 10000
+
 
 def resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
@@ -129,8 +140,22 @@ class SerialToUDPApp:
         self.ip_list = {k: v for k, v in self.config.items('IP_List')}
         self.connections = [section for section in self.config.sections() if section.startswith('Connection')]
         self.threads = []
+        # Set while no bridge is running; start_bridge() replaces it with a fresh one
+        self.stop_event = threading.Event()
+        self.stop_event.set()
+
+        # Worker threads never touch the Text widget - they queue lines and the main loop drains them
+        self.log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        self.log_dropped = 0
+        self.log_paused = tk.BooleanVar(value=False)
+        self.log_errors_only = tk.BooleanVar(value=False)
+        # Plain copy of the two checkboxes for worker threads, which must not read Tk variables
+        self.log_filtered = False
+        self.log_paused.trace_add('write', self.update_log_filter)
+        self.log_errors_only.trace_add('write', self.update_log_filter)
 
         self.create_main_gui()
+        self.master.after(LOG_DRAIN_INTERVAL_MS, self.drain_log_queue)
 
         # Add error listener for port 7000
         self.error_listener_thread = threading.Thread(target=self.error_listener)
@@ -180,9 +205,14 @@ class SerialToUDPApp:
         self.stop_button = ttk.Button(self.frame, text="Stop Bridge", command=self.stop_bridge, state=tk.DISABLED)
         self.stop_button.grid(row=4 + len(self.connections), column=1, pady=10)
 
-        # Clear log button
+        # Clear log button and log view modes
         self.clear_log_button = ttk.Button(self.frame, text="Clear Log", command=self.clear_log)
-        self.clear_log_button.grid(row=5 + len(self.connections), column=0, columnspan=2, pady=10)
+        self.clear_log_button.grid(row=5 + len(self.connections), column=0, pady=10)
+
+        log_mode_frame = ttk.Frame(self.frame)
+        log_mode_frame.grid(row=5 + len(self.connections), column=1, pady=10)
+        ttk.Checkbutton(log_mode_frame, text="Pause", variable=self.log_paused).pack(side='left', padx=5)
+        ttk.Checkbutton(log_mode_frame, text="Only errors", variable=self.log_errors_only).pack(side='left', padx=5)
 
         # Status label
         self.status_label = ttk.Label(self.frame, text="Status: Not running")
@@ -265,7 +295,7 @@ class SerialToUDPApp:
             self.stop_button.config(state=tk.NORMAL)
             self.send_start_packet()
         except Exception as e:
-            self.log(f"Error in start_bridge: {e}")
+            self.log(f"Error in start_bridge: {e}", 'error')
             self.status_label.config(text="Status: Not running")
             self.start_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
@@ -282,7 +312,7 @@ class SerialToUDPApp:
             self.start_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
         except Exception as e:
-            self.log(f"Error in stop_bridge: {e}")
+            self.log(f"Error in stop_bridge: {e}", 'error')
 
     def start_connection(self, connection):
         """Start the connection for a specific serial port and corresponding UDP ports."""
@@ -358,7 +388,7 @@ class SerialToUDPApp:
                     self.log(f"Sent: {data}")
                 time.sleep(self.interval)
         except Exception as e:
-            self.log(f"Error in read_and_send_serial_data: {e}")
+            self.log(f"Error in read_and_send_serial_data: {e}", 'error')
         finally:
             udp_socket.close()
             serial_conn.close()
@@ -374,7 +404,7 @@ class SerialToUDPApp:
                         serial_conn.write(data)
                         self.log(f"Received from {addr}: {data}")
         except Exception as e:
-            self.log(f"Error in listen_and_forward_udp_data: {e}")
+            self.log(f"Error in listen_and_forward_udp_data: {e}", 'error')
         finally:
             listen_socket.close()
 
@@ -392,10 +422,8 @@ class SerialToUDPApp:
                     if data:
                         message = data.decode()
                         self.log(f"received from {addr}: {message}", level='error')
-                        self.stop_bridge()
-                        self.status_label.config(text="Status: Not running")
-                        self.start_button.config(state=tk.NORMAL)
-                        self.stop_button.config(state=tk.DISABLED)
+                        # Runs on its own thread; stopping touches widgets, so it happens on the Tk loop
+                        self.master.after(0, self.target_stopped, self.stop_event)
         except Exception as e:
             self.log(f"Error in error_listener: {e}", 'error')
         finally:
@@ -410,41 +438,114 @@ class SerialToUDPApp:
                     if addr.family == socket.AF_INET:
                         return addr.address
 
-        self.log("Failed to send packet: No 'enp' interface with IPv4 address found.")
+        self.log("Failed to send packet: No 'enp' interface with IPv4 address found.", 'error')
         return None
 
     def send_start_packet(self):
-        """Send a start packet to the target IP."""
+        """Ask the target to start streaming to us; the acknowledgement is awaited off the Tk main loop."""
         ip_address = self.get_ipv4_address()
         if ip_address is None:
             return  # Do not send packet if IP address is not found
 
-        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        start_packet = f"{ip_address} start".encode()
-        udp_socket.sendto(start_packet, (self.target_ip, 7000))  # Hard coded default port
-        udp_socket.close()
-        self.log(f"Sent start packet to {self.target_ip}:7000")
+        threading.Thread(target=self.confirm_start, args=(ip_address,), daemon=True).start()
+
+    def confirm_start(self, ip_address):
+        """Runs on a background thread; widgets are only updated through master.after."""
+        stop_event = self.stop_event
+        confirmed = self.send_control_request('start', ip_address)
+        try:
+            self.master.after(0, self.start_confirmed if confirmed else self.start_rejected, stop_event)
+        except (RuntimeError, tk.TclError):
+            pass  # The window was closed while waiting
+
+    def start_confirmed(self, stop_event):
+        if not stop_event.is_set():
+            self.status_label.config(text="Status: Running (confirmed by target)")
+
+    def start_rejected(self, stop_event):
+        # Same as an error packet from the target: do not leave the local side running on its own
+        if not stop_event.is_set():
+            self.stop_bridge()
+
+    def target_stopped(self, stop_event):
+        # A bridge this side already stopped (e.g. the INFO sent when app_cli.py exits) needs no second stop
+        if not stop_event.is_set():
+            self.stop_bridge()
 
     def send_stop_packet(self):
-        """Send a stop packet to the target IP."""
+        """Send a stop request to the target IP; the acknowledgement is awaited off the Tk main loop.
+
+        The thread is not a daemon, so a stop sent while the window closes is still retransmitted
+        until the target answers.
+        """
         ip_address = self.get_ipv4_address()
         if ip_address is None:
             return  # Do not send packet if IP address is not found
 
-        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        stop_packet = f"{ip_address} stop".encode()
-        udp_socket.sendto(stop_packet, (self.target_ip, 7000))  # Hard coded default port
-        udp_socket.close()
-        self.log(f"Sent stop packet to {self.target_ip}:7000")
+        threading.Thread(target=self.send_control_request, args=('stop', ip_address)).start()
+
+    def send_control_request(self, command, ip_address):
+        """Send a control request to the target's packet listener, retransmitting until it is acknowledged."""
+        try:
+            ok, detail, rtt = send_request((self.target_ip, CONTROL_PORT), command, ip_address)
+        except (OSError, TimeoutError) as e:
+            self.log(f"No acknowledgement for {command} from {self.target_ip}:{CONTROL_PORT}: {e}", 'error')
+            return False
+        if not ok:
+            self.log(f"Target {self.target_ip} rejected {command}: {detail}", 'error')
+            return False
+        self.log(f"Target {self.target_ip} confirmed {command} in {rtt * 1000:.1f} ms: {detail}")
+        return True
 
     def log(self, message, level='info'):
-        """Log messages with timestamps."""
+        """Queue a timestamped log line. Safe to call from any thread."""
+        if level != 'error' and self.log_filtered:
+            return
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"{timestamp} - {message}"
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, log_message + "\n", level)
-        self.log_text.config(state=tk.DISABLED)
-        self.log_text.see(tk.END)
+        try:
+            self.log_queue.put_nowait((f"{timestamp} - {message}\n", level))
+        except queue.Full:
+            self.log_dropped += 1
+
+    def update_log_filter(self, *args):
+        """trace_add callback of the Pause and Only errors checkboxes. Runs on the Tk main loop."""
+        self.log_filtered = self.log_paused.get() or self.log_errors_only.get()
+
+    def drain_log_queue(self):
+        """Move queued log lines into the text widget in one batch. Runs on the Tk main loop."""
+        lines = []
+        try:
+            for _ in range(LOG_DRAIN_BATCH):
+                lines.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if self.log_dropped:
+            dropped, self.log_dropped = self.log_dropped, 0
+            lines.append((f"... {dropped} log lines dropped\n", 'error'))
+        if self.log_filtered:
+            lines = [line for line in lines if line[1] == 'error']
+
+        if lines:
+            self.log_text.config(state=tk.NORMAL)
+            # One insert per run of lines with the same tag instead of one per line
+            text, level = lines[0]
+            chunk = [text]
+            for text, next_level in lines[1:]:
+                if next_level != level:
+                    self.log_text.insert(tk.END, ''.join(chunk), level)
+                    chunk, level = [], next_level
+                chunk.append(text)
+            self.log_text.insert(tk.END, ''.join(chunk), level)
+
+            line_count = int(self.log_text.index('end-1c').split('.')[0])
+            if line_count > MAX_LOG_LINES:
+                self.log_text.delete('1.0', f"{line_count - MAX_LOG_LINES + 1}.0")
+            self.log_text.config(state=tk.DISABLED)
+            if not self.log_paused.get():
+                self.log_text.see(tk.END)
+
+        self.master.after(LOG_DRAIN_INTERVAL_MS, self.drain_log_queue)
 
     def clear_log(self):
         """Clear the log text area."""
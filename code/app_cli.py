@@ -1,5 +1,8 @@
 import argparse
+import asyncio
 import configparser
+import ipaddress
+import struct
 import threading
 import serial
 import socket
@@ -9,6 +12,30 @@ import sys
 import os
 import logging
 import signal
+from functools import partial
+
+from config_reload import ConfigReloader, diff_connections
+from control_api import DEFAULT_SOCKET, BridgeDaemon, CommandQueue, ControlServer
+from device_registry import USB_PORT_PREFIX, devices, identity
+from envelope import create_envelope_batcher, create_envelope_decoder, envelope_overhead
+from framing import MAX_DATAGRAM_SIZE, create_framer
+from log_pipeline import PayloadLogger, payload_logging, start_log_pipeline
+from metrics import StatsReporter, parse_target, registry, start_metrics_server
+from recorder import SERIAL_TO_UDP, UDP_TO_SERIAL, create_recorder
+from replay import PtySink, UdpSink, open_source, replay
+from ring_buffer import RingBuffer
+from sequencing import create_sequence_batcher, create_sequence_receiver, sequence_overhead
+from serial_link import OFFLINE_DROP, create_serial_link
+from serial_writer import BLOCK, DROP_OLDEST, create_pacer, create_write_queue, serial_bytes_per_second
+from udp_batch import DatagramBatcher, DatagramReceiver, FanOutBatcher, fan_out_of
+from worker_pool import WorkerPool, group_connections, parse_workers
+
+# Serial receive ring per connection when no buffer_size is configured
+RING_SIZE = 65536
+# A coalescing window ends early once the port has been silent for this many character times (at least
+# COALESCE_MIN_GAP seconds), so a burst that has finished is sent without waiting out the whole interval
+COALESCE_IDLE_CHARS = 4
+COALESCE_MIN_GAP = 0.0005
 
 # Setup logging
 logger = logging.getLogger()
@@ -25,6 +52,9 @@ file_handler = logging.FileHandler('serial_udp_bridge.log')
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
+# Console and file I/O happen on a QueueListener thread; forwarding threads only enqueue records
+queue_handler, log_listener = start_log_pipeline(logger, [console_handler, file_handler])
+
 def resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
     try:
@@ -38,110 +68,510 @@ def resource_path(relative_path):
 
     return path
 
+def drain_ring(ring, framer, batcher, payload_log=None, arrived_at=None, recorder=None):
+    """Hand everything buffered in the ring to the framer and batcher, then release it.
+
+    Pass-through framing sends memoryview slices of the ring directly, so the payload is never
+    copied into an intermediate bytes object on its way to the socket.
+    """
+    max_frame_size = framer.max_frame_size
+    while len(ring):
+        chunk = ring.readable()
+        if framer.passthrough:
+            frames = [chunk[start:start + max_frame_size] for start in range(0, len(chunk), max_frame_size)]
+        else:
+            frames = framer.feed(chunk)
+        try:
+            send_frames(frames, batcher, payload_log, arrived_at, recorder)
+        finally:
+            # Released even when a send fails, so the frames before the failure are never sent twice
+            ring.consume(len(chunk))
+
+
+def send_frames(frames, batcher, payload_log=None, arrived_at=None, recorder=None):
+    for frame in frames:
+        batcher.send(frame, arrived_at)
+        if payload_log is not None:
+            payload_log.log("Sent", frame)
+        if recorder is not None:
+            recorder.record(SERIAL_TO_UDP, frame)
+
+
+def frame_budget(connection):
+    """Largest frame that still fits one datagram once the connection's envelope and link headers are added."""
+    return MAX_DATAGRAM_SIZE - sequence_overhead(connection) - envelope_overhead(connection)
+
+
+def create_batcher(connection, udp_sockets, destinations, metrics=None):
+    """Connect one egress socket per destination and wrap them in a batcher.
+
+    Destinations fan out, and can be changed later through fan_out_of(batcher).retarget(); with `aggregate` on,
+    frames are packed into envelopes once, before the fan-out. With `sequence` on, each datagram (envelope) gets
+    a link header, so every destination sees the same numbering.
+    """
+    batchers = [destination_batcher(connection, udp_socket, destination, metrics)
+                for udp_socket, destination in zip(udp_sockets, destinations)]
+    batcher = FanOutBatcher(batchers, destinations[:len(batchers)])
+    return create_envelope_batcher(connection, create_sequence_batcher(connection, batcher),
+                                   MAX_DATAGRAM_SIZE - sequence_overhead(connection))
+
+
+def destination_batcher(connection, udp_socket, destination, metrics=None):
+    """Connect an egress socket to one destination and wrap it in a DatagramBatcher."""
+    configure_egress_socket(udp_socket, destination, connection)
+    udp_socket.connect(destination)
+    return DatagramBatcher(udp_socket,
+                           max_batch=connection.get('batch_size', 1),
+                           max_delay=connection.get('batch_delay_ms', 2.0) / 1000.0,
+                           metrics=metrics)
+
+
+def open_destination(connection, metrics, blocking, destination):
+    """New egress socket and batcher for a destination added to a running connection."""
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        udp_socket.setblocking(blocking)
+        return destination_batcher(connection, udp_socket, destination, metrics)
+    except Exception:
+        udp_socket.close()
+        raise
+
+
+def is_multicast(host):
+    try:
+        return ipaddress.ip_address(host).is_multicast
+    except ValueError:
+        # Host names are never multicast groups
+        return False
+
+
+def multicast_request(group, interface):
+    """struct ip_mreqn for IP_ADD_MEMBERSHIP / IP_MULTICAST_IF.
+
+    `interface` is an IPv4 address or an interface name such as eth0; empty lets the kernel choose.
+    """
+    address = bytes(4)
+    index = 0
+    if interface:
+        try:
+            address = socket.inet_aton(interface)
+        except OSError:
+            index = socket.if_nametoindex(interface)
+    return struct.pack('4s4si', socket.inet_aton(group) if group else bytes(4), address, index)
+
+
+def configure_egress_socket(udp_socket, destination, connection):
+    """Set the options a multicast group or broadcast destination needs before the socket is connected."""
+    if is_multicast(destination[0]):
+        udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, connection.get('multicast_ttl', 1))
+        udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP,
+                              int(connection.get('multicast_loop', True)))
+        if connection.get('multicast_interface'):
+            udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                  multicast_request(None, connection['multicast_interface']))
+    elif connection.get('broadcast') or destination[0] == '255.255.255.255':
+        udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+
+def parse_destinations(value):
+    """'10.0.0.1:5001, 10.0.0.2:5001' -> [('10.0.0.1', 5001), ('10.0.0.2', 5001)]."""
+    destinations = []
+    for item in value.split(','):
+        host, _, port = item.strip().rpartition(':')
+        destinations.append((host, int(port)))
+    return destinations
+
+
+def create_payload_logger(connection):
+    return PayloadLogger(connection['name'], rate=connection.get('payload_log_rate', 10.0),
+                         sample=connection.get('payload_log_sample', 1))
+
+
+def coalesce_gap(connection, interval):
+    """Silence in seconds that ends a connection's coalescing window, never longer than the window itself."""
+    character_time = 1.0 / serial_bytes_per_second(connection.get('baud_rate', 9600), connection.get('data_bits', 8),
+                                                   connection.get('parity', 'None'), connection.get('stop_bits', 1))
+    return min(interval, max(COALESCE_IDLE_CHARS * character_time, COALESCE_MIN_GAP))
+
+
+def min_timeout(*timeouts):
+    """Smallest of several select() timeouts, where None means 'no deadline'."""
+    pending = [timeout for timeout in timeouts if timeout is not None]
+    return min(pending) if pending else None
+
+
+class ConnectionState:
+    """Runtime state of one [ConnectionN] section: its threads and a stop signal that wakes them."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.name = connection['name']
+        self.threads = []
+        self.framer = create_framer(connection, frame_budget(connection))
+        buffer_size = connection.get('buffer_size', 'default')
+        self.ring = RingBuffer(RING_SIZE if buffer_size == 'default' else int(buffer_size))
+        self.payload_log = create_payload_logger(connection)
+        self.batcher = None
+        self.receivers = []
+        self.link = None
+        # Created with the threads, once the connection's ports are open
+        self.recorder = None
+        self.write_queue = create_write_queue(connection)
+        self.metrics = registry.connection(self.name)
+        self.metrics.track_write_queue(self.write_queue)
+        self.metrics.register('restarts', lambda: self.restarts, 'gauge', 'Supervisor restarts of the connection')
+        self.stop_event = threading.Event()
+        # Self-pipe used to wake threads blocked in select() when the connection stops
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        self.closed = False
+        self.restarts = 0
+        self.restart_delay = 0.0
+        self.next_restart = None
+
+    def stop(self):
+        if not self.stop_event.is_set():
+            self.stop_event.set()
+            self.write_queue.close()
+            os.write(self.wakeup_w, b'\0')
+
+    def join(self):
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        if not self.closed:
+            self.closed = True
+            os.close(self.wakeup_r)
+            os.close(self.wakeup_w)
+            if self.link is not None:
+                self.link.close()
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def is_alive(self):
+        return bool(self.threads) and all(thread.is_alive() for thread in self.threads)
+
+
 class SerialToUDPApp:
-    def __init__(self, connections, target_ip, interval):
+    def __init__(self, connections, target_ip, interval, read_mode='event'):
         self.connections = connections
         self.target_ip = target_ip
         self.interval = interval / 1000.0
-        self.threads = []
+        self.read_mode = read_mode
+        self.states = {}
         self.stop_event = threading.Event()
+        # Set whenever a forwarding thread exits so the supervisor wakes without polling
+        self.supervisor_event = threading.Event()
+        self.exit_code = 0
         self.lock = threading.Lock()
+        self.reload_requested = False
+        # Connection list pushed by a WorkerPool parent; None means re-read the config file
+        self.reload_connections = None
+        # Control API commands, run on the supervisor thread
+        self.commands = CommandQueue(self.supervisor_event.set)
+
+    def log_starting(self, connection):
+        logger.info(f"Starting bridge for {connection['name']}: {connection['serial_ports']} <-> "
+                    f"UDP {self.destinations(connection)}, listening on {connection['listen_ports']}")
 
-    def read_and_send_serial_data(self, serial_conn, udp_socket, target_port, buffer_size):
-        """Read data from serial port and send it via UDP."""
+    def destinations(self, connection):
+        """Where a connection's serial data goes: its `targets` list, or target_ip with each target port."""
+        return connection.get('targets') or [(self.target_ip, port) for port in connection['target_ports']]
+
+    def read_and_send_serial_data(self, state, link, udp_sockets, buffer_size):
+        """Read data from serial port and send it via UDP, reopening the port if the device goes away."""
+        read_loop = self.poll_and_send_serial_data if self.read_mode == 'polling' else self.select_and_send_serial_data
+        batcher = None
         try:
-            while not self.stop_event.is_set():
-                if serial_conn.in_waiting > 0:
-                    data = serial_conn.read(
-                        min(buffer_size, serial_conn.in_waiting) if buffer_size else serial_conn.in_waiting)
-                    udp_socket.sendto(data, (self.target_ip, target_port))
-                    logger.info(f"Sent: {data}")
-                time.sleep(self.interval)
+            batcher = self.create_batcher(state, udp_sockets)
+            while not state.stop_event.is_set():
+                # The UDP side stays open while the device is down; only the serial port is reopened
+                serial_conn = link.wait_open(state.stop_event)
+                if serial_conn is None:
+                    break
+                read_loop(state, serial_conn, batcher, buffer_size)
         except Exception as e:
             logger.info(f"Error in read_and_send_serial_data: {e}")
         finally:
-            udp_socket.close()
-            serial_conn.close()
+            if batcher is not None:
+                try:
+                    # A frame still waiting for its delimiter or idle gap goes out before the sockets close
+                    send_frames(state.framer.flush(), batcher, state.payload_log, recorder=state.recorder)
+                finally:
+                    batcher.close()
+            self.supervisor_event.set()
+
+    def serial_failed(self, state, serial_conn, error):
+        """Hand a failed serial read to the link; False when the port is not coming back."""
+        if state.stop_event.is_set() or not state.link.fail(serial_conn, error):
+            return False
+        # Bytes of a frame cut off by the disconnect would corrupt the first frame after it
+        state.framer.reset()
+        return True
+
+    def select_and_send_serial_data(self, state, serial_conn, batcher, buffer_size):
+        """Event-driven read loop on one open port; returns when the connection stops or the port fails.
+
+        Only the serial reads count as a disconnect: a UDP error never closes the tty.
+        """
+        framer = state.framer
+        ring = state.ring
+        metrics = state.metrics
+        serial_fd = serial_conn.fileno()
+        gap = coalesce_gap(state.connection, self.interval)
+        while not state.stop_event.is_set():
+            # Block until the tty has bytes, a pending frame or batch is due, or the connection is stopping.
+            timeout = min_timeout(framer.timeout(), batcher.timeout())
+            ready_to_read, _, _ = select.select([serial_fd, state.wakeup_r], [], [], timeout)
+            if serial_fd in ready_to_read:
+                arrived_at = time.monotonic()
+                try:
+                    metrics.serial_read(ring.fill_from(serial_fd))
+                    if framer.passthrough and self.interval > 0:
+                        self.coalesce_serial_data(ring, serial_fd, metrics, gap)
+                except (OSError, serial.SerialException) as e:
+                    # What was read before the port failed still goes out
+                    drain_ring(ring, framer, batcher, state.payload_log, arrived_at, state.recorder)
+                    if not self.serial_failed(state, serial_conn, e):
+                        raise
+                    return
+                drain_ring(ring, framer, batcher, state.payload_log, arrived_at, state.recorder)
+            elif not ready_to_read:
+                send_frames(framer.flush_expired(), batcher, state.payload_log, recorder=state.recorder)
+            else:
+                continue
+            batcher.flush_expired()
+
+    def coalesce_serial_data(self, ring, serial_fd, metrics, gap):
+        """Keep reading into the ring for up to one interval so a burst leaves as a single datagram.
+
+        The window closes early once the port has been silent for gap seconds.
+        """
+        deadline = time.monotonic() + self.interval
+        while ring.free:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ready_to_read, _, _ = select.select([serial_fd], [], [], min(gap, remaining))
+            if not ready_to_read:
+                break
+            metrics.serial_read(ring.fill_from(serial_fd))
+
+    def poll_and_send_serial_data(self, state, serial_conn, batcher, buffer_size):
+        """Legacy read loop: poll in_waiting and sleep one interval between checks."""
+        framer = state.framer
+        while not state.stop_event.is_set():
+            arrived_at = None
+            try:
+                waiting = serial_conn.in_waiting
+                data = serial_conn.read(min(buffer_size, waiting) if buffer_size else waiting) if waiting > 0 else None
+            except (OSError, serial.SerialException) as e:
+                if not self.serial_failed(state, serial_conn, e):
+                    raise
+                return
+            if data is not None:
+                arrived_at = time.monotonic()
+                state.metrics.serial_read(len(data))
+                frames = framer.feed(data)
+            else:
+                frames = framer.flush_expired()
+            send_frames(frames, batcher, state.payload_log, arrived_at, state.recorder)
+            batcher.flush_expired()
+            time.sleep(self.interval)
+
+    def create_batcher(self, state, udp_sockets):
+        """Connect the egress sockets to the connection's destinations and wrap them in its batcher."""
+        try:
+            # Under the lock, so a retarget() either sees the batcher or happens before it reads the destinations
+            with self.lock:
+                state.batcher = create_batcher(state.connection, udp_sockets, self.destinations(state.connection),
+                                               state.metrics)
+        except Exception:
+            for udp_socket in udp_sockets:
+                udp_socket.close()
+            raise
+        state.metrics.track_batcher(state.batcher)
+        state.metrics.track_envelope_batcher(state.batcher)
+        return state.batcher
+
+    def listen_and_forward_udp_data(self, state, link, listen_sockets):
+        """Listen for UDP packets on every listen port and forward the data to the one serial writer."""
+        connection = state.connection
+        receivers = {
+            listen_socket: DatagramReceiver(listen_socket,
+                                            max_datagram_size=connection.get('max_datagram_size', MAX_DATAGRAM_SIZE),
+                                            max_batch=connection.get('ingress_batch', 64))
+            for listen_socket in listen_sockets
+        }
+        state.receivers = list(receivers.values())
+        state.metrics.track_receivers(state.receivers)
+        watched = list(receivers) + [state.wakeup_r]
+
+        write_queue = state.write_queue
+        payload_log = state.payload_log
+        recorder = state.recorder
+        decoder = create_envelope_decoder(connection)
+        state.metrics.track_envelope_decoder(decoder)
+        sequencer = create_sequence_receiver(connection, state.metrics)
+        state.metrics.track_sequence([sequencer])
+
+        def deliver(payload):
+            # The receive buffer is reused for the next datagram, so queue a copy
+            frames = decoder.decode(payload) if decoder is not None else [bytes(payload)]
+            for frame in frames:
+                write_queue.put(frame)
+                if recorder is not None:
+                    recorder.record(UDP_TO_SERIAL, frame)
+
+        def forward(data, addr):
+            if sequencer is not None:
+                for payload in sequencer.receive(data, addr):
+                    deliver(payload)
+            else:
+                deliver(data)
+            payload_log.log("Received", data)
 
-    def listen_and_forward_udp_data(self, serial_conn, listen_socket):
-        """Listen for UDP packets and forward the data to the serial port."""
         try:
-            while not self.stop_event.is_set():
-                ready_to_read, _, _ = select.select([listen_socket], [], [], 0.01)
-                if ready_to_read:
-                    data, addr = listen_socket.recvfrom(1024)
-                    if data:
-                        serial_conn.write(data)
+            while not state.stop_event.is_set():
+                # Block until datagrams arrive, a reorder gap expires or the connection is stopping,
+                # then drain the whole burst.
+                timeout = sequencer.timeout() if sequencer is not None else None
+                ready_to_read, _, _ = select.select(watched, [], [], timeout)
+                for ready in ready_to_read:
+                    if ready in receivers:
+                        receivers[ready].drain(forward)
+                if sequencer is not None:
+                    for payload in sequencer.flush_expired():
+                        deliver(payload)
         except Exception as e:
             logger.error(f"Error in listen_and_forward_udp_data: {e}")
         finally:
-            listen_socket.close()
+            for listen_socket in listen_sockets:
+                listen_socket.close()
+            self.supervisor_event.set()
+
+    def write_serial_data(self, state, link):
+        """Drain the connection's write queue to the serial port, paced to the configured baud rate.
+
+        While the device is down, datagrams wait in the queue until it is back (offline_policy = buffer)
+        or are discarded (drop). In Rx-only mode this is also the thread that reopens the port.
+        """
+        write_queue = state.write_queue
+        metrics = state.metrics
+        pacer = create_pacer(state.connection)
+        try:
+            while True:
+                data = write_queue.get(link.timeout())
+                if data is None:
+                    if write_queue.closed:
+                        break
+                    link.reopen()
+                    continue
+                serial_conn = link.serial or link.reopen()
+                if serial_conn is None:
+                    if link.offline_policy == OFFLINE_DROP:
+                        link.dropped += 1
+                        continue
+                    serial_conn = link.wait_open(state.stop_event)
+                    if serial_conn is None:
+                        break
+                try:
+                    serial_conn.write(data)
+                except (OSError, serial.SerialException) as e:
+                    metrics.serial_write_errors += 1
+                    if state.stop_event.is_set() or not link.fail(serial_conn, e):
+                        raise
+                    if link.offline_policy == OFFLINE_DROP:
+                        link.dropped += 1 + write_queue.clear()
+                    continue
+                metrics.serial_wrote(len(data))
+                pacer.wrote(len(data))
+                delay = pacer.delay()
+                if delay > 0 and state.stop_event.wait(delay):
+                    break
+        except Exception as e:
+            logger.error(f"Error in write_serial_data: {e}")
+        finally:
+            self.supervisor_event.set()
+
+    def open_connection(self, connection):
+        """Open the serial link, one egress socket per destination and one socket per listen port.
+
+        A serial port that is missing is not fatal when serial_reconnect is on: the link starts down
+        and is reopened with backoff, while the UDP side is already up.
+        """
+        buffer_size_str = connection['buffer_size']
+        buffer_size = None if buffer_size_str == 'default' else int(buffer_size_str)
+        link = create_serial_link(connection)
+        link.open()
+
+        udp_sockets = []
+        listen_sockets = []
+        try:
+            for _ in self.destinations(connection):
+                udp_sockets.append(socket.socket(socket.AF_INET, socket.SOCK_DGRAM))
+            multicast_groups = connection.get('multicast_groups', [])
+            for listen_port in connection['listen_ports']:
+                listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                listen_sockets.append(listen_socket)
+                if connection.get('udp_rcvbuf'):
+                    listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, connection['udp_rcvbuf'])
+                if multicast_groups:
+                    # Other receivers on this host may listen to the same group and port
+                    listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                listen_socket.bind(('', listen_port))
+                for group in multicast_groups:
+                    listen_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                             multicast_request(group, connection.get('multicast_interface')))
+                listen_socket.setblocking(False)
+        except Exception:
+            for sock in udp_sockets + listen_sockets:
+                sock.close()
+            link.close()
+            raise
+
+        return link, udp_sockets, listen_sockets, buffer_size
+
+    def launch_connection(self, connection):
+        """Open a connection and start its forwarding threads. Raises on failure."""
+        conn_direction = connection['mode']
+        link, udp_sockets, listen_sockets, buffer_size = self.open_connection(connection)
+        # Created once the ports are open: a failed open must not leave its wakeup pipe behind
+        state = ConnectionState(connection)
+        state.link = link
+        state.metrics.track_serial_link(link)
+        state.recorder = create_recorder(connection)
+        state.metrics.track_recorder(state.recorder)
+
+        if conn_direction == "Tx":
+            logger.info(f"Starting Tx Conn type")
+            for listen_socket in listen_sockets:
+                listen_socket.close()
+            state.threads.append(threading.Thread(target=self.read_and_send_serial_data,
+                                                  args=(state, link, udp_sockets, buffer_size)))
+        elif conn_direction == "Rx":
+            logger.info(f"Starting Rx Conn type")
+            for udp_socket in udp_sockets:
+                udp_socket.close()
+            state.threads.append(threading.Thread(target=self.listen_and_forward_udp_data,
+                                                  args=(state, link, listen_sockets)))
+            state.threads.append(threading.Thread(target=self.write_serial_data, args=(state, link)))
+        elif conn_direction == "Tx/Rx":
+            logger.info(f"Starting Tx/Rx Conn type")
+            state.threads.append(threading.Thread(target=self.read_and_send_serial_data,
+                                                  args=(state, link, udp_sockets, buffer_size)))
+            state.threads.append(threading.Thread(target=self.listen_and_forward_udp_data,
+                                                  args=(state, link, listen_sockets)))
+            state.threads.append(threading.Thread(target=self.write_serial_data, args=(state, link)))
+        with self.lock:
+            self.states[state.name] = state
+        for thread in state.threads:
+            thread.start()
+        return state
 
     def start_connection(self, connection):
         """Start the connection for a specific serial port and corresponding UDP ports."""
         try:
-            serial_port = connection['serial_ports'][0]
-            target_port = connection['target_ports'][0]
-            listen_port = connection['listen_ports'][0]
-            baud_rate = connection['baud_rate']
-            data_bits = connection['data_bits']
-            parity = connection['parity'][0].upper()
-            stop_bits = connection['stop_bits']
-            buffer_size_str = connection['buffer_size']
-            conn_direction = connection['mode']
-
-            buffer_size = None if buffer_size_str == 'default' else int(buffer_size_str)
-
-            parity_mapping = {
-                'N': serial.PARITY_NONE,
-                'E': serial.PARITY_EVEN,
-                'O': serial.PARITY_ODD,
-                'M': serial.PARITY_MARK,
-                'S': serial.PARITY_SPACE
-            }
-
-            serial_conn = serial.Serial(
-                port=serial_port,
-                baudrate=baud_rate,
-                bytesize={5: serial.FIVEBITS, 6: serial.SIXBITS, 7: serial.SEVENBITS, 8: serial.EIGHTBITS}[data_bits],
-                parity=parity_mapping.get(parity, serial.PARITY_NONE),
-                stopbits={1: serial.STOPBITS_ONE, 1.5: serial.STOPBITS_ONE_POINT_FIVE, 2: serial.STOPBITS_TWO}[
-                    stop_bits],
-                timeout=0
-            )
-
-            if buffer_size is not None:
-                serial_conn.set_buffer_size(rx_size=buffer_size, tx_size=buffer_size)
-
-            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            listen_socket.bind(('', listen_port))
-            listen_socket.setblocking(False)
-
-            if conn_direction == "Tx":
-                logger.info(f"Starting Tx Conn type")
-                read_thread = threading.Thread(target=self.read_and_send_serial_data,
-                                               args=(serial_conn, udp_socket, target_port, buffer_size))
-                with self.lock:
-                    self.threads.extend([read_thread])
-                read_thread.start()
-            elif conn_direction == "Rx":
-                logger.info(f"Starting Rx Conn type")
-                listen_thread = threading.Thread(target=self.listen_and_forward_udp_data,
-                                                 args=(serial_conn, listen_socket))
-                with self.lock:
-                    self.threads.extend([listen_thread])
-                listen_thread.start()
-            elif conn_direction == "Tx/Rx":
-                logger.info(f"Starting Tx/Rx Conn type")
-                read_thread = threading.Thread(target=self.read_and_send_serial_data,
-                                               args=(serial_conn, udp_socket, target_port, buffer_size))
-                listen_thread = threading.Thread(target=self.listen_and_forward_udp_data,
-                                                 args=(serial_conn, listen_socket))
-                with self.lock:
-                    self.threads.extend([read_thread, listen_thread])
-                read_thread.start()
-                listen_thread.start()
+            self.launch_connection(connection)
         except Exception as e:
             logger.error(f"Error in start_connection for {connection}: {e}")
             self.stop_bridge()
@@ -150,51 +580,818 @@ class SerialToUDPApp:
     def start_bridge(self):
         try:
             for connection in self.connections:
-                logger.info(
-                    f"Starting bridge for {connection['name']}: {connection['serial_ports']} <-> UDP {self.target_ip}:{connection['target_ports']}")
+                self.log_starting(connection)
                 self.start_connection(connection)
         except Exception as e:
             logger.error(f"Error in start_bridge: {e}")
             self.stop_bridge()
             sys.exit(1)
 
+    def request_stop(self, exit_code=0):
+        """Ask the supervisor to shut the bridge down. Safe to call from a signal handler."""
+        self.exit_code = exit_code
+        self.stop_event.set()
+        self.supervisor_event.set()
+
+    def request_reload(self, connections=None):
+        """Ask the supervisor to apply a new connection list (None = re-read the config). Signal-safe."""
+        self.reload_connections = connections
+        self.reload_requested = True
+        self.supervisor_event.set()
+
+    def supervise(self, health_interval=60.0, max_restart_delay=60.0, reloader=None):
+        """Block until the bridge is asked to stop, restarting dead connections and reporting health meanwhile.
+
+        Sleeps on supervisor_event, which forwarding threads set when they exit, so an idle bridge
+        costs one wakeup per health_interval instead of a spinning core. Config reloads are applied
+        here too, so they never race a restart.
+        """
+        next_health = time.monotonic() + health_interval
+        while not self.stop_event.is_set():
+            timeout = next_health - time.monotonic()
+            with self.lock:
+                pending = [state.next_restart for state in self.states.values() if state.next_restart is not None]
+            if pending:
+                timeout = min(timeout, min(pending) - time.monotonic())
+            if reloader is not None:
+                timeout = min_timeout(timeout, reloader.timeout())
+            self.supervisor_event.wait(timeout=max(timeout, 0))
+            self.supervisor_event.clear()
+            if self.stop_event.is_set():
+                break
+            self.commands.run_pending()
+            if self.reload_requested or (reloader is not None and reloader.due()):
+                self.apply_reload(reloader)
+            self.restart_dead_connections(max_restart_delay)
+            if time.monotonic() >= next_health:
+                self.report_health()
+                next_health = time.monotonic() + health_interval
+        self.stop_bridge()
+        return self.exit_code
+
+    def apply_reload(self, reloader):
+        connections, self.reload_connections = self.reload_connections, None
+        self.reload_requested = False
+        try:
+            if connections is None:
+                if reloader is None:
+                    logger.warning("Reload requested but the bridge was not started from a config file")
+                    return
+                connections = reloader.load()
+            self.reload(connections)
+        except Exception as e:
+            logger.error(f"Error in reload, keeping the running connections: {e}")
+
+    def reload(self, connections):
+        """Stop removed and changed connections, then start changed and added ones; the rest keep forwarding.
+
+        A connection whose only change is its destinations is retargeted in place and is not reopened.
+        """
+        added, removed, changed, retargeted = diff_connections(self.connections, connections)
+        self.connections = connections
+        if not (added or removed or changed or retargeted):
+            logger.info("Config reloaded, no connection changes")
+            return
+        logger.info(f"Config reloaded: {len(added)} added, {len(removed)} removed, {len(changed)} changed, "
+                    f"{len(retargeted)} retargeted")
+        for connection in retargeted:
+            try:
+                self.retarget(connection)
+            except Exception as e:
+                logger.error(f"Error retargeting {connection['name']}, reopening it: {e}")
+                changed.append(connection)
+        # Everything is stopped before anything starts, so a port that moves between connections is free
+        stopping = removed + [connection['name'] for connection in changed]
+        with self.lock:
+            states = [self.states.pop(name) for name in stopping if name in self.states]
+        for state in states:
+            state.stop()
+        for state in states:
+            state.join()
+        for name in removed:
+            registry.remove(name)
+            logger.info(f"Connection {name} removed")
+        for connection in changed + added:
+            self.log_starting(connection)
+            try:
+                self.launch_connection(connection)
+            except Exception as e:
+                logger.error(f"Error starting {connection['name']} after reload: {e}")
+                # A stopped state is picked up by restart_dead_connections and retried with backoff
+                with self.lock:
+                    self.states[connection['name']] = ConnectionState(connection)
+
+    def retarget(self, connection):
+        """Send a running connection's serial data to its new destinations without reopening anything."""
+        with self.lock:
+            state = self.states.get(connection['name'])
+            if state is None:
+                return
+            # A restart reopens the connection with the new destinations too
+            state.connection = connection
+            if state.batcher is not None:
+                fan_out_of(state.batcher).retarget(self.destinations(connection),
+                                                   partial(open_destination, connection, state.metrics, True))
+        logger.info(f"Connection {connection['name']} now sends to {self.destinations(connection)}")
+
+    def restart_dead_connections(self, max_restart_delay):
+        """Tear down connections that lost a thread and bring them back with exponential backoff."""
+        with self.lock:
+            states = list(self.states.values())
+        now = time.monotonic()
+        for state in states:
+            if state.is_alive():
+                continue
+            if state.next_restart is None:
+                state.restart_delay = min(max(state.restart_delay * 2, 1.0), max_restart_delay)
+                state.next_restart = now + state.restart_delay
+                logger.error(f"Connection {state.name} stopped, restarting in {state.restart_delay:.0f}s")
+                state.stop()
+                state.join()
+                continue
+            if now < state.next_restart:
+                continue
+            try:
+                new_state = self.launch_connection(state.connection)
+            except Exception as e:
+                logger.error(f"Error restarting {state.name}: {e}")
+                state.next_restart = None
+                with self.lock:
+                    self.states[state.name] = state
+                continue
+            new_state.restarts = state.restarts + 1
+            new_state.restart_delay = state.restart_delay
+            logger.info(f"Connection {state.name} restarted (restart #{new_state.restarts})")
+
+    def connection_status(self):
+        """Per-connection state for the control API."""
+        with self.lock:
+            states = list(self.states.values())
+        return {state.name: {'running': state.is_alive(),
+                             'serial_open': state.link is not None and state.link.serial is not None,
+                             'restarts': state.restarts}
+                for state in states}
+
+    def report_health(self):
+        with self.lock:
+            states = list(self.states.values())
+        for state in states:
+            alive = sum(thread.is_alive() for thread in state.threads)
+            egress = ingress = ""
+            if state.batcher is not None:
+                egress = (f", {state.batcher.datagrams} datagrams in {state.batcher.syscalls} sends, "
+                          f"{state.batcher.dropped} dropped")
+                p99 = state.metrics.latency.quantile(0.99)
+                if p99 is not None:
+                    egress += f", serial->UDP p99 <= {p99 * 1000:g} ms"
+            if state.receivers:
+                received = sum(receiver.datagrams for receiver in state.receivers)
+                wakeups = sum(receiver.wakeups for receiver in state.receivers)
+                truncated = sum(receiver.truncated for receiver in state.receivers)
+                ingress = (f", {received} datagrams received in {wakeups} wakeups, "
+                           f"{truncated} truncated, write queue {len(state.write_queue)} "
+                           f"({state.write_queue.queued_bytes} bytes, {state.write_queue.dropped} dropped)")
+            serial_status = ""
+            if state.link is not None:
+                serial_status = (f", serial {'up' if state.link.serial is not None else 'down'} "
+                                 f"({state.link.disconnects} disconnects)")
+            logger.info(f"Health {state.name}: {alive}/{len(state.threads)} threads alive, "
+                        f"{state.restarts} restarts{serial_status}{egress}{ingress}")
+        if queue_handler.dropped:
+            logger.warning(f"Log pipeline dropped {queue_handler.dropped} records (queue full)")
+
     def stop_bridge(self):
         try:
             self.stop_event.set()
             with self.lock:
-                for thread in self.threads:
-                    thread.join()
+                states = list(self.states.values())
+                self.states.clear()
+            for state in states:
+                state.stop()
+            for state in states:
+                state.join()
             logger.info("Bridge stopped.")
         except Exception as e:
             logger.info(f"Error in stop_bridge: {e}")
 
+class AsyncSerialLink:
+    """Reopens a connection's SerialLink from the event loop and tells the reader and pump when it is back."""
+
+    def __init__(self, loop, link):
+        self.loop = loop
+        self.link = link
+        # Called with the new serial handle after every reconnect
+        self.listeners = []
+        # Called before the serial handle is closed, so nothing stays registered with the loop on its fd
+        self.closing = []
+        self.retry_handle = None
+
+    @property
+    def serial(self):
+        return self.link.serial
+
+    def failed(self, serial_conn, error):
+        """Report an I/O error. Returns True when the port will be reopened."""
+        for callback in self.closing:
+            callback()
+        if not self.link.fail(serial_conn, error):
+            return False
+        self.schedule_retry()
+        return True
+
+    def schedule_retry(self):
+        timeout = self.link.timeout()
+        if self.retry_handle is None and timeout is not None:
+            self.retry_handle = self.loop.call_later(timeout, self.retry)
+
+    def retry(self):
+        self.retry_handle = None
+        serial_conn = self.link.reopen()
+        if serial_conn is None:
+            self.schedule_retry()
+            return
+        for listener in self.listeners:
+            listener(serial_conn)
+
+    def close(self):
+        if self.retry_handle is not None:
+            self.retry_handle.cancel()
+            self.retry_handle = None
+        for callback in self.closing:
+            callback()
+        self.link.close()
+
+
+class SerialWritePump:
+    """Writes one connection's queue to its serial port at line rate from the event loop.
+
+    Every listen port of the connection feeds the same pump, so fan-in still has a single writer and
+    pacer. The loop must never block, so the block policy pauses reading from the sockets while the
+    queue is full and lets the kernel receive buffers absorb the burst instead. For the same reason
+    the pump writes with os.write() on the port's non-blocking fd rather than the blocking
+    Serial.write(): when the tty buffer is full, the rest of the datagram waits for add_writer() to
+    report the fd writable. While the device is down, the pump stops and offline_policy decides
+    whether datagrams queue up or are discarded.
+    """
+
+    def __init__(self, loop, serial_link, write_queue, pacer, metrics):
+        self.loop = loop
+        self.serial_link = serial_link
+        serial_link.listeners.append(self.reconnected)
+        serial_link.closing.append(self.port_closed)
+        self.write_queue = write_queue
+        self.pacer = pacer
+        self.metrics = metrics
+        self.transports = []
+        self.pump_handle = None
+        self.paused = False
+        # Unwritten rest of the datagram the tty could not take at once, and the fd waited on for it
+        self.pending = None
+        self.writer_fd = None
+
+    def put(self, data):
+        link = self.serial_link.link
+        if link.serial is None and link.offline_policy == OFFLINE_DROP:
+            link.dropped += 1
+            return
+        self.write_queue.put(data, block=False)
+        if self.write_queue.policy == BLOCK and not self.paused and not self.write_queue.has_room(len(data)):
+            for transport in self.transports:
+                transport.pause_reading()
+            self.paused = True
+        if self.pump_handle is None and self.writer_fd is None:
+            self.pump()
+
+    def pump(self):
+        self.pump_handle = None
+        serial_conn = self.serial_link.serial
+        if serial_conn is None:
+            # reconnected() starts the pump again
+            return
+        try:
+            fd = serial_conn.fileno()
+            while self.pending is not None or self.pacer.delay() <= 0:
+                if self.pending is None:
+                    data = self.write_queue.get_nowait()
+                    if data is None:
+                        break
+                    self.pending = memoryview(data)
+                try:
+                    written = os.write(fd, self.pending)
+                except BlockingIOError:
+                    written = 0
+                if written:
+                    self.metrics.serial_wrote(written)
+                    self.pacer.wrote(written)
+                if written < len(self.pending):
+                    self.pending = self.pending[written:]
+                    self.writer_fd = fd
+                    self.loop.add_writer(fd, self.on_writable)
+                    return
+                self.pending = None
+        except Exception as e:
+            self.pending = None
+            self.metrics.serial_write_errors += 1
+            if self.serial_link.failed(serial_conn, e):
+                link = self.serial_link.link
+                if link.offline_policy == OFFLINE_DROP:
+                    link.dropped += self.write_queue.clear()
+                    self.resume_reading()
+            else:
+                logger.error(f"Error in listen_and_forward_udp_data: {e}")
+            return
+        if self.write_queue.queued_bytes < self.write_queue.max_bytes // 2:
+            self.resume_reading()
+        if len(self.write_queue):
+            self.pump_handle = self.loop.call_later(self.pacer.delay(), self.pump)
+
+    def on_writable(self):
+        self.remove_writer()
+        self.pump()
+
+    def port_closed(self):
+        # The rest of a datagram cut off by the disconnect would corrupt the first one after it
+        self.remove_writer()
+        self.pending = None
+
+    def remove_writer(self):
+        if self.writer_fd is not None:
+            self.loop.remove_writer(self.writer_fd)
+            self.writer_fd = None
+
+    def resume_reading(self):
+        if self.paused:
+            for transport in self.transports:
+                transport.resume_reading()
+            self.paused = False
+
+    def reconnected(self, serial_conn):
+        if self.pump_handle is None and self.writer_fd is None and len(self.write_queue):
+            self.pump()
+
+    def detach(self, transport):
+        if transport in self.transports:
+            self.transports.remove(transport)
+        if not self.transports:
+            if self.pump_handle is not None:
+                self.pump_handle.cancel()
+                self.pump_handle = None
+            self.remove_writer()
+
+
+class UDPToSerialProtocol(asyncio.DatagramProtocol):
+    """Datagram endpoint for one listen port: hands every received packet to the connection's SerialWritePump."""
+
+    def __init__(self, pump, payload_log, decoder=None, sequencer=None, recorder=None):
+        self.pump = pump
+        self.payload_log = payload_log
+        self.decoder = decoder
+        self.sequencer = sequencer
+        self.recorder = recorder
+        self.gap_timer = None
+        self.transport = None
+        self.datagrams = 0
+        self.bytes = 0
+        # asyncio receives into a 256 KiB buffer, so no datagram is ever cut short
+        self.truncated = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.pump.transports.append(transport)
+
+    def datagram_received(self, data, addr):
+        self.datagrams += 1
+        self.bytes += len(data)
+        if self.sequencer is not None:
+            for payload in self.sequencer.receive(data, addr):
+                self.deliver(payload)
+            self.arm_gap_timer()
+        else:
+            self.deliver(data)
+        self.payload_log.log("Received", data)
+
+    def deliver(self, payload):
+        frames = self.decoder.decode(payload) if self.decoder is not None else [payload]
+        for frame in frames:
+            self.pump.put(frame)
+            if self.recorder is not None:
+                self.recorder.record(UDP_TO_SERIAL, frame)
+
+    def arm_gap_timer(self):
+        """Release held datagrams when the oldest reorder gap expires, even if no more traffic arrives."""
+        if self.gap_timer is not None:
+            self.gap_timer.cancel()
+            self.gap_timer = None
+        timeout = self.sequencer.timeout()
+        if timeout is not None:
+            self.gap_timer = self.pump.loop.call_later(timeout, self.on_gap_timeout)
+
+    def on_gap_timeout(self):
+        self.gap_timer = None
+        for payload in self.sequencer.flush_expired():
+            self.deliver(payload)
+        self.arm_gap_timer()
+
+    def connection_lost(self, exc):
+        if self.gap_timer is not None:
+            self.gap_timer.cancel()
+            self.gap_timer = None
+        self.pump.detach(self.transport)
+
+    def error_received(self, exc):
+        logger.error(f"Error in listen socket: {exc}")
+
+
+class SerialReadHandler:
+    """add_reader callback for one serial fd: read into the ring, coalesce for one interval, send as one datagram.
+
+    The window closes early once the port has been silent for gap seconds.
+    """
+
+    def __init__(self, loop, serial_link, batcher, ring, interval, framer, payload_log, metrics, recorder=None,
+                 gap=None):
+        self.loop = loop
+        self.payload_log = payload_log
+        self.recorder = recorder
+        self.metrics = metrics
+        # When the oldest byte still in the ring arrived
+        self.arrived_at = None
+        self.serial_link = serial_link
+        serial_link.listeners.append(self.attach)
+        self.serial_conn = None
+        self.serial_fd = None
+        self.batcher = batcher
+        self.ring = ring
+        self.interval = interval
+        self.gap = interval if gap is None else gap
+        # When the current coalescing window ends at the latest
+        self.deadline = None
+        self.framer = framer
+        self.flush_handle = None
+        self.frame_timer = None
+        self.closed = False
+        if serial_link.serial is not None:
+            self.attach(serial_link.serial)
+
+    def attach(self, serial_conn):
+        """Start reading from a newly opened serial handle."""
+        self.serial_conn = serial_conn
+        self.serial_fd = serial_conn.fileno()
+        self.loop.add_reader(self.serial_fd, self.on_readable)
+
+    def detach(self):
+        if self.serial_fd is not None:
+            self.loop.remove_reader(self.serial_fd)
+            self.serial_fd = None
+
+    def on_readable(self):
+        if not len(self.ring):
+            self.arrived_at = time.monotonic()
+        try:
+            self.metrics.serial_read(self.ring.fill_from(self.serial_fd))
+        except Exception as e:
+            # Send what was read before the error, then wait for the port to come back
+            self.flush()
+            self.detach()
+            if self.serial_link.failed(self.serial_conn, e):
+                self.framer.reset()
+                return
+            logger.info(f"Error in read_and_send_serial_data: {e}")
+            self.close()
+            return
+        if not self.framer.passthrough or self.interval <= 0 or not self.ring.free:
+            self.flush()
+            return
+        now = self.loop.time()
+        if self.flush_handle is None:
+            self.deadline = now + self.interval
+        else:
+            self.flush_handle.cancel()
+        self.flush_handle = self.loop.call_at(min(self.deadline, now + self.gap), self.flush)
+
+    def arm_frame_timer(self):
+        """Schedule a wakeup for the framer's idle deadline or the batcher's flush, whichever comes first."""
+        if self.frame_timer is not None:
+            self.frame_timer.cancel()
+            self.frame_timer = None
+        timeout = min_timeout(self.framer.timeout(), self.batcher.timeout())
+        if timeout is not None:
+            self.frame_timer = self.loop.call_later(timeout, self.on_frame_timeout)
+
+    def on_frame_timeout(self):
+        self.frame_timer = None
+        try:
+            send_frames(self.framer.flush_expired(), self.batcher, self.payload_log, recorder=self.recorder)
+            self.batcher.flush_expired()
+        except Exception as e:
+            self.send_failed(e)
+        self.arm_frame_timer()
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        try:
+            drain_ring(self.ring, self.framer, self.batcher, self.payload_log, self.arrived_at, self.recorder)
+        except Exception as e:
+            self.send_failed(e)
+        self.arm_frame_timer()
+
+    def send_failed(self, error):
+        """A send raised inside a loop callback: log and count it, the loop has nowhere to propagate it to."""
+        logger.error(f"Error in SerialReadHandler: {error}")
+        self.metrics.forward_errors += 1
+
+    def close(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.frame_timer is not None:
+            self.frame_timer.cancel()
+            self.frame_timer = None
+        if self.closed:
+            return
+        self.closed = True
+        self.detach()
+        try:
+            # Bytes still coalescing, and a frame waiting for its delimiter or idle gap, go out before the sockets close
+            drain_ring(self.ring, self.framer, self.batcher, self.payload_log, self.arrived_at, self.recorder)
+            send_frames(self.framer.flush(), self.batcher, self.payload_log, recorder=self.recorder)
+        finally:
+            self.batcher.close()
+
+
+class AsyncConnection:
+    """Loop-side handles of one connection, so a reload can close it without touching the others."""
+
+    def __init__(self, serial_link):
+        self.serial_link = serial_link
+        self.reader = None
+        self.transports = []
+        self.write_queue = None
+        self.recorder = None
+        self.metrics = None
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.flush()
+            self.reader.close()
+        for transport in self.transports:
+            transport.close()
+        self.serial_link.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+class AsyncSerialToUDPApp(SerialToUDPApp):
+    """Runs every connection on a single asyncio event loop instead of one or two threads per connection."""
+
+    def __init__(self, connections, target_ip, interval, read_mode='event'):
+        super().__init__(connections, target_ip, interval, read_mode)
+        self.loop = None
+        self.loop_thread = None
+        # connection name -> AsyncConnection
+        self.handles = {}
+
+    async def start_connection_async(self, connection):
+        """Register the serial fd and UDP sockets of one connection with the running loop."""
+        loop = asyncio.get_running_loop()
+        conn_direction = connection['mode']
+        link, udp_sockets, listen_sockets, buffer_size = self.open_connection(connection)
+        serial_link = AsyncSerialLink(loop, link)
+        handle = self.handles[connection['name']] = AsyncConnection(serial_link)
+        metrics = handle.metrics = registry.connection(connection['name'])
+        metrics.track_serial_link(link)
+        recorder = handle.recorder = create_recorder(connection)
+        metrics.track_recorder(recorder)
+        serial_link.schedule_retry()
+
+        if conn_direction in ("Tx", "Tx/Rx"):
+            for udp_socket in udp_sockets:
+                udp_socket.setblocking(False)
+            batcher = create_batcher(connection, udp_sockets, self.destinations(connection), metrics)
+            metrics.track_batcher(batcher)
+            metrics.track_envelope_batcher(batcher)
+            ring = RingBuffer(buffer_size or RING_SIZE)
+            handle.reader = SerialReadHandler(loop, serial_link, batcher, ring, self.interval,
+                                              create_framer(connection, frame_budget(connection)),
+                                              create_payload_logger(connection), metrics, recorder,
+                                              coalesce_gap(connection, self.interval))
+        else:
+            for udp_socket in udp_sockets:
+                udp_socket.close()
+
+        if conn_direction in ("Rx", "Tx/Rx"):
+            pump = SerialWritePump(loop, serial_link, create_write_queue(connection), create_pacer(connection),
+                                   metrics)
+            payload_log = create_payload_logger(connection)
+            decoder = create_envelope_decoder(connection)
+            metrics.track_envelope_decoder(decoder)
+            protocols = []
+            for listen_socket in listen_sockets:
+                transport, protocol = await loop.create_datagram_endpoint(
+                    lambda: UDPToSerialProtocol(pump, payload_log, decoder,
+                                                create_sequence_receiver(connection, metrics), recorder),
+                    sock=listen_socket)
+                handle.transports.append(transport)
+                protocols.append(protocol)
+            handle.write_queue = pump.write_queue
+            metrics.track_receivers(protocols)
+            metrics.track_sequence([protocol.sequencer for protocol in protocols])
+            metrics.track_write_queue(pump.write_queue)
+        else:
+            for listen_socket in listen_sockets:
+                listen_socket.close()
+        logger.info(f"Starting {conn_direction} Conn type on the asyncio engine")
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.supervisor_event.set()
+
+    def restart_dead_connections(self, max_restart_delay):
+        if self.loop_thread is not None and not self.loop_thread.is_alive():
+            logger.error("asyncio engine loop exited unexpectedly, stopping bridge")
+            self.request_stop(1)
+
+    def connection_status(self):
+        running = self.loop_thread is not None and self.loop_thread.is_alive()
+        return {name: {'running': running, 'serial_open': handle.serial_link.serial is not None, 'restarts': 0}
+                for name, handle in list(self.handles.items())}
+
+    def report_health(self):
+        handles = list(self.handles.values())
+        write_queues = [handle.write_queue for handle in handles if handle.write_queue is not None]
+        open_ports = sum(handle.serial_link.serial is not None for handle in handles)
+        endpoints = sum(len(handle.transports) for handle in handles)
+        queued = sum(write_queue.queued_bytes for write_queue in write_queues)
+        dropped = sum(write_queue.dropped for write_queue in write_queues)
+        logger.info(f"Health asyncio engine: {open_ports}/{len(handles)} serial ports open, "
+                    f"{endpoints} UDP endpoints, {queued} bytes queued for serial, {dropped} dropped")
+
+    def reload(self, connections):
+        """Close removed and changed connections and open changed and added ones, all on the loop thread."""
+        added, removed, changed, retargeted = diff_connections(self.connections, connections)
+        self.connections = connections
+        if not (added or removed or changed or retargeted):
+            logger.info("Config reloaded, no connection changes")
+            return
+        logger.info(f"Config reloaded: {len(added)} added, {len(removed)} removed, {len(changed)} changed, "
+                    f"{len(retargeted)} retargeted")
+        asyncio.run_coroutine_threadsafe(self.reload_async(removed, changed + added, retargeted), self.loop).result()
+
+    def retarget(self, connection):
+        """Swap the destinations of a running connection. Runs on the loop thread, which is also the one that sends."""
+        handle = self.handles.get(connection['name'])
+        if handle is None or handle.reader is None:
+            return
+        fan_out = fan_out_of(handle.reader.batcher)
+        fan_out.retarget(self.destinations(connection),
+                         partial(open_destination, connection, handle.metrics, False))
+        fan_out.apply_pending()
+        logger.info(f"Connection {connection['name']} now sends to {self.destinations(connection)}")
+
+    async def reload_async(self, removed, starting, retargeted=()):
+        for connection in retargeted:
+            try:
+                self.retarget(connection)
+            except Exception as e:
+                logger.error(f"Error retargeting {connection['name']}, reopening it: {e}")
+                starting.append(connection)
+        for name in removed + [connection['name'] for connection in starting]:
+            handle = self.handles.pop(name, None)
+            if handle is not None:
+                handle.close()
+        # Transports release their sockets in a call_soon callback; let that run before ports are rebound
+        await asyncio.sleep(0)
+        for name in removed:
+            registry.remove(name)
+            logger.info(f"Connection {name} removed")
+        for connection in starting:
+            self.log_starting(connection)
+            try:
+                await self.start_connection_async(connection)
+            except Exception as e:
+                # The asyncio engine does not restart connections; forget it so the next reload starts it again
+                logger.error(f"Error starting {connection['name']} after reload: {e}")
+                handle = self.handles.pop(connection['name'], None)
+                if handle is not None:
+                    handle.close()
+                self.connections = [c for c in self.connections if c['name'] != connection['name']]
+
+    def start_bridge(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.run_loop, name="asyncio-engine")
+        self.loop_thread.start()
+        try:
+            for connection in self.connections:
+                self.log_starting(connection)
+                asyncio.run_coroutine_threadsafe(self.start_connection_async(connection), self.loop).result()
+        except Exception as e:
+            logger.error(f"Error in start_bridge: {e}")
+            self.stop_bridge()
+            sys.exit(1)
+
+    async def close_all(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+
+    def stop_bridge(self):
+        try:
+            self.stop_event.set()
+            if self.loop is not None and self.loop.is_running():
+                asyncio.run_coroutine_threadsafe(self.close_all(), self.loop).result()
+                self.loop.call_soon_threadsafe(self.loop.stop)
+            if self.loop_thread is not None and self.loop_thread is not threading.current_thread():
+                self.loop_thread.join()
+            logger.info("Bridge stopped.")
+        except Exception as e:
+            logger.info(f"Error in stop_bridge: {e}")
+
+
 def signal_handler(sig, frame):
     logging.info(f"Received signal {sig}, shutting down.")
-    app.stop_bridge()
-    sys.exit(sig)
+    app.request_stop(sig)
+
+def toggle_payload_logging(sig, frame):
+    """SIGUSR1 switches per-packet payload logging on or off without restarting the bridge."""
+    if payload_logging.is_set():
+        payload_logging.clear()
+    else:
+        payload_logging.set()
+    logging.info(f"Payload logging {'enabled' if payload_logging.is_set() else 'disabled'}")
+    if isinstance(app, WorkerPool):
+        app.send_signal(sig)
+
+def reload_config(sig, frame):
+    """SIGHUP re-reads the config and restarts only the connections whose settings changed."""
+    logging.info("Received SIGHUP, reloading config")
+    app.request_reload()
+
+def report_worker_stats(app, index, stats_queue, interval):
+    """Send this worker's metrics to the parent every interval; stop the bridge if the parent goes away."""
+    parent_pid = os.getppid()
+    while not app.stop_event.wait(interval):
+        if os.getppid() != parent_pid:
+            logger.error("Parent process exited, stopping worker")
+            app.request_stop(1)
+            return
+        stats_queue.put((index, [metrics.export() for metrics in registry.current()]))
+
+def receive_reloads(app, control_queue):
+    """Apply the connection lists the parent sends after a config reload."""
+    while True:
+        connections = control_queue.get()
+        if connections is None:
+            return
+        app.request_reload(connections)
+
+def run_worker(engine, target_ip, interval, read_mode, health_interval, stats_interval, log_payloads,
+               index, connections, stats_queue, control_queue):
+    """Entry point of a worker process in multi-process mode: run one group of connections until SIGTERM."""
+    global app
+    if log_payloads:
+        payload_logging.set()
+    app_class = AsyncSerialToUDPApp if engine == 'asyncio' else SerialToUDPApp
+    app = app_class(connections=connections, target_ip=target_ip, interval=interval, read_mode=read_mode)
+    signal.signal(signal.SIGTERM, signal_handler)
+    # Ctrl+C reaches the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Reloads arrive over control_queue with this worker's share of the new config
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, toggle_payload_logging)
+    threading.Thread(target=report_worker_stats, args=(app, index, stats_queue, stats_interval),
+                     name="worker-stats", daemon=True).start()
+    threading.Thread(target=receive_reloads, args=(app, control_queue), name="worker-reload", daemon=True).start()
+    app.start_bridge()
+    sys.exit(app.supervise(health_interval=health_interval))
+
+def read_dictionary(path):
+    """Preset compression dictionary: a file of typical payload bytes, identical on both bridges."""
+    if not path:
+        return b''
+    with open(path, 'rb') as dictionary:
+        return dictionary.read()
 
 def read_config(config_path):
     config = configparser.ConfigParser()
     config.read(config_path)
     return config
 
-def main():
-    global app
-    parser = argparse.ArgumentParser(description="Serial to UDP Bridge")
-    parser.add_argument("--config", type=str, default="config_cli.ini", help="Path to the configuration file")
-    parser.add_argument("--serial-ports", type=str, help="Comma-separated list of Serial connections to use")
-    parser.add_argument("--baud-rate", type=int, help="Baud rate for serial communication")
-    parser.add_argument("--target-ip", type=str, required=True, help="Target IP address for UDP")
-    parser.add_argument("--target-ports", type=str, help="Comma-separated list of target ports for UDP")
-    parser.add_argument("--listen-ports", type=str, help="Comma-separated list of UDP ports to listen on")
-    parser.add_argument("--interval", type=int, help="Sampling interval in milliseconds")
-    parser.add_argument("action", choices=['start', 'stop'], help="Action to perform (start or stop the bridge)")
-
-    args = parser.parse_args()
-    config = read_config(args.config)
-
-    target_ip = args.target_ip
-    interval = args.interval or config.getint('Common', 'interval')
+def parse_connections(config, args):
+    """Connection dicts for every [ConnectionN] section, with command-line overrides applied."""
+    payload_log_rate = config.getfloat('Common', 'payload_log_rate', fallback=10.0)
+    payload_log_sample = config.getint('Common', 'payload_log_sample', fallback=1)
+    record = config.getboolean('Common', 'record', fallback=False)
+    record_dir = config.get('Common', 'record_dir', fallback='captures')
+    record_segment_mb = config.getfloat('Common', 'record_segment_mb', fallback=64)
+    record_segment_minutes = config.getfloat('Common', 'record_segment_minutes', fallback=60)
+    record_max_segments = config.getint('Common', 'record_max_segments', fallback=0)
+    record_index_ms = config.getfloat('Common', 'record_index_ms', fallback=1000.0)
+    record_queue_bytes = config.getint('Common', 'record_queue_bytes', fallback=4 << 20)
 
     def get_ports(section, key):
         ports = config.get(section, key, fallback="")
@@ -205,8 +1402,14 @@ def main():
         return serial_ports.split(',')
 
     connections = []
+    names = set()
     for section in config.sections():
         if section.startswith('Connection'):
+            # Connections are tracked, reloaded and reported by name
+            name = config.get(section, 'name', fallback=section)
+            if name in names:
+                raise ValueError(f"Duplicate connection name {name!r} in [{section}]")
+            names.add(name)
             serial_ports = get_serial_ports(section)
             if args.serial_ports:
                 serial_ports = args.serial_ports.split(',')
@@ -218,32 +1421,245 @@ def main():
             stop_bits = config.getfloat(section, 'stop_bits')
             buffer_size = config.get(section, 'buffer_size')
             c_mode = config.get(section, 'Mode')
+            framing = config.get(section, 'framing', fallback='none')
+            targets = config.get(section, 'targets', fallback='')
             connections.append({
                 'serial_ports': serial_ports,
                 'target_ports': target_ports,
+                'targets': parse_destinations(targets) if targets else [],
+                'group': config.get(section, 'group', fallback=''),
+                'multicast_groups': [group.strip() for group in
+                                     config.get(section, 'multicast_groups', fallback='').split(',') if group.strip()],
+                'multicast_interface': config.get(section, 'multicast_interface', fallback=''),
+                'multicast_ttl': config.getint(section, 'multicast_ttl', fallback=1),
+                'multicast_loop': config.getboolean(section, 'multicast_loop', fallback=True),
+                'broadcast': config.getboolean(section, 'broadcast', fallback=False),
+                'aggregate': config.getboolean(section, 'aggregate', fallback=False),
+                'aggregate_mtu': config.getint(section, 'aggregate_mtu', fallback=1400),
+                'aggregate_hold_ms': config.getfloat(section, 'aggregate_hold_ms', fallback=10.0),
+                'compress': config.get(section, 'compress', fallback='none'),
+                'compress_level': config.getint(section, 'compress_level', fallback=-1),
+                'compress_dictionary': read_dictionary(config.get(section, 'compress_dictionary', fallback='')),
+                'sequence': config.getboolean(section, 'sequence', fallback=False),
+                'reorder_window': config.getint(section, 'reorder_window', fallback=32),
+                'reorder_hold_ms': config.getfloat(section, 'reorder_hold_ms', fallback=20.0),
                 'listen_ports': listen_ports,
                 'baud_rate': baud_rate,
                 'data_bits': data_bits,
                 'parity': parity,
                 'stop_bits': stop_bits,
-                'name': config.get(section, 'name', fallback=section),
+                'name': name,
                 'buffer_size': buffer_size,
-                'mode': c_mode
+                'mode': c_mode,
+                'framing': framing,
+                'frame_delimiter': config.get(section, 'frame_delimiter', fallback='\\n'),
+                'frame_length': config.getint(section, 'frame_length', fallback=0),
+                'length_prefix_size': config.getint(section, 'length_prefix_size', fallback=2),
+                'length_prefix_order': config.get(section, 'length_prefix_order', fallback='big'),
+                'frame_idle_ms': config.getfloat(section, 'frame_idle_ms', fallback=5.0),
+                'batch_size': config.getint(section, 'batch_size', fallback=1),
+                'batch_delay_ms': config.getfloat(section, 'batch_delay_ms', fallback=2.0),
+                'udp_rcvbuf': config.getint(section, 'udp_rcvbuf', fallback=0),
+                'max_datagram_size': config.getint(section, 'max_datagram_size', fallback=MAX_DATAGRAM_SIZE),
+                'ingress_batch': config.getint(section, 'ingress_batch', fallback=64),
+                'write_queue_bytes': config.getint(section, 'write_queue_bytes', fallback=65536),
+                'write_policy': config.get(section, 'write_policy', fallback=DROP_OLDEST),
+                'pace_writes': config.getboolean(section, 'pace_writes', fallback=True),
+                'serial_reconnect': config.getboolean(section, 'serial_reconnect', fallback=True),
+                'serial_by_id': config.getboolean(section, 'serial_by_id', fallback=True),
+                'reconnect_max_delay': config.getfloat(section, 'reconnect_max_delay', fallback=30.0),
+                'offline_policy': config.get(section, 'offline_policy', fallback=OFFLINE_DROP),
+                'payload_log_rate': config.getfloat(section, 'payload_log_rate', fallback=payload_log_rate),
+                'payload_log_sample': config.getint(section, 'payload_log_sample', fallback=payload_log_sample),
+                'record': config.getboolean(section, 'record', fallback=record),
+                'record_dir': config.get(section, 'record_dir', fallback=record_dir),
+                'record_segment_mb': config.getfloat(section, 'record_segment_mb', fallback=record_segment_mb),
+                'record_segment_minutes': config.getfloat(section, 'record_segment_minutes',
+                                                          fallback=record_segment_minutes),
+                'record_max_segments': config.getint(section, 'record_max_segments', fallback=record_max_segments),
+                'record_index_ms': record_index_ms,
+                'record_queue_bytes': record_queue_bytes
             })
+    return connections
+
+def load_connections(config_path, args):
+    """Re-read the connection sections for a reload. An unreadable or incomplete file is an error, not an empty bridge.
+
+    A file caught halfway through an editor's save can be empty or cut short; requiring [Common] and at
+    least one [ConnectionN] keeps such a read from stopping every connection.
+    """
+    config = configparser.ConfigParser()
+    if not config.read(config_path):
+        raise OSError(f"cannot read {config_path}")
+    if not config.has_section('Common'):
+        raise ValueError(f"{config_path} has no [Common] section")
+    if not any(section.startswith('Connection') for section in config.sections()):
+        raise ValueError(f"{config_path} has no [ConnectionN] sections")
+    return parse_connections(config, args)
+
+def run_replay(args):
+    """The replay action: stream a capture or pcap into a PTY or a UDP port at its recorded pace."""
+    try:
+        if args.replay_to == 'pty' or args.replay_to.startswith('pty:'):
+            sink = PtySink(args.replay_to[4:] or None)
+            # A PTY stands in for the serial device, so it gets what the device sent
+            direction = SERIAL_TO_UDP
+        else:
+            sink = UdpSink(parse_destinations(args.replay_to)[0])
+            direction = UDP_TO_SERIAL
+    except Exception as e:
+        logger.error(f"Error in replay: cannot open {args.replay_to}: {e}")
+        return 1
+    if args.direction:
+        direction = {'serial': SERIAL_TO_UDP, 'udp': UDP_TO_SERIAL}[args.direction]
+    pace = f"{args.speed:g}x" if args.speed > 0 else "full speed"
+    try:
+        frames = open_source(args.replay_from, direction, args.start, args.end, args.pcap_port)
+        logger.info(f"Replaying {args.replay_from} into {sink.name} at {pace}")
+        if args.replay_delay:
+            time.sleep(args.replay_delay)
+        count, size, elapsed, worst = replay(frames, sink, args.speed, args.max_gap)
+        logger.info(f"Replayed {count} frames ({size} bytes) in {elapsed:.3f}s, "
+                    f"at most {worst * 1000:.3f} ms behind schedule")
+        return 0
+    except KeyboardInterrupt:
+        logger.info("Replay interrupted.")
+        return 2
+    except Exception as e:
+        logger.error(f"Error in replay: {e}")
+        return 1
+    finally:
+        sink.close()
+
+def list_serial_devices():
+    """The devices action: every serial port, with the identities serial_port can use instead of its path."""
+    for device in devices.list_devices():
+        location = USB_PORT_PREFIX + device['location'].split(':')[0] if device['location'] else '-'
+        print(f"{device['device']}\t{identity(device) or '-'}\t{location}\t{device['by_id'] or '-'}\t"
+              f"{device['description']}")
 
-    app = SerialToUDPApp(
-        connections=connections,
-        target_ip=target_ip,
-        interval=interval
-    )
+def main():
+    global app
+    parser = argparse.ArgumentParser(description="Serial to UDP Bridge")
+    parser.add_argument("--config", type=str, default="config_cli.ini", help="Path to the configuration file")
+    parser.add_argument("--serial-ports", type=str, help="Comma-separated list of Serial connections to use")
+    parser.add_argument("--baud-rate", type=int, help="Baud rate for serial communication")
+    parser.add_argument("--target-ip", type=str,
+                        help="Target IP address for UDP (required for start; the daemon's default target)")
+    parser.add_argument("--target-ports", type=str, help="Comma-separated list of target ports for UDP")
+    parser.add_argument("--listen-ports", type=str, help="Comma-separated list of UDP ports to listen on")
+    parser.add_argument("--interval", type=int, help="Sampling interval in milliseconds")
+    parser.add_argument("--read-mode", choices=['event', 'polling'],
+                        help="Serial read engine: block on the tty (event) or poll in_waiting (polling)")
+    parser.add_argument("--engine", choices=['threads', 'asyncio'],
+                        help="Run each connection on its own threads or all connections on one asyncio loop")
+    parser.add_argument("--log-payloads", action='store_true',
+                        help="Log sampled packet payloads (toggle at runtime with SIGUSR1)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this local HTTP port (0 disables)")
+    parser.add_argument("--workers", type=str,
+                        help="Run connections in this many worker processes ('auto' = one per core, 1 = single process)")
+    parser.add_argument("--control-socket", type=str,
+                        help="Unix socket the daemon serves its control API on")
+    parser.add_argument("--replay-from", type=str,
+                        help="Capture directory, .cap segment or pcap file to replay")
+    parser.add_argument("--replay-to", type=str, default='pty',
+                        help="Replay into a new PTY ('pty', or 'pty:/dev/ttyUSB0' to symlink it) or to host:port over UDP")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument("--direction", choices=['serial', 'udp'],
+                        help="Capture side to replay: frames read from serial or received over UDP "
+                             "(default: serial into a PTY, udp to host:port)")
+    parser.add_argument("--start", type=float, help="Replay from this Unix time")
+    parser.add_argument("--end", type=float, help="Replay up to this Unix time")
+    parser.add_argument("--max-gap", type=float, help="Shorten idle gaps in the capture to this many seconds")
+    parser.add_argument("--pcap-port", type=int, help="Only replay pcap datagrams sent to this UDP port")
+    parser.add_argument("--replay-delay", type=float, default=0.0,
+                        help="Seconds to wait after creating the PTY or socket, e.g. for the bridge to open it")
+    parser.add_argument("action", choices=['start', 'stop', 'daemon', 'replay', 'devices'],
+                        help="Action to perform (start or stop the bridge, run it as a resident daemon, "
+                             "replay a capture or list serial devices)")
+
+    args = parser.parse_args()
+    if args.action == 'replay':
+        if not args.replay_from:
+            parser.error("--replay-from is required for replay")
+        sys.exit(run_replay(args))
+    if args.action == 'devices':
+        list_serial_devices()
+        sys.exit(0)
+    if args.action == 'start' and not args.target_ip:
+        parser.error("--target-ip is required for start")
+    config = read_config(args.config)
+
+    target_ip = args.target_ip
+    interval = args.interval if args.interval is not None else config.getint('Common', 'interval')
+    read_mode = args.read_mode or config.get('Common', 'read_mode', fallback='event')
+    engine = args.engine or config.get('Common', 'engine', fallback='threads')
+    health_interval = config.getfloat('Common', 'health_interval', fallback=60.0)
+    if args.log_payloads or config.getboolean('Common', 'log_payloads', fallback=False):
+        payload_logging.set()
+    metrics_port = args.metrics_port if args.metrics_port is not None else \
+        config.getint('Common', 'metrics_port', fallback=0)
+    metrics_bind = config.get('Common', 'metrics_bind', fallback='127.0.0.1')
+    stats_target = config.get('Common', 'stats_target', fallback='')
+    stats_interval = config.getfloat('Common', 'stats_interval', fallback=5.0)
+    workers = parse_workers(args.workers or config.get('Common', 'workers', fallback='1'))
+    watch_interval = config.getfloat('Common', 'watch_interval', fallback=2.0) \
+        if config.getboolean('Common', 'watch_config', fallback=False) else 0.0
+
+    control_socket = args.control_socket or config.get('Common', 'control_socket', fallback=DEFAULT_SOCKET)
+
+    # The daemon starts idle; connections come and go with control API requests
+    try:
+        connections = [] if args.action == 'daemon' else parse_connections(config, args)
+    except ValueError as e:
+        logger.error(f"Error in config {args.config}: {e}")
+        sys.exit(1)
+
+    groups = group_connections(connections, workers) if workers > 1 else []
+    if len(groups) > 1 or (args.action == 'daemon' and workers > 1):
+        # Each group runs its own bridge (and GIL) in a worker process; this process only supervises them
+        app = WorkerPool(partial(run_worker, engine, target_ip, interval, read_mode, health_interval, stats_interval,
+                                 payload_logging.is_set()),
+                         groups, max_workers=workers)
+    else:
+        app_class = AsyncSerialToUDPApp if engine == 'asyncio' else SerialToUDPApp
+        app = app_class(
+            connections=connections,
+            target_ip=target_ip,
+            interval=interval,
+            read_mode=read_mode
+        )
     signal.signal(signal.SIGTERM, signal_handler)
     signal.signal(signal.SIGINT, signal_handler)  # Handle Ctrl+C for testing
+    signal.signal(signal.SIGUSR1, toggle_payload_logging)
+    signal.signal(signal.SIGHUP, reload_config)
+    # [Common] settings (engine, workers, interval, metrics) still need a restart; only connections reload
+    load = partial(load_connections, args.config, args)
+    daemon = None
+    if args.action == 'daemon':
+        daemon = BridgeDaemon(app, load, target_ip)
+        # A reload re-reads the config for the connections the daemon was asked to run, not all of them
+        load = daemon.connections
+    reloader = ConfigReloader(args.config, load, watch_interval)
 
-    if args.action == 'start':
+    if args.action in ('start', 'daemon'):
+        control_server = None
         try:
+            # One full scan; connections that name a device by identity then resolve from the cache
+            logger.info(f"Found {len(devices.scan())} serial devices")
             app.start_bridge()
-            while True:
-                pass
+            if metrics_port:
+                start_metrics_server(registry, metrics_bind, metrics_port)
+                logger.info(f"Serving metrics on http://{metrics_bind}:{metrics_port}/metrics")
+            if stats_target:
+                StatsReporter(registry, parse_target(stats_target), stats_interval).start()
+                logger.info(f"Sending stats packets to {stats_target} every {stats_interval:g}s")
+            if daemon is not None:
+                control_server = ControlServer(control_socket, daemon.handle).start()
+                logger.info(f"Bridge daemon waiting for commands on {control_socket}")
+            sys.exit(app.supervise(health_interval=health_interval, reloader=reloader))
         except KeyboardInterrupt:
             app.stop_bridge()
             logger.info("App Terminating with keyboard Interrupt.")
@@ -252,6 +1668,10 @@ def main():
             logger.error(f"Exception in main loop: {e}")
             app.stop_bridge()
             sys.exit(1)
+        finally:
+            app.commands.close()
+            if control_server is not None:
+                control_server.close()
     elif args.action == 'stop':
         app.stop_bridge()
         sys.exit(0)
@@ -0,0 +1,82 @@
+import os
+import time
+
+
+def diff_connections(old, new):
+    """Compare two connection lists by name: (added, removed, changed, retargeted).
+
+    added, changed and retargeted are the new connection dicts, removed is a list of names. A
+    connection that differs only in its `targets` is retargeted: it keeps running and only its
+    destinations are swapped. A connection whose settings are identical in both lists appears in
+    none of them and keeps running.
+    """
+    old_by_name = {connection['name']: connection for connection in old}
+    new_names = {connection['name'] for connection in new}
+    added, changed, retargeted = [], [], []
+    for connection in new:
+        previous = old_by_name.get(connection['name'])
+        if previous is None:
+            added.append(connection)
+        elif previous == connection:
+            continue
+        elif dict(previous, targets=None) == dict(connection, targets=None):
+            retargeted.append(connection)
+        else:
+            changed.append(connection)
+    removed = [name for name in old_by_name if name not in new_names]
+    return added, removed, changed, retargeted
+
+
+class ConfigReloader:
+    """Decides when the bridge should re-read its config file.
+
+    A reload is requested explicitly (SIGHUP) or, with watch_interval > 0, once the file's mtime, size
+    or inode has changed and then stayed the same for a whole interval, so a file still being saved is
+    not read halfway. The supervisor checks due() on its own loop, so watching costs one stat() per
+    interval and no extra thread. load() returns the new connection list and may raise, in which case
+    the bridge keeps its current connections.
+    """
+
+    def __init__(self, path, load, watch_interval=0.0):
+        self.path = path
+        self.loader = load
+        self.watch_interval = watch_interval
+        self.requested = False
+        self.signature = self.stat()
+        # A changed signature seen at the last check, waiting to be seen again before it is loaded
+        self.pending = None
+        self.next_check = time.monotonic() + watch_interval if watch_interval > 0 else None
+
+    def stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def request(self):
+        """Reload on the supervisor's next pass. Safe to call from a signal handler."""
+        self.requested = True
+
+    def timeout(self):
+        """Seconds until the next file check, or None when not watching."""
+        if self.next_check is None:
+            return None
+        return max(0.0, self.next_check - time.monotonic())
+
+    def due(self):
+        if self.next_check is not None and time.monotonic() >= self.next_check:
+            self.next_check = time.monotonic() + self.watch_interval
+            signature = self.stat()
+            # A file that vanished mid-save is not a reason to reload; wait for it to come back
+            if signature is not None and signature != self.signature:
+                if signature == self.pending:
+                    self.requested = True
+                self.pending = signature
+        return self.requested
+
+    def load(self):
+        self.requested = False
+        self.pending = None
+        self.signature = self.stat()
+        return self.loader()
@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from concurrent.futures import Future
+
+from metrics import registry
+
+logger = logging.getLogger()
+
+DEFAULT_SOCKET = '/run/serial_udp_bridge/control.sock'
+# Owner and group may connect; packet_listener runs in the daemon's group
+SOCKET_MODE = 0o660
+# A command waits at most this long for the supervisor (stopping a worker process can take a while)
+COMMAND_TIMEOUT = 20.0
+CLIENT_TIMEOUT = 30.0
+
+
+class ControlError(Exception):
+    """The daemon received the request but refused or failed it."""
+
+
+class CommandQueue:
+    """Runs control commands on the supervisor thread, so they never race a restart or a reload.
+
+    submit() is called from a control API thread and blocks until the supervisor, woken by `wake`,
+    has run the command in run_pending(). Commands left over when the bridge stops fail instead of
+    waiting out their timeout.
+    """
+
+    def __init__(self, wake):
+        self.queue = queue.Queue()
+        self.wake = wake
+        self.closed = False
+
+    def submit(self, command, timeout=COMMAND_TIMEOUT):
+        if self.closed:
+            raise ControlError("bridge is stopping")
+        future = Future()
+        self.queue.put((command, future))
+        self.wake()
+        return future.result(timeout)
+
+    def run_pending(self):
+        while True:
+            try:
+                command, future = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                future.set_result(command())
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                _, future = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            future.set_exception(ControlError("bridge is stopping"))
+
+
+def with_targets(connection, target_ips):
+    """The connection as the daemon runs it: explicit `targets`, or every target port of every attached client."""
+    if connection['targets']:
+        return connection
+    return dict(connection, targets=[(ip, port) for ip in sorted(target_ips) for port in connection['target_ports']])
+
+
+class BridgeDaemon:
+    """Start/stop/status/reconfigure commands of a resident bridge.
+
+    The daemon keeps the interpreter, the metrics registry and the supervisor running between
+    sessions. Several clients can attach to the same connection: its serial data fans out to the
+    target_ip of each one, and the connection runs while at least one is attached. A start or stop
+    only changes who is attached to what and hands the resulting connection list to app.reload().
+    Attaching or detaching a client only changes a connection's `targets`, so the running connection
+    gets a destination added or removed in place; nothing is reopened and the clients already
+    attached keep receiving. `load` returns every connection in the config file.
+    """
+
+    def __init__(self, app, load, target_ip=None):
+        self.app = app
+        self.load = load
+        # Used for requests that carry no target_ip
+        self.target_ip = target_ip
+        # connection name -> target IPs of the attached clients ('' for connections with explicit targets)
+        self.clients = {}
+        # Config as of the last start or reload, so a stop does not depend on the file being readable
+        self.loaded = []
+
+    def connections(self, loaded=None, clients=None):
+        """Connection list for every section with a client attached, in config order."""
+        if loaded is None:
+            loaded = self.loaded = self.load()
+        clients = self.clients if clients is None else clients
+        return [with_targets(connection, clients[connection['name']] - {''})
+                for connection in loaded if clients.get(connection['name'])]
+
+    def handle(self, request):
+        """Control API entry point; runs the command on the supervisor thread."""
+        command = request.get('command')
+        handler = {
+            'start': self.start,
+            'stop': self.stop,
+            'status': self.status,
+            'reconfigure': self.reconfigure,
+        }.get(command)
+        if handler is None:
+            raise ValueError(f"Unknown command: {command}")
+        return self.app.commands.submit(lambda: handler(request))
+
+    def start(self, request):
+        """Attach target_ip to the named connections (all of them by default), starting those not yet running."""
+        loaded = self.load()
+        by_name = {connection['name']: connection for connection in loaded}
+        names = request.get('connections') or list(by_name)
+        unknown = [name for name in names if name not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown connections: {', '.join(unknown)}")
+        target_ip = request.get('target_ip') or self.target_ip or ''
+        if not target_ip:
+            missing = [name for name in names if not by_name[name]['targets']]
+            if missing:
+                raise ValueError(f"Connections {', '.join(missing)} have no targets and no target_ip was given")
+        clients = {name: set(ips) for name, ips in self.clients.items()}
+        for name in names:
+            clients.setdefault(name, set()).add(target_ip)
+        self.app.reload(self.connections(loaded, clients))
+        self.loaded = loaded
+        self.clients = clients
+        return self.status(request)
+
+    def stop(self, request):
+        """Detach target_ip from the named connections (all by default), or every client when no target_ip is given.
+
+        Connections left without clients are stopped. Does not re-read the config.
+        """
+        names = request.get('connections') or list(self.clients)
+        target_ip = request.get('target_ip')
+        for name in names:
+            if target_ip:
+                self.clients.get(name, set()).discard(target_ip)
+            else:
+                self.clients.pop(name, None)
+        self.clients = {name: ips for name, ips in self.clients.items() if ips}
+        self.app.reload(self.connections(self.loaded))
+        return self.status(request)
+
+    def reconfigure(self, request):
+        """Re-read the config for the running connections, or only for the ones named."""
+        connections = self.connections()
+        names = request.get('connections')
+        if names:
+            running = {connection['name']: connection for connection in self.app.connections}
+            connections = [connection if connection['name'] in names or connection['name'] not in running
+                           else running[connection['name']] for connection in connections]
+        self.app.reload(connections)
+        return self.status(request)
+
+    def status(self, request):
+        states = self.app.connection_status()
+        metrics = registry.snapshot()
+        connections = {}
+        for name in sorted(self.clients):
+            connections[name] = dict(states.get(name, {'running': False}),
+                                     clients=sorted(ip for ip in self.clients[name] if ip),
+                                     metrics=metrics.get(name, {}))
+        return {'target_ip': self.target_ip, 'connections': connections}
+
+
+class ControlServer:
+    """Serves the control API on a Unix socket: one JSON request per line, one JSON response per line.
+
+    Every response carries 'ok'; a failed request gets 'ok': false and an 'error' message instead of
+    a closed connection. Each client gets its own thread, so an idle client cannot hold up another.
+    """
+
+    def __init__(self, path, handler):
+        self.path = path
+        self.handler = handler
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(path):
+            self.remove_stale_socket()
+        self.socket.bind(path)
+        os.chmod(path, SOCKET_MODE)
+        self.socket.listen(8)
+        self.thread = threading.Thread(target=self.serve, name="control-api", daemon=True)
+
+    def remove_stale_socket(self):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f"another bridge daemon is listening on {self.path}")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve_client, args=(client,), name="control-client", daemon=True).start()
+
+    def serve_client(self, client):
+        try:
+            with client, client.makefile('rb') as reader:
+                for line in reader:
+                    client.sendall(json.dumps(self.respond(line)).encode() + b'\n')
+        except Exception as e:
+            logger.error(f"Error in control API client: {e}")
+
+    def respond(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            response = dict(self.handler(request) or {})
+        except Exception as e:
+            logger.error(f"Control request {line.strip()[:200]!r} failed: {e}")
+            return {'ok': False, 'error': str(e)}
+        response['ok'] = True
+        return response
+
+    def close(self):
+        try:
+            # shutdown() wakes the accept() in serve(); close() alone would not
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class ControlClient:
+    """Talks to a BridgeDaemon. request() raises OSError when no daemon is listening."""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=CLIENT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+
+    def request(self, command, **fields):
+        """Send one command and return the daemon's response dict; raises ControlError if it failed."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(json.dumps(dict(fields, command=command)).encode() + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+        if not line:
+            raise ControlError("daemon closed the connection without answering")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise ControlError(response.get('error', 'request failed'))
+        return response
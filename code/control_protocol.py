@@ -0,0 +1,116 @@
+import random
+import select
+import socket
+import struct
+import time
+from collections import OrderedDict
+
+CONTROL_PORT = 7000
+CONTROL_MAGIC = 0xC7
+PROTOCOL_VERSION = 1
+# Request: magic, version, command, request id, IPv4 address the bridge should stream to (0.0.0.0 = the sender);
+# optionally followed by comma-separated UTF-8 connection names (none = every connection)
+REQUEST = struct.Struct('!BBBI4s')
+# Ack: magic, version, ACK_TYPE, request id of the request it answers, result; followed by UTF-8 detail text
+ACK = struct.Struct('!BBBIB')
+ACK_TYPE = 0x80
+RESULT_OK = 0
+RESULT_ERROR = 1
+
+START = 1
+STOP = 2
+RELOAD = 3
+STATUS = 4
+COMMANDS = {START: 'start', STOP: 'stop', RELOAD: 'reload', STATUS: 'status'}
+COMMAND_CODES = {name: code for code, name in COMMANDS.items()}
+
+# Keep ack datagrams well under a typical MTU
+MAX_DETAIL_SIZE = 1200
+# Acks remembered for retransmitted requests
+ACK_CACHE_SIZE = 64
+
+
+def is_control_packet(data):
+    """True for the binary protocol; the old "<ip> <command>" text packets start with a digit."""
+    return len(data) > 0 and data[0] == CONTROL_MAGIC
+
+
+def encode_request(command, request_id, ip='0.0.0.0', connections=()):
+    return REQUEST.pack(CONTROL_MAGIC, PROTOCOL_VERSION, COMMAND_CODES[command], request_id,
+                        socket.inet_aton(ip)) + ','.join(connections).encode()
+
+
+def decode_request(data):
+    """(command, request id, ip, connection names). Raises ValueError on anything that is not a valid request."""
+    if len(data) < REQUEST.size:
+        raise ValueError("short control request")
+    magic, version, code, request_id, ip = REQUEST.unpack_from(data)
+    if magic != CONTROL_MAGIC or version != PROTOCOL_VERSION:
+        raise ValueError(f"unsupported control packet (magic {magic:#x}, version {version})")
+    if code not in COMMANDS:
+        raise ValueError(f"unknown control command {code}")
+    names = bytes(data[REQUEST.size:]).decode()
+    return COMMANDS[code], request_id, socket.inet_ntoa(ip), [name for name in names.split(',') if name]
+
+
+def encode_ack(request_id, ok, detail=''):
+    detail = detail.encode()[:MAX_DETAIL_SIZE]
+    return ACK.pack(CONTROL_MAGIC, PROTOCOL_VERSION, ACK_TYPE, request_id, RESULT_OK if ok else RESULT_ERROR) + detail
+
+
+def decode_ack(data):
+    """(request id, ok, detail). Raises ValueError on anything that is not an ack."""
+    if len(data) < ACK.size:
+        raise ValueError("short control ack")
+    magic, version, kind, request_id, result = ACK.unpack_from(data)
+    if magic != CONTROL_MAGIC or version != PROTOCOL_VERSION or kind != ACK_TYPE:
+        raise ValueError("not a control ack")
+    return request_id, result == RESULT_OK, data[ACK.size:].decode(errors='replace')
+
+
+class AckCache:
+    """Recent acks by (sender, request id), so a retransmitted request is answered without running it twice."""
+
+    def __init__(self, size=ACK_CACHE_SIZE):
+        self.size = size
+        self.acks = OrderedDict()
+
+    def get(self, addr, request_id):
+        return self.acks.get((addr, request_id))
+
+    def put(self, addr, request_id, ack):
+        self.acks[(addr, request_id)] = ack
+        while len(self.acks) > self.size:
+            self.acks.popitem(last=False)
+
+
+def send_request(target, command, ip='0.0.0.0', timeout=0.2, retries=4, connections=()):
+    """Send a control request to target (host, port) and wait for its ack.
+
+    The request is retransmitted with the same id after timeout, 2 * timeout, ... seconds; the
+    listener answers a repeat from its ack cache, so a lost ack never runs a command twice.
+    Returns (ok, detail, round trip of the answered attempt in seconds). Raises TimeoutError when
+    no ack arrives after `retries` attempts.
+    """
+    request_id = random.getrandbits(32)
+    packet = encode_request(command, request_id, ip, connections)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for attempt in range(retries):
+            sent_at = time.monotonic()
+            sock.sendto(packet, target)
+            deadline = sent_at + timeout * 2 ** attempt
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                ready, _, _ = select.select([sock], [], [], remaining)
+                if not ready:
+                    break
+                data, _ = sock.recvfrom(2048)
+                try:
+                    ack_id, ok, detail = decode_ack(data)
+                except ValueError:
+                    continue
+                if ack_id == request_id:
+                    return ok, detail, time.monotonic() - sent_at
+    raise TimeoutError(f"no ack for {command} from {target[0]}:{target[1]} after {retries} attempts")
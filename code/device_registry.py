@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+
+from serial.tools import list_ports
+from serial.tools.list_ports_linux import SysFS
+
+logger = logging.getLogger()
+
+BY_ID_DIR = '/dev/serial/by-id'
+# serial_port values that name a device by identity instead of by path
+USB_PREFIX = 'usb:'
+USB_PORT_PREFIX = 'usb-port:'
+
+
+def is_identity(spec):
+    return spec.startswith((USB_PREFIX, USB_PORT_PREFIX))
+
+
+def describe(port, by_id=None):
+    """Registry entry for a list_ports port object."""
+    return {
+        'device': port.device,
+        'by_id': by_id,
+        'vid': port.vid,
+        'pid': port.pid,
+        'serial_number': port.serial_number,
+        'location': port.location,
+        'description': port.description,
+    }
+
+
+def identity(device):
+    """usb:VID:PID[:SERIAL] of a registry entry, or None for a device that is not on USB."""
+    if device['vid'] is None:
+        return None
+    spec = f"{USB_PREFIX}{device['vid']:04x}:{device['pid']:04x}"
+    if device['serial_number']:
+        spec += f":{device['serial_number']}"
+    return spec
+
+
+def matches(device, spec):
+    """Whether a registry entry is the device spec names: usb:VID:PID, usb:VID:PID:SERIAL or usb-port:LOCATION."""
+    if spec.startswith(USB_PORT_PREFIX):
+        # list_ports reports the interface too (1-1.2:1.0); the port alone (1-1.2) is enough
+        location = device['location'] or ''
+        wanted = spec[len(USB_PORT_PREFIX):]
+        return location == wanted or location.split(':')[0] == wanted
+    if device['vid'] is None:
+        return False
+    fields = spec[len(USB_PREFIX):].split(':', 2)
+    if len(fields) < 2:
+        raise ValueError(f"Invalid serial_port {spec}: expected usb:VID:PID or usb:VID:PID:SERIAL")
+    try:
+        vid, pid = int(fields[0], 16), int(fields[1], 16)
+    except ValueError:
+        raise ValueError(f"Invalid serial_port {spec}: VID and PID are hex numbers such as 0403:6001")
+    if (vid, pid) != (device['vid'], device['pid']):
+        return False
+    return len(fields) == 2 or fields[2] == device['serial_number']
+
+
+class DeviceRegistry:
+    """Path and USB metadata of every serial device, scanned once and then updated on hotplug.
+
+    The first lookup runs list_ports.comports(). After that, refresh() costs one stat() of the
+    /dev/serial/by-id directory, whose mtime changes whenever udev adds or removes a link. Only when
+    it changed is the directory re-read, and only the devices behind new links are looked up in
+    sysfs. Adapters are therefore found again after they re-enumerate (ttyUSB0 -> ttyUSB1) without
+    rescanning on every open.
+    """
+
+    def __init__(self, by_id_dir=BY_ID_DIR):
+        self.by_id_dir = by_id_dir
+        self.lock = threading.Lock()
+        # real device path -> entry (see describe())
+        self.devices = {}
+        # by-id link -> real device path it pointed to at the last refresh
+        self.links = {}
+        self.signature = None
+        self.scanned = False
+
+    def stat(self):
+        try:
+            st = os.stat(self.by_id_dir)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_ino
+
+    def read_links(self):
+        try:
+            names = sorted(os.listdir(self.by_id_dir))
+        except OSError:
+            return {}
+        links = {}
+        for name in names:
+            link = os.path.join(self.by_id_dir, name)
+            links[link] = os.path.realpath(link)
+        return links
+
+    def scan(self):
+        """Full scan of every serial port. Called once; refresh() keeps the result current."""
+        with self.lock:
+            self.signature = self.stat()
+            self.links = self.read_links()
+            by_device = {}
+            for link, device in self.links.items():
+                by_device.setdefault(device, link)
+            self.devices = {}
+            for port in list_ports.comports():
+                device = os.path.realpath(port.device)
+                self.devices[device] = describe(port, by_device.get(device))
+            for link, device in self.links.items():
+                if device not in self.devices:
+                    self.devices[device] = describe(SysFS(device), link)
+            self.scanned = True
+        return list(self.devices.values())
+
+    def refresh(self):
+        """Apply hotplug changes since the last scan or refresh."""
+        if not self.scanned:
+            self.scan()
+            return
+        signature = self.stat()
+        if signature == self.signature:
+            return
+        with self.lock:
+            self.signature = signature
+            links = self.read_links()
+            for link, device in self.links.items():
+                if links.get(link) != device and self.devices.get(device, {}).get('by_id') == link:
+                    del self.devices[device]
+                    logger.info(f"Serial device {link} ({device}) removed")
+            for link, device in links.items():
+                if self.links.get(link) != device or device not in self.devices:
+                    self.devices[device] = describe(SysFS(device), link)
+                    logger.info(f"Serial device {link} added as {device}")
+            self.links = links
+
+    def list_devices(self):
+        self.refresh()
+        return sorted(self.devices.values(), key=lambda device: device['device'])
+
+    def resolve(self, spec):
+        """Path to open for a serial_port value: its by-id link (or tty) for an identity, the value itself otherwise."""
+        if not is_identity(spec):
+            return spec
+        found = [device for device in self.list_devices() if matches(device, spec)]
+        if not found:
+            raise ValueError(f"no serial device matches {spec}")
+        if len(found) > 1:
+            raise ValueError(f"{spec} matches several devices ({', '.join(device['device'] for device in found)}); "
+                             f"add the serial number or use usb-port:")
+        return found[0]['by_id'] or found[0]['device']
+
+    def stable_path(self, path):
+        """The /dev/serial/by-id link of a tty, so an adapter that re-enumerates (ttyUSB0 -> ttyUSB1) is found again."""
+        if path.startswith(self.by_id_dir):
+            return path
+        self.refresh()
+        device = self.devices.get(os.path.realpath(path))
+        return device['by_id'] if device is not None and device['by_id'] else path
+
+
+# Shared by every connection of the process
+devices = DeviceRegistry()
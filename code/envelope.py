@@ -0,0 +1,196 @@
+import time
+import zlib
+
+from framing import MAX_DATAGRAM_SIZE
+from udp_batch import BatcherWrapper
+
+# First byte of every envelope: high nibble identifies the format, bit 0 marks a compressed body
+ENVELOPE_MAGIC = 0xE0
+FLAG_COMPRESSED = 0x01
+# Refuse to inflate a single envelope beyond this (a corrupt or hostile body could otherwise expand without bound)
+MAX_DECODED_SIZE = 1 << 20
+
+
+def encode_varint(value):
+    """Unsigned LEB128: 7 bits per byte, high bit set on every byte but the last."""
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def decode_varint(data, offset):
+    """Return (value, next offset). Raises ValueError on a truncated varint."""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data) or shift > 28:
+            raise ValueError("truncated length field")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+class EnvelopeBatcher(BatcherWrapper):
+    """Packs several frames into one datagram before handing it to the real batcher.
+
+    Envelope layout: one header byte (ENVELOPE_MAGIC | flags), then a body of records, each a varint
+    length followed by that many frame bytes. An envelope is sealed when the next frame would push it
+    past `mtu` (never more than max_datagram_size), or `max_hold` seconds after its first frame; a frame
+    too big to share an envelope is sent in one of its own. With compression on, the body is
+    deflated on its own (raw deflate, optionally primed with a preset dictionary) so every datagram
+    still decodes independently when others are lost; when deflate does not help the body is sent
+    as is. Exposes the batcher interface and counters, so the read loops do not need to know.
+    """
+
+    def __init__(self, batcher, mtu=1400, max_hold=0.01, compress=False, level=-1, dictionary=b'',
+                 max_datagram_size=MAX_DATAGRAM_SIZE):
+        super().__init__(batcher)
+        self.mtu = min(mtu, max_datagram_size)
+        self.max_hold = max_hold
+        self.records = bytearray()
+        self.first_added_at = None
+        self.first_arrived_at = None
+        self.compressor = None
+        if compress:
+            # Priming a compressor with the dictionary is the expensive part; copy() a primed one per envelope
+            if dictionary:
+                self.compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary)
+            else:
+                self.compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        self.frames = 0
+        self.envelopes = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+
+    def send(self, frame, arrived_at=None):
+        size = len(frame)
+        length = encode_varint(size)
+        if self.records and 1 + len(self.records) + len(length) + size > self.mtu:
+            self.seal()
+        if not self.records:
+            self.first_added_at = time.monotonic()
+            self.first_arrived_at = arrived_at
+        self.records += length
+        self.records += frame
+        self.frames += 1
+        if 1 + len(self.records) >= self.mtu:
+            self.seal()
+
+    def seal(self):
+        records = self.records
+        if not records:
+            return
+        arrived_at = self.first_arrived_at
+        self.records = bytearray()
+        self.first_added_at = None
+        self.first_arrived_at = None
+        envelope = None
+        if self.compressor is not None:
+            compressor = self.compressor.copy()
+            body = compressor.compress(records) + compressor.flush()
+            if len(body) < len(records):
+                envelope = bytes((ENVELOPE_MAGIC | FLAG_COMPRESSED,)) + body
+        if envelope is None:
+            envelope = bytes((ENVELOPE_MAGIC,)) + records
+        self.envelopes += 1
+        self.raw_bytes += len(records) + 1
+        self.wire_bytes += len(envelope)
+        self.batcher.send(envelope, arrived_at)
+
+    def timeout(self):
+        timeouts = [self.batcher.timeout()]
+        if self.records:
+            timeouts.append(max(0.0, self.first_added_at + self.max_hold - time.monotonic()))
+        pending = [timeout for timeout in timeouts if timeout is not None]
+        return min(pending) if pending else None
+
+    def flush_expired(self):
+        if self.records and time.monotonic() - self.first_added_at >= self.max_hold:
+            self.seal()
+        self.batcher.flush_expired()
+
+    def flush(self):
+        self.seal()
+        self.batcher.flush()
+
+    def close(self):
+        try:
+            self.seal()
+        finally:
+            self.batcher.close()
+
+
+class EnvelopeDecoder:
+    """Unpacks envelopes written by EnvelopeBatcher back into the original frames."""
+
+    def __init__(self, dictionary=b''):
+        if dictionary:
+            self.decompressor = zlib.decompressobj(-15, zdict=dictionary)
+        else:
+            self.decompressor = zlib.decompressobj(-15)
+        self.envelopes = 0
+        self.frames = 0
+        self.errors = 0
+
+    def decode(self, data):
+        """List of frames in one datagram; a malformed datagram is counted and yields nothing."""
+        try:
+            frames = self.unpack(data)
+        except (ValueError, zlib.error):
+            self.errors += 1
+            return []
+        self.envelopes += 1
+        self.frames += len(frames)
+        return frames
+
+    def unpack(self, data):
+        if not data or data[0] & 0xF0 != ENVELOPE_MAGIC:
+            raise ValueError("not an envelope")
+        body = data[1:]
+        if data[0] & FLAG_COMPRESSED:
+            decompressor = self.decompressor.copy()
+            body = decompressor.decompress(body, MAX_DECODED_SIZE)
+            if decompressor.unconsumed_tail or not decompressor.eof:
+                raise ValueError("compressed body is truncated or too large")
+        frames = []
+        offset = 0
+        while offset < len(body):
+            size, offset = decode_varint(body, offset)
+            end = offset + size
+            if end > len(body):
+                raise ValueError("record runs past the end of the envelope")
+            frames.append(bytes(body[offset:end]))
+            offset = end
+        return frames
+
+
+def envelope_overhead(connection):
+    """Bytes an envelope adds around a single frame: the header byte and the varint length of a full datagram."""
+    if not connection.get('aggregate'):
+        return 0
+    return 1 + len(encode_varint(MAX_DATAGRAM_SIZE))
+
+
+def create_envelope_batcher(connection, batcher, max_datagram_size=MAX_DATAGRAM_SIZE):
+    """Wrap the connection's batcher in an EnvelopeBatcher when `aggregate` is on."""
+    if not connection.get('aggregate'):
+        return batcher
+    return EnvelopeBatcher(batcher,
+                           max_datagram_size=max_datagram_size,
+                           mtu=connection.get('aggregate_mtu', 1400),
+                           max_hold=connection.get('aggregate_hold_ms', 10.0) / 1000.0,
+                           compress=connection.get('compress', 'none') == 'zlib',
+                           level=connection.get('compress_level', -1),
+                           dictionary=connection.get('compress_dictionary', b''))
+
+
+def create_envelope_decoder(connection):
+    if not connection.get('aggregate'):
+        return None
+    return EnvelopeDecoder(connection.get('compress_dictionary', b''))
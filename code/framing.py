@@ -0,0 +1,225 @@
+import codecs
+import time
+
+# Largest payload a single IPv4 UDP datagram can carry
+MAX_DATAGRAM_SIZE = 65507
+
+SLIP_END = b'\xc0'
+COBS_DELIMITER = b'\x00'
+
+
+class Framer:
+    """Pass-through framer: every serial read becomes one datagram.
+
+    Framers only choose where frames start and end - the bytes themselves are forwarded
+    unchanged, so a bridge on the other side writes exactly the original stream to its port.
+    """
+
+    passthrough = True
+
+    def __init__(self, max_frame_size=MAX_DATAGRAM_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Add freshly read bytes and return the list of complete frames."""
+        if not data:
+            return []
+        return self.split(data)
+
+    def timeout(self):
+        """Seconds until a pending frame has to be flushed, or None when nothing is time-bound."""
+        return None
+
+    def flush_expired(self):
+        """Return frames whose deadline passed without new data."""
+        return []
+
+    def flush(self):
+        """Return whatever is still buffered (used on shutdown)."""
+        if not self.buffer:
+            return []
+        frame = bytes(self.buffer)
+        self.buffer.clear()
+        return [frame]
+
+    def reset(self):
+        """Discard a partial frame (the serial stream it belonged to was cut off)."""
+        self.buffer.clear()
+
+    def split(self, frame):
+        """Cut a frame into max_frame_size pieces so each still fits one datagram."""
+        size = self.max_frame_size
+        if len(frame) <= size:
+            return [bytes(frame)]
+        return [bytes(frame[i:i + size]) for i in range(0, len(frame), size)]
+
+    def overflow(self):
+        """Cut the buffer when a frame grows past max_frame_size so garbage cannot grow it forever."""
+        frames = []
+        while len(self.buffer) >= self.max_frame_size:
+            frames.append(bytes(self.buffer[:self.max_frame_size]))
+            del self.buffer[:self.max_frame_size]
+        return frames
+
+
+class DelimiterFramer(Framer):
+    """Ends a frame after every occurrence of a delimiter (e.g. b'\\n'). The delimiter stays in the frame."""
+
+    passthrough = False
+
+    def __init__(self, delimiter, max_frame_size=MAX_DATAGRAM_SIZE):
+        super().__init__(max_frame_size)
+        if not delimiter:
+            raise ValueError("frame_delimiter must not be empty")
+        self.delimiter = delimiter
+        self.search_from = 0
+
+    def reset(self):
+        super().reset()
+        self.search_from = 0
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        start = 0
+        search_from = self.search_from
+        while True:
+            end = self.buffer.find(self.delimiter, search_from)
+            if end < 0:
+                break
+            end += len(self.delimiter)
+            frames.extend(self.split(self.buffer[start:end]))
+            start = search_from = end
+        if start:
+            del self.buffer[:start]
+        # A delimiter may be split across reads, so re-scan its last len - 1 bytes next time
+        self.search_from = max(0, len(self.buffer) - len(self.delimiter) + 1)
+        if len(self.buffer) >= self.max_frame_size:
+            frames.extend(self.overflow())
+            self.search_from = 0
+        return frames
+
+
+class FixedLengthFramer(Framer):
+    """Ends a frame every frame_length bytes."""
+
+    passthrough = False
+
+    def __init__(self, frame_length, max_frame_size=MAX_DATAGRAM_SIZE):
+        super().__init__(max_frame_size)
+        if frame_length <= 0:
+            raise ValueError("frame_length must be positive for fixed framing")
+        self.frame_length = frame_length
+
+    def feed(self, data):
+        self.buffer += data
+        count = len(self.buffer) // self.frame_length
+        if not count:
+            return []
+        size = self.frame_length
+        frames = [bytes(self.buffer[i * size:(i + 1) * size]) for i in range(count)]
+        del self.buffer[:count * size]
+        return frames
+
+
+class LengthPrefixFramer(Framer):
+    """Frames that start with an unsigned length field counting the payload bytes that follow it."""
+
+    passthrough = False
+
+    def __init__(self, prefix_size=2, byteorder='big', max_frame_size=MAX_DATAGRAM_SIZE):
+        super().__init__(max_frame_size)
+        if prefix_size not in (1, 2, 4):
+            raise ValueError("length_prefix_size must be 1, 2 or 4")
+        self.prefix_size = prefix_size
+        self.byteorder = byteorder
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        start = 0
+        prefix_size = self.prefix_size
+        while len(self.buffer) - start >= prefix_size:
+            length = int.from_bytes(self.buffer[start:start + prefix_size], self.byteorder)
+            end = start + prefix_size + length
+            if end - start > self.max_frame_size:
+                # Corrupt or oversized length field - drop one byte and try to resynchronise
+                start += 1
+                continue
+            if end > len(self.buffer):
+                break
+            frames.append(bytes(self.buffer[start:end]))
+            start = end
+        if start:
+            del self.buffer[:start]
+        return frames
+
+
+class EndMarkerFramer(DelimiterFramer):
+    """SLIP (0xC0) / COBS (0x00) framing: a single end byte closes every frame, empty frames are skipped."""
+
+    def feed(self, data):
+        return [frame for frame in super().feed(data) if frame != self.delimiter]
+
+
+class IdleGapFramer(Framer):
+    """Ends a frame once the line has been quiet for idle_gap seconds."""
+
+    passthrough = False
+
+    def __init__(self, idle_gap, max_frame_size=MAX_DATAGRAM_SIZE):
+        super().__init__(max_frame_size)
+        self.idle_gap = idle_gap
+        self.last_byte_at = None
+
+    def feed(self, data):
+        if not data:
+            return []
+        self.buffer += data
+        self.last_byte_at = time.monotonic()
+        return self.overflow()
+
+    def timeout(self):
+        if not self.buffer:
+            return None
+        return max(0.0, self.last_byte_at + self.idle_gap - time.monotonic())
+
+    def flush_expired(self):
+        if self.buffer and time.monotonic() - self.last_byte_at >= self.idle_gap:
+            return self.flush()
+        return []
+
+
+def parse_delimiter(value):
+    """Turn a config value such as '\\n', '\\r\\n' or '0x0d0a' into bytes."""
+    if value.lower().startswith('0x'):
+        return bytes.fromhex(value[2:])
+    return codecs.escape_decode(value.encode())[0]
+
+
+def create_framer(connection, max_datagram_size=MAX_DATAGRAM_SIZE):
+    """Build the framer selected by the connection's `framing` setting.
+
+    Frames never grow past max_datagram_size, the payload left once link headers are added.
+    """
+    mode = connection.get('framing', 'none').lower()
+    buffer_size = connection.get('buffer_size', 'default')
+    max_frame_size = max_datagram_size if buffer_size == 'default' else min(int(buffer_size), max_datagram_size)
+
+    if mode == 'none':
+        return Framer(max_frame_size)
+    if mode == 'delimiter':
+        return DelimiterFramer(parse_delimiter(connection.get('frame_delimiter', '\\n')), max_frame_size)
+    if mode == 'fixed':
+        return FixedLengthFramer(connection.get('frame_length', 0), max_frame_size)
+    if mode == 'length':
+        return LengthPrefixFramer(connection.get('length_prefix_size', 2),
+                                  connection.get('length_prefix_order', 'big'), max_frame_size)
+    if mode == 'slip':
+        return EndMarkerFramer(SLIP_END, max_frame_size)
+    if mode == 'cobs':
+        return EndMarkerFramer(COBS_DELIMITER, max_frame_size)
+    if mode == 'idle':
+        return IdleGapFramer(connection.get('frame_idle_ms', 5.0) / 1000.0, max_frame_size)
+    raise ValueError(f"Unknown framing mode: {mode}")
@@ -0,0 +1,71 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Flipped at runtime (SIGUSR1 in app_cli.py) to turn payload logging on or off for every connection
+payload_logging = threading.Event()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: when the queue is full the record is counted and dropped."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def start_log_pipeline(logger, handlers, max_records=10000):
+    """Move the given handlers onto a background QueueListener so callers only pay for an enqueue."""
+    log_queue = queue.Queue(max_records)
+    queue_handler = DroppingQueueHandler(log_queue)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return queue_handler, listener
+
+
+class PayloadLogger:
+    """Rate-limited, sampled payload logging for one connection.
+
+    Logs every `sample`-th payload, at most `rate` lines per second, and only while payload_logging
+    is set. When it is off a call costs one Event check, so it can stay on the forwarding path.
+    """
+
+    def __init__(self, name, rate=10.0, sample=1, switch=payload_logging):
+        self.name = name
+        self.rate = rate
+        self.sample = max(1, sample)
+        self.switch = switch
+        self.tokens = rate
+        self.last_refill = time.monotonic()
+        self.seen = 0
+        self.suppressed = 0
+
+    def log(self, direction, data):
+        if not self.switch.is_set():
+            return
+        self.seen += 1
+        if self.seen % self.sample:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens < 1:
+            self.suppressed += 1
+            return
+        self.tokens -= 1
+        # Copy now: data may be a view of a buffer that is reused before the listener formats the record
+        logging.getLogger().info("%s %s: %r", self.name, direction, bytes(data))
@@ -0,0 +1,332 @@
+import json
+import socket
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'serial_udp_bridge'
+
+# Upper bounds of the histogram buckets; observations above the last bound land in +Inf
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+READ_SIZE_BUCKETS = tuple(2 ** i for i in range(17))
+
+
+class Histogram:
+    """Fixed-bucket histogram. observe() is one bisect and three increments, so it can sit on the hot path."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None when empty or in the +Inf bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class ConnectionMetrics:
+    """Counters and histograms for one connection.
+
+    Each value is written by a single forwarding thread (or the asyncio loop) and only read by the
+    exporters, so updates are plain attribute increments without a lock. Counters that other objects
+    already keep - batcher, receiver, write queue - are exported through register() instead of
+    being counted twice.
+    """
+
+    def __init__(self, name=''):
+        self.name = name
+        self.serial_tx_bytes = 0
+        self.serial_tx_writes = 0
+        self.serial_write_errors = 0
+        self.forward_errors = 0
+        self.read_sizes = Histogram(READ_SIZE_BUCKETS)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        # One-way bridge-to-bridge delay above the best case seen (sequence headers only)
+        self.link_delay = Histogram(LATENCY_BUCKETS)
+        # metric name -> (kind, help, callable returning the current value)
+        self.functions = {}
+
+    def serial_read(self, size):
+        # A read that found nothing ready is not a read size
+        if size:
+            self.read_sizes.observe(size)
+
+    def serial_wrote(self, size):
+        self.serial_tx_bytes += size
+        self.serial_tx_writes += 1
+
+    def register(self, name, function, kind='counter', help_text=''):
+        self.functions[name] = (kind, help_text, function)
+
+    def track_batcher(self, batcher):
+        self.register('udp_tx_packets_total', lambda: batcher.datagrams, help_text='Datagrams sent to the target')
+        self.register('udp_tx_bytes_total', lambda: batcher.bytes, help_text='Payload bytes sent to the target')
+        self.register('udp_tx_syscalls_total', lambda: batcher.syscalls, help_text='send/sendmmsg calls')
+        self.register('udp_send_errors_total', lambda: batcher.dropped,
+                      help_text='Datagrams dropped because the send failed')
+
+    def track_receivers(self, receivers):
+        """Export the summed counters of every listen port's receiver."""
+        self.register('udp_rx_packets_total', lambda: sum(r.datagrams for r in receivers),
+                      help_text='Datagrams received')
+        self.register('udp_rx_bytes_total', lambda: sum(r.bytes for r in receivers),
+                      help_text='Payload bytes received')
+        self.register('udp_rx_truncated_total', lambda: sum(r.truncated for r in receivers),
+                      help_text='Datagrams larger than max_datagram_size')
+
+    def track_envelope_batcher(self, batcher):
+        if not hasattr(batcher, 'envelopes'):
+            return
+        self.register('envelope_frames_total', lambda: batcher.frames, help_text='Frames packed into envelopes')
+        self.register('envelopes_sent_total', lambda: batcher.envelopes, help_text='Envelopes sent')
+        self.register('envelope_raw_bytes_total', lambda: batcher.raw_bytes,
+                      help_text='Envelope bytes before compression')
+        self.register('envelope_wire_bytes_total', lambda: batcher.wire_bytes,
+                      help_text='Envelope bytes after compression')
+
+    def track_envelope_decoder(self, decoder):
+        if decoder is None:
+            return
+        self.register('envelopes_received_total', lambda: decoder.envelopes, help_text='Envelopes decoded')
+        self.register('envelope_decode_errors_total', lambda: decoder.errors,
+                      help_text='Datagrams dropped because they were not valid envelopes')
+
+    def track_sequence(self, receivers):
+        """Export the summed counters of the connection's SequenceReceivers."""
+        receivers = [receiver for receiver in receivers if receiver is not None]
+        if not receivers:
+            return
+        for name, attribute, help_text in (
+                ('link_lost_total', 'lost', 'Sequence numbers never received'),
+                ('link_duplicates_total', 'duplicates', 'Duplicate datagrams dropped'),
+                ('link_reordered_total', 'reordered', 'Datagrams that arrived ahead of a gap'),
+                ('link_late_total', 'late', 'Datagrams dropped because they arrived after their gap was skipped'),
+                ('link_resyncs_total', 'resyncs', 'Peer sequence restarts'),
+                ('link_header_errors_total', 'errors', 'Datagrams without a valid sequence header')):
+            self.register(name, lambda attribute=attribute: sum(getattr(r, attribute) for r in receivers),
+                          help_text=help_text)
+
+    def track_serial_link(self, link):
+        self.register('serial_connected', lambda: int(link.serial is not None), 'gauge',
+                      'Whether the serial device is currently open')
+        self.register('serial_disconnects_total', lambda: link.disconnects,
+                      help_text='Times the serial device went away')
+        self.register('serial_reconnects_total', lambda: link.reconnects,
+                      help_text='Times the serial device was reopened')
+        self.register('serial_offline_dropped_total', lambda: link.dropped,
+                      help_text='Datagrams discarded while the serial device was down')
+
+    def track_write_queue(self, write_queue):
+        self.register('write_queue_bytes', lambda: write_queue.queued_bytes, 'gauge',
+                      'Bytes waiting to be written to the serial port')
+        self.register('write_queue_dropped_total', lambda: write_queue.dropped,
+                      help_text='Datagrams dropped by the write queue policy')
+
+    def track_recorder(self, recorder):
+        if recorder is None:
+            return
+        self.register('record_frames_total', lambda: recorder.frames, help_text='Frames written to the capture')
+        self.register('record_bytes_total', lambda: recorder.bytes, help_text='Payload bytes written to the capture')
+        self.register('record_dropped_total', lambda: recorder.dropped,
+                      help_text='Frames not captured because the recorder fell behind or failed')
+
+    def samples(self):
+        """(metric name, kind, help, value) for every scalar metric of the connection."""
+        samples = [
+            ('serial_rx_bytes_total', 'counter', 'Bytes read from the serial port', self.read_sizes.sum),
+            ('serial_reads_total', 'counter', 'Serial read calls that returned data', self.read_sizes.count),
+            ('serial_tx_bytes_total', 'counter', 'Bytes written to the serial port', self.serial_tx_bytes),
+            ('serial_tx_writes_total', 'counter', 'Serial write calls', self.serial_tx_writes),
+            ('serial_write_errors_total', 'counter', 'Serial writes that failed', self.serial_write_errors),
+            ('serial_forward_errors_total', 'counter', 'Serial reads whose frames could not be handed to the UDP side',
+             self.forward_errors),
+        ]
+        for name, (kind, help_text, function) in list(self.functions.items()):
+            samples.append((name, kind, help_text, function()))
+        return samples
+
+    def histograms(self):
+        return (('serial_read_bytes', 'Size of each serial read', self.read_sizes),
+                ('serial_to_udp_latency_seconds', 'Serial arrival to UDP send', self.latency),
+                ('link_delay_seconds', 'One-way delay from the peer bridge above the smallest seen', self.link_delay))
+
+    def snapshot(self):
+        """Plain dict of every value, for the JSON stats packet."""
+        snapshot = {name: value for name, _, _, value in self.samples()}
+        snapshot['serial_to_udp_latency_p50_seconds'] = self.latency.quantile(0.5)
+        snapshot['serial_to_udp_latency_p99_seconds'] = self.latency.quantile(0.99)
+        snapshot['serial_read_size_p50_bytes'] = self.read_sizes.quantile(0.5)
+        if self.link_delay.count:
+            snapshot['link_delay_p99_seconds'] = self.link_delay.quantile(0.99)
+        return snapshot
+
+    def export(self):
+        """Picklable copy of every value, for handing to another process."""
+        return {
+            'name': self.name,
+            'samples': self.samples(),
+            'histograms': {name: (list(histogram.counts), histogram.sum, histogram.count)
+                           for name, _, histogram in self.histograms()},
+        }
+
+
+class ExportedMetrics(ConnectionMetrics):
+    """Read-only ConnectionMetrics rebuilt from export() of a worker process."""
+
+    def __init__(self, exported):
+        super().__init__(exported['name'])
+        self.exported_samples = exported['samples']
+        for name, _, histogram in self.histograms():
+            histogram.counts, histogram.sum, histogram.count = exported['histograms'][name]
+
+    def samples(self):
+        return self.exported_samples
+
+
+class MetricsRegistry:
+    """Current ConnectionMetrics of every connection, keyed by connection name."""
+
+    def __init__(self):
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def connection(self, name):
+        """Fresh metrics for a connection that is (re)starting; a restart resets its counters."""
+        metrics = ConnectionMetrics(name)
+        with self.lock:
+            self.connections[name] = metrics
+        return metrics
+
+    def update(self, exported):
+        """Replace a connection's metrics with the latest export() received from a worker process."""
+        metrics = ExportedMetrics(exported)
+        with self.lock:
+            self.connections[metrics.name] = metrics
+
+    def remove(self, name):
+        """Forget a connection that a config reload removed."""
+        with self.lock:
+            self.connections.pop(name, None)
+
+    def current(self):
+        with self.lock:
+            return list(self.connections.values())
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        families = {}
+        for metrics in self.current():
+            label = '{connection="%s"}' % escape_label(metrics.name)
+            for name, kind, help_text, value in metrics.samples():
+                family = families.setdefault(name, (kind, help_text, []))
+                family[2].append(f"{PREFIX}_{name}{label} {value}")
+            for name, help_text, histogram in metrics.histograms():
+                family = families.setdefault(name, ('histogram', help_text, []))
+                family[2].extend(render_histogram(f"{PREFIX}_{name}", metrics.name, histogram))
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {metrics.name: metrics.snapshot() for metrics in self.current()}
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_histogram(name, connection, histogram):
+    connection = escape_label(connection)
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{connection="{connection}",le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{connection="{connection}",le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{connection="{connection}"}} {histogram.sum}')
+    lines.append(f'{name}_count{{connection="{connection}"}} {histogram.count}')
+    return lines
+
+
+# Shared by every connection of the process, like payload_logging in log_pipeline.py
+registry = MetricsRegistry()
+
+
+def start_metrics_server(registry, bind='127.0.0.1', port=9108):
+    """Serve registry.render() at http://bind:port/metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would otherwise flood the bridge log
+            pass
+
+    server = ThreadingHTTPServer((bind, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class StatsReporter:
+    """Sends registry.snapshot() as one JSON datagram to host:port every interval seconds."""
+
+    def __init__(self, registry, target, interval=5.0):
+        self.registry = registry
+        self.target = target
+        self.interval = interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics-udp", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            packet = json.dumps({'time': time.time(), 'connections': self.registry.snapshot()}).encode()
+            try:
+                self.sock.sendto(packet, self.target)
+            except OSError:
+                # The collector may not be up yet; the next interval tries again
+                pass
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.sock.close()
+
+
+def parse_target(value):
+    """'host:port' -> (host, port)."""
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import configparser
+import json
 import socket
 import threading
 import subprocess
@@ -8,15 +10,34 @@ import signal
 import os
 import time
 
+from control_api import DEFAULT_SOCKET, ControlClient, ControlError
+from control_protocol import CONTROL_PORT, AckCache, decode_request, encode_ack, is_control_packet
+
 # Configure logging
 logging.basicConfig(filename='/var/log/packet_listener.log', level=logging.DEBUG,
                     format='%(asctime)s %(levelname)s: %(message)s')
 
 stop_event = threading.Event()
 start_process = None  # Global variable to track the 'app_cli.py' subprocess
-current_target_ip = None  # To track the IP from which the start packet was received
+current_target_ip = None  # The client the 'app_cli.py' subprocess sends to
 monitor_thread = None  # Global variable to track the monitor thread
 lock = threading.Lock()  # Lock to synchronize access to global variables
+# Client target IP -> session: 'mode' ('daemon' or 'process'), 'connections' it is attached to, 'since' (epoch)
+sessions = {}
+# Seconds a stop waits after SIGINT and then after SIGTERM before killing app_cli.py, so the stop is
+# acknowledged within the client's retransmit budget (about 3 s)
+STOP_SIGINT_WAIT = 1.0
+STOP_SIGTERM_WAIT = 0.5
+
+
+def read_control_socket(config_path='config_cli.ini'):
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    return config.get('Common', 'control_socket', fallback=DEFAULT_SOCKET)
+
+
+control = ControlClient(read_control_socket())
+acks = AckCache()
 
 
 def monitor_subprocess():
@@ -43,10 +64,11 @@ def monitor_subprocess():
             msg = f"app_cli.py exited properly with code {exit_code}. INFO: {stderr.strip() or stdout.strip()}"
             send_error_packet(current_target_ip, msg, "INFO")
 
-        # Transition back to waiting for start mode
+        # The session that owned the process is over
         with lock:
             start_process = None
-        logging.info("Transitioning back to waiting for start mode")
+            sessions.pop(current_target_ip, None)
+        logging.info(f"Session of {current_target_ip} ended with app_cli.py")
 
 
 def send_error_packet(target_ip, message, inf="ERROR"):
@@ -54,17 +76,57 @@ def send_error_packet(target_ip, message, inf="ERROR"):
     try:
         udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         error_packet = f"{inf}: {message}".encode()
-        udp_socket.sendto(error_packet, (target_ip, 7000))
+        udp_socket.sendto(error_packet, (target_ip, CONTROL_PORT))
         udp_socket.close()
         logging.info(f"Sent {inf} packet to {target_ip} with msg {error_packet}")
     except Exception as e:
         logging.error(f"Failed to send packet to {target_ip}: {e}")
 
 
-def handle_start(target_ip):
-    """Handle start packet by running the start code from a different Python file."""
-    global start_process, current_target_ip, monitor_thread
+def attached_connections(response, ip):
+    """Names of the daemon connections that send to ip, from a control API response."""
+    return [name for name, status in response['connections'].items() if ip in status['clients']]
+
+
+def handle_start(target_ip, connections=None):
+    """Attach a client: the bridge daemon starts sending the client's connections (default: all) to target_ip.
+
+    Without a daemon, app_cli.py is started for the first client only. Returns (ok, detail) for the
+    control protocol ack.
+    """
+    try:
+        response = control.request('start', target_ip=target_ip, connections=connections)
+    except OSError as e:
+        logging.warning(f"Bridge daemon not reachable ({e}), starting app_cli.py instead")
+        return start_app_cli(target_ip)
+    except ControlError as e:
+        logging.error(f"Bridge daemon refused start: {e}")
+        send_error_packet(target_ip, f"Bridge daemon refused start: {e}")
+        return False, f"Bridge daemon refused start: {e}"
+    names = attached_connections(response, target_ip)
+    with lock:
+        session = sessions.setdefault(target_ip, {'mode': 'daemon', 'since': time.time()})
+        session['connections'] = names
+    failed = [name for name in names if not response['connections'][name]['running']]
+    if failed:
+        error_message = f"Connections failed to start: {', '.join(failed)}"
+        logging.error(error_message)
+        send_error_packet(target_ip, error_message)
+        return False, error_message
+    logging.info(f"Session of {target_ip} attached to {', '.join(names)} ({len(sessions)} sessions)")
+    return True, f"Attached to {len(names)} connections"
+
+
+def start_app_cli(target_ip):
+    """Run the bridge as a one-off app_cli.py process (no resident daemon installed)."""
+    global start_process, monitor_thread, current_target_ip
     with lock:
+        if target_ip in sessions:
+            return True, "Already running"
+        if sessions:
+            # app_cli.py sends to a single target; sharing the serial ports needs the daemon
+            owner = next(iter(sessions))
+            return False, f"app_cli.py is already running for {owner}; install the bridge daemon to share it"
         current_target_ip = target_ip  # Store the target IP
         try:
             # ['sudo', '-S', 'python3', 'app_cli.py', '--target-ip', target_ip, 'start']
@@ -84,32 +146,77 @@ def handle_start(target_ip):
 
             logging.info(f"Successfully started app_cli.py with target IP {target_ip}")
             logging.info(f"Subprocess PID: {start_process.pid}")  # Log the PID for debug purposes.
+            sessions[target_ip] = {'mode': 'process', 'since': time.time(), 'connections': []}
             monitor_thread = threading.Thread(target=monitor_subprocess)
             monitor_thread.start()
+            return True, f"Started app_cli.py (pid {start_process.pid})"
         except Exception as e:
             logging.error(f"Failed to run app_cli.py: {e}")
+            return False, f"Failed to run app_cli.py: {e}"
 
 
-def handle_stop():
-    """Handle stop packet by running the stop code from a different Python file."""
-    global start_process, monitor_thread
+def handle_stop(target_ip=None, connections=None):
+    """Detach a client from its connections (default: all of them); without target_ip, stop every session.
+
+    The daemon keeps running connections that other clients are still attached to. Returns (ok, detail).
+    """
+    with lock:
+        session = sessions.get(target_ip) if target_ip else None
+        daemon_sessions = [ip for ip, s in sessions.items() if s['mode'] == 'daemon']
+    if target_ip is not None and session is None:
+        return True, "Already stopped"
+
+    if (session or {}).get('mode') == 'daemon' or (target_ip is None and daemon_sessions):
+        try:
+            response = control.request('stop', target_ip=target_ip, connections=connections)
+        except (OSError, ControlError) as e:
+            logging.error(f"Failed to detach {target_ip or 'all sessions'} from the bridge daemon: {e}")
+            if target_ip:
+                send_error_packet(target_ip, f"Failed to stop the bridge: {e}")
+            return False, f"Failed to stop the bridge: {e}"
+        with lock:
+            for ip in [target_ip] if target_ip else daemon_sessions:
+                names = attached_connections(response, ip)
+                if names:
+                    sessions[ip]['connections'] = names
+                else:
+                    sessions.pop(ip, None)
+                    if ip != target_ip:
+                        # The client that asked already has the acknowledgement
+                        send_error_packet(ip, "Bridge stopped", "INFO")
+            remaining = len(sessions)
+        logging.info(f"Session of {target_ip or 'every client'} detached, {remaining} sessions left")
+        return True, "Bridge stopped"
+    return stop_app_cli()
+
+
+def stop_app_cli():
+    global monitor_thread
     with lock:
         process = start_process
         thread = monitor_thread
 
+    result = True, "Bridge stopped"
     if process and process.poll() is None:  # Check if the process is still running
         try:
             logging.info("Trying to stop app_cli.py with SIGINT")
             os.killpg(process.pid, signal.SIGINT)  # Send SIGINT to the subprocess
-            time.sleep(2)
-            if process.poll() is None:
+            try:
+                # Returns as soon as the bridge has closed its ports instead of always sleeping
+                process.wait(timeout=STOP_SIGINT_WAIT)
+            except subprocess.TimeoutExpired:
                 logging.info("Trying to stop app_cli.py with SIGTERM")
                 os.killpg(process.pid, signal.SIGTERM)
-                time.sleep(1)
-            process.wait()  # Wait for the subprocess to handle the signal and exit
+                try:
+                    process.wait(timeout=STOP_SIGTERM_WAIT)
+                except subprocess.TimeoutExpired:
+                    logging.warning("app_cli.py ignored SIGTERM, killing it")
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
             logging.info("Successfully stopped app_cli.py")
         except Exception as e:
             logging.error(f"Failed to stop app_cli.py: {e}")
+            result = False, f"Failed to stop app_cli.py: {e}"
     else:
         logging.warning("No running app_cli.py process found to stop")
 
@@ -118,22 +225,117 @@ def handle_stop():
         thread.join()
         with lock:
             monitor_thread = None
+    return result
+
+
+def handle_reload():
+    """Handle reload packet: the bridge re-reads its config and restarts only changed connections.
+
+    Returns (ok, detail).
+    """
+    with lock:
+        process = start_process
+        modes = {session['mode'] for session in sessions.values()}
 
+    if 'daemon' in modes:
+        try:
+            control.request('reconfigure')
+            logging.info("Asked the bridge daemon to reload its config")
+            return True, "Config reloaded"
+        except (OSError, ControlError) as e:
+            logging.error(f"Failed to reload the bridge daemon: {e}")
+            return False, f"Failed to reload the bridge: {e}"
+    elif process and process.poll() is None:
+        try:
+            os.killpg(process.pid, signal.SIGHUP)
+            logging.info("Asked app_cli.py to reload its config")
+            return True, "Reload requested"
+        except Exception as e:
+            logging.error(f"Failed to reload app_cli.py: {e}")
+            return False, f"Failed to reload app_cli.py: {e}"
+    else:
+        logging.warning("No running app_cli.py process found to reload")
+        return False, "Bridge is not running"
+
+
+def sync_sessions():
+    """Forget the session of an app_cli.py process that exited on its own, so its client can start again."""
+    with lock:
+        process = start_process
+        stale = [ip for ip, session in sessions.items()
+                 if session['mode'] == 'process' and (process is None or process.poll() is not None)]
+        for ip in stale:
+            del sessions[ip]
+    for ip in stale:
+        logging.info(f"Bridge process of {ip} is no longer running, session closed")
+
+
+def bridge_status(target_ip):
+    """JSON status for the requesting client: its state, every session and the daemon's connections."""
+    with lock:
+        status = {
+            'state': 'running' if target_ip in sessions else 'stopped',
+            'sessions': {ip: dict(session) for ip, session in sessions.items()},
+        }
+    try:
+        response = control.request('status')
+        status['connections'] = {name: {'running': connection['running'], 'clients': connection['clients']}
+                                 for name, connection in response['connections'].items()}
+    except (OSError, ControlError) as e:
+        status['daemon_error'] = str(e)
+    return True, json.dumps(status)
 
-def handle_packet(data, addr, current_state):
-    """Process the received packet based on the current state."""
+
+def handle_command(command, ip, connections=None):
+    """Run a command for the client at ip and return (ok, detail) for its ack.
+
+    Every client has its own session, so a start from a second station attaches it instead of
+    being rejected. Start and stop are idempotent, so a client that retries with a new request
+    after a lost ack still ends up in the state it asked for.
+    """
+    sync_sessions()
+    if command == 'start':
+        return handle_start(ip, connections)
+    if command == 'stop':
+        return handle_stop(ip, connections)
+    if command == 'reload':
+        return handle_reload()
+    return bridge_status(ip)
+
+
+def handle_control_packet(data, addr, listen_socket):
+    """Answer a binary control request with an ack sent back to the requesting address."""
+    try:
+        command, request_id, ip, connections = decode_request(data)
+    except ValueError as e:
+        logging.warning(f"Ignoring control packet from {addr}: {e}")
+        return
+    ack = acks.get(addr, request_id)
+    if ack is None:
+        if ip == '0.0.0.0':
+            ip = addr[0]
+        logging.info(f"Received {command} request {request_id:#010x} from {addr} for {ip}")
+        try:
+            ok, detail = handle_command(command, ip, connections or None)
+        except Exception as e:
+            logging.error(f"Error handling {command} request: {e}")
+            ok, detail = False, str(e)
+        ack = encode_ack(request_id, ok, detail)
+        acks.put(addr, request_id, ack)
+    else:
+        logging.info(f"Repeated {command} request {request_id:#010x} from {addr}, resending ack")
+    listen_socket.sendto(ack, addr)
+
+
+def handle_packet(data, addr):
+    """Process a text "<ip> <command>" packet for the session of that ip."""
     try:
         message = data.decode()
         ip, command = message.split(' ')
 
-        if current_state['waiting_for'] == 'start' and command == "start":
-            logging.info(f"Received start packet from {ip}")
-            handle_start(ip)
-            current_state['waiting_for'] = 'stop'
-        elif current_state['waiting_for'] == 'stop' and command == "stop":
-            logging.info(f"Received stop packet from {ip}")
-            handle_stop()
-            current_state['waiting_for'] = 'start'
+        if command in ("start", "stop", "reload"):
+            logging.info(f"Received {command} packet from {ip}")
+            handle_command(command, ip)
         else:
             logging.warning(f"Unexpected command received: {command}")
     except Exception as e:
@@ -141,17 +343,22 @@ def handle_packet(data, addr, current_state):
 
 
 def listener():
-    """Listen for packets on port 7000 and handle state transitions."""
+    """Listen for packets on port 7000 and dispatch them to the sender's session."""
     listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    listen_socket.bind(('', 7000))  # Hard coded default port.
-
-    current_state = {'waiting_for': 'start'}
+    listen_socket.bind(('', CONTROL_PORT))
+    # Wake up regularly so a stop signal ends the loop even when no packet arrives
+    listen_socket.settimeout(1.0)
 
     try:
         while not stop_event.is_set():
-            data, addr = listen_socket.recvfrom(1024)
-            if data:
-                handle_packet(data, addr, current_state)
+            try:
+                data, addr = listen_socket.recvfrom(2048)
+            except socket.timeout:
+                continue
+            if is_control_packet(data):
+                handle_control_packet(data, addr, listen_socket)
+            elif data:
+                handle_packet(data, addr)
     except Exception as e:
         logging.error(f"Error in listener: {e}")
     finally:
@@ -162,9 +369,10 @@ def listener():
 def signal_handler(sig, frame):
     logging.info(f"Received signal {sig}, shutting down.")
     stop_event.set()
+    sync_sessions()
     with lock:
-        process = start_process
-    if process and process.poll() is None:  # If start process is still running, stop it
+        running = bool(sessions)
+    if running:  # If the bridge is still running for anyone, stop it
         handle_stop()
 
 
@@ -0,0 +1,259 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger()
+
+# Segment file: header, then one record per frame. Sidecar .idx file: fixed-size index entries.
+SEGMENT_MAGIC = b'SUBCAP'
+SEGMENT_VERSION = 1
+SEGMENT_SUFFIX = '.cap'
+INDEX_SUFFIX = '.idx'
+# Header: magic, version, wall-clock time of the first record in ns
+SEGMENT_HEADER = struct.Struct('!6sBxQ')
+# Record: wall-clock time in ns, direction, payload length; followed by the payload
+RECORD = struct.Struct('!QBI')
+# Index entry: time of a record and its offset in the segment
+INDEX_ENTRY = struct.Struct('!QQ')
+
+SERIAL_TO_UDP = 0
+UDP_TO_SERIAL = 1
+DIRECTIONS = {SERIAL_TO_UDP: 'serial->udp', UDP_TO_SERIAL: 'udp->serial'}
+
+# Index entries are written at least this often, so a seek never scans more than one gap
+INDEX_MAX_BYTES = 65536
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def segment_name(timestamp_ns):
+    """Sortable file name for a segment whose first record is at timestamp_ns, e.g. 20261016-120000.123456789.cap."""
+    seconds, nanoseconds = divmod(timestamp_ns, 1000000000)
+    return f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(seconds))}.{nanoseconds:09d}{SEGMENT_SUFFIX}"
+
+
+def capture_directory(base, name):
+    """Directory holding the segments of one connection."""
+    return os.path.join(base, name.replace(os.sep, '_'))
+
+
+class Recorder:
+    """Appends the frames of one connection, both directions, to rotating binary segment files.
+
+    record() is what the forwarding path pays: a timestamp, a 13-byte header and a copy of the
+    frame appended to a pending list. A writer thread hands the list to a buffered file every
+    flush_interval, adds an index entry every index_interval (or INDEX_MAX_BYTES) and starts a new
+    segment once the current one reaches segment_bytes or segment_seconds. When the disk cannot
+    keep up and max_queued_bytes are pending, frames are dropped and counted instead of slowing
+    the bridge down.
+    """
+
+    def __init__(self, directory, segment_bytes=64 << 20, segment_seconds=3600.0, max_segments=0,
+                 index_interval=1.0, max_queued_bytes=4 << 20, flush_interval=0.1):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_ns = int(segment_seconds * 1e9)
+        self.max_segments = max_segments
+        self.index_ns = int(index_interval * 1e9)
+        self.max_queued_bytes = max_queued_bytes
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending = []
+        self.queued_bytes = 0
+        self.closed = False
+        self.wake = threading.Event()
+        self.segment = None
+        self.index = None
+        self.segment_start = 0
+        self.offset = 0
+        self.next_index = 0
+        self.indexed_offset = 0
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.segments = 0
+        self.thread = threading.Thread(target=self.run, name="recorder", daemon=True)
+        self.thread.start()
+
+    def record(self, direction, data):
+        """Queue one frame. data may be a memoryview of a buffer that is reused afterwards; it is copied here."""
+        record = RECORD.pack(time.time_ns(), direction, len(data)) + data
+        with self.lock:
+            if self.closed or self.queued_bytes + len(record) > self.max_queued_bytes:
+                self.dropped += 1
+                return
+            self.pending.append(record)
+            self.queued_bytes += len(record)
+
+    def run(self):
+        try:
+            while True:
+                self.wake.wait(self.flush_interval)
+                with self.lock:
+                    records, self.pending = self.pending, []
+                    self.queued_bytes = 0
+                    closed = self.closed
+                if records:
+                    self.write(records)
+                    self.segment.flush()
+                    self.index.flush()
+                if closed:
+                    break
+        except Exception as e:
+            logger.error(f"Error in recorder for {self.directory}, recording stopped: {e}")
+            with self.lock:
+                self.closed = True
+                self.pending = []
+        finally:
+            self.close_segment()
+
+    def write(self, records):
+        for record in records:
+            timestamp, _, length = RECORD.unpack_from(record)
+            if self.segment is None or self.offset >= self.segment_bytes or \
+                    timestamp - self.segment_start >= self.segment_ns:
+                self.open_segment(timestamp)
+            if timestamp >= self.next_index or self.offset - self.indexed_offset >= INDEX_MAX_BYTES:
+                self.index.write(INDEX_ENTRY.pack(timestamp, self.offset))
+                self.next_index = timestamp + self.index_ns
+                self.indexed_offset = self.offset
+            self.segment.write(record)
+            self.offset += len(record)
+            self.frames += 1
+            self.bytes += length
+
+    def open_segment(self, timestamp):
+        self.close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, segment_name(timestamp))
+        self.segment = open(path, 'xb', buffering=WRITE_BUFFER_SIZE)
+        self.index = open(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'xb')
+        self.segment.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, timestamp))
+        self.segment_start = timestamp
+        self.offset = self.indexed_offset = SEGMENT_HEADER.size
+        self.next_index = 0
+        self.segments += 1
+        if self.max_segments:
+            self.remove_old_segments()
+
+    def close_segment(self):
+        for file in (self.segment, self.index):
+            if file is not None:
+                file.close()
+        self.segment = self.index = None
+
+    def remove_old_segments(self):
+        for path in list_segments(self.directory)[:-self.max_segments]:
+            for stale in (path, path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX):
+                try:
+                    os.unlink(stale)
+                except OSError:
+                    pass
+
+    def close(self):
+        """Write what is still pending and close the segment."""
+        with self.lock:
+            self.closed = True
+        self.wake.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+def create_recorder(connection):
+    """Recorder for the connection when `record` is on, else None."""
+    if not connection.get('record'):
+        return None
+    return Recorder(capture_directory(connection.get('record_dir', 'captures'), connection['name']),
+                    segment_bytes=int(connection.get('record_segment_mb', 64) * (1 << 20)),
+                    segment_seconds=connection.get('record_segment_minutes', 60.0) * 60.0,
+                    max_segments=connection.get('record_max_segments', 0),
+                    index_interval=connection.get('record_index_ms', 1000.0) / 1000.0,
+                    max_queued_bytes=connection.get('record_queue_bytes', 4 << 20))
+
+
+def list_segments(directory):
+    """Segment paths of one connection's capture, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names) if name.endswith(SEGMENT_SUFFIX)]
+
+
+def segment_start(path):
+    """Time of the first record in a segment, in ns. Raises ValueError if the file is not a segment."""
+    with open(path, 'rb') as segment:
+        header = segment.read(SEGMENT_HEADER.size)
+    if len(header) < SEGMENT_HEADER.size:
+        raise ValueError(f"{path}: short segment header")
+    magic, version, start = SEGMENT_HEADER.unpack(header)
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+        raise ValueError(f"{path}: not a capture segment")
+    return start
+
+
+def load_index(path):
+    """(times, offsets) of a segment's index; an empty index means scan from the first record."""
+    try:
+        with open(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'rb') as index:
+            data = index.read()
+    except OSError:
+        return [], []
+    # A crash can leave a partial last entry
+    entries = list(INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size]))
+    return [entry[0] for entry in entries], [entry[1] for entry in entries]
+
+
+def read_segment(path, start_ns=None, end_ns=None):
+    """Yield (time ns, direction, payload) of the records in one segment between start_ns and end_ns.
+
+    The index takes the read to the last entry before start_ns; from there records are parsed
+    straight out of a read-only mmap of the file. A truncated last record (the writer was killed,
+    or is still writing) ends the segment.
+    """
+    offset = SEGMENT_HEADER.size
+    if start_ns is not None:
+        times, offsets = load_index(path)
+        position = bisect.bisect_right(times, start_ns) - 1
+        if position >= 0:
+            offset = offsets[position]
+    with open(path, 'rb') as segment:
+        if os.fstat(segment.fileno()).st_size <= offset:
+            return
+        with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            while offset + RECORD.size <= size:
+                timestamp, direction, length = RECORD.unpack_from(data, offset)
+                payload_start = offset + RECORD.size
+                offset = payload_start + length
+                if offset > size:
+                    return
+                if end_ns is not None and timestamp >= end_ns:
+                    return
+                if start_ns is None or timestamp >= start_ns:
+                    yield timestamp, direction, data[payload_start:offset]
+
+
+def read_capture(directory, start=None, end=None):
+    """Yield (time ns, direction, payload) of every record in a connection's capture in [start, end).
+
+    start and end are Unix times in seconds (None = open-ended). Segments that end before start are
+    skipped by their header time alone, so slicing a long capture only reads the segments it covers.
+    """
+    start_ns = None if start is None else int(start * 1e9)
+    end_ns = None if end is None else int(end * 1e9)
+    segments = []
+    for path in list_segments(directory):
+        try:
+            segments.append((segment_start(path), path))
+        except (OSError, ValueError) as e:
+            logger.error(f"Skipping capture segment {path}: {e}")
+    for position, (first, path) in enumerate(segments):
+        if end_ns is not None and first >= end_ns:
+            return
+        if start_ns is not None and position + 1 < len(segments) and segments[position + 1][0] <= start_ns:
+            continue
+        yield from read_segment(path, start_ns, end_ns)
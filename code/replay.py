@@ -0,0 +1,230 @@
+import os
+import pty
+import select
+import socket
+import struct
+import time
+import tty
+
+from recorder import SEGMENT_SUFFIX, read_capture, read_segment
+
+# time.sleep() overshoots by up to a scheduler tick; the last stretch before a frame is due is spun instead
+SPIN_SECONDS = 0.0005
+
+# Global header: magic, version, zone, accuracy, snap length, link type
+PCAP_HEADER_SIZE = 24
+# Packet header: seconds, fraction, captured length, original length
+PCAP_RECORD = 'IIII'
+# Magic number -> nanoseconds per unit of the timestamp fraction (micro- or nanosecond files)
+PCAP_MAGIC = {0xa1b2c3d4: 1000, 0xa1b23c4d: 1}
+PCAPNG_MAGIC = 0x0a0d0d0a
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_LINUX_SLL2 = 276
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+IPPROTO_UDP = 17
+
+
+def read_pcap(path):
+    """Yield (time ns, destination port, payload) of every UDP datagram in a classic libpcap file, one at a time.
+
+    Handles Ethernet (with VLAN tags), Linux cooked, raw IP and BSD loopback link types. Packets
+    that are not UDP, fragments and packets cut short by the snap length are skipped.
+    """
+    with open(path, 'rb') as capture:
+        header = capture.read(PCAP_HEADER_SIZE)
+        if len(header) < PCAP_HEADER_SIZE:
+            raise ValueError(f"{path}: not a pcap file")
+        if struct.unpack_from('<I', header)[0] == PCAPNG_MAGIC:
+            raise ValueError(f"{path}: pcapng is not supported, convert it with: editcap -F pcap in.pcapng out.pcap")
+        # The writer's byte order is whichever one makes the magic number readable
+        for order in '<>':
+            fraction_ns = PCAP_MAGIC.get(struct.unpack_from(order + 'I', header)[0])
+            if fraction_ns is not None:
+                break
+        else:
+            raise ValueError(f"{path}: not a pcap file")
+        link_type = struct.unpack_from(order + 'I', header, 20)[0] & 0x0fffffff
+        record = struct.Struct(order + PCAP_RECORD)
+        while True:
+            packet_header = capture.read(record.size)
+            if len(packet_header) < record.size:
+                return
+            seconds, fraction, captured, original = record.unpack(packet_header)
+            packet = capture.read(captured)
+            if len(packet) < captured:
+                return
+            if captured < original:
+                continue
+            datagram = udp_datagram(link_type, packet)
+            if datagram is not None:
+                yield (seconds * 1000000000 + fraction * fraction_ns,) + datagram
+
+
+def udp_datagram(link_type, packet):
+    """(destination port, payload) of a captured UDP packet, or None for anything else."""
+    if link_type in (LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL, LINKTYPE_LINUX_SLL2):
+        # Link header size and where its EtherType field is
+        offset, type_offset = {LINKTYPE_ETHERNET: (14, 12), LINKTYPE_LINUX_SLL: (16, 14),
+                               LINKTYPE_LINUX_SLL2: (20, 0)}[link_type]
+        if len(packet) < offset:
+            return None
+        ethertype = struct.unpack_from('!H', packet, type_offset)[0]
+        while link_type == LINKTYPE_ETHERNET and ethertype in ETHERTYPE_VLAN and len(packet) >= offset + 4:
+            ethertype = struct.unpack_from('!H', packet, offset + 2)[0]
+            offset += 4
+    elif link_type == LINKTYPE_NULL:
+        if len(packet) < 4:
+            return None
+        family = struct.unpack_from('=I', packet)[0]
+        offset, ethertype = 4, ETHERTYPE_IPV4 if family == socket.AF_INET else ETHERTYPE_IPV6
+    elif link_type in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        if not packet:
+            return None
+        offset, ethertype = 0, ETHERTYPE_IPV4 if packet[0] >> 4 == 4 else ETHERTYPE_IPV6
+    else:
+        raise ValueError(f"unsupported pcap link type {link_type}")
+    if ethertype == ETHERTYPE_IPV4:
+        if len(packet) < offset + 20:
+            return None
+        header_length = (packet[offset] & 0x0f) * 4
+        flags_fragment = struct.unpack_from('!H', packet, offset + 6)[0]
+        if packet[offset + 9] != IPPROTO_UDP or flags_fragment & 0x3fff:
+            return None
+        offset += header_length
+    elif ethertype == ETHERTYPE_IPV6:
+        # Extension headers are not followed; UDP straight after the fixed header is the common case
+        if len(packet) < offset + 40 or packet[offset + 6] != IPPROTO_UDP:
+            return None
+        offset += 40
+    else:
+        return None
+    if len(packet) < offset + 8:
+        return None
+    port, length = struct.unpack_from('!2xHH', packet, offset)
+    return port, packet[offset + 8:offset + max(length, 8)]
+
+
+def open_source(path, direction=None, start=None, end=None, port=None):
+    """Stream (time ns, direction, payload) from a capture directory, a single .cap segment or a pcap file.
+
+    direction picks one side of a capture; port picks the datagrams of a pcap sent to that UDP port.
+    start and end are Unix times in seconds. Nothing is read ahead of the frame being replayed.
+    """
+    if os.path.isdir(path):
+        frames = read_capture(path, start, end)
+    elif path.endswith(SEGMENT_SUFFIX):
+        frames = read_segment(path, None if start is None else int(start * 1e9),
+                              None if end is None else int(end * 1e9))
+    else:
+        return pcap_frames(path, start, end, port)
+    if direction is None:
+        return frames
+    return (frame for frame in frames if frame[1] == direction)
+
+
+def pcap_frames(path, start=None, end=None, port=None):
+    start_ns = None if start is None else int(start * 1e9)
+    end_ns = None if end is None else int(end * 1e9)
+    for timestamp, destination_port, payload in read_pcap(path):
+        if start_ns is not None and timestamp < start_ns:
+            continue
+        if end_ns is not None and timestamp >= end_ns:
+            return
+        if port is None or destination_port == port:
+            yield timestamp, None, payload
+
+
+class PtySink:
+    """Writes frames to the master side of a new PTY, as a serial device would.
+
+    The bridge opens the slave (or `link`, a symlink to it, such as /dev/ttyUSB0). The slave stays
+    open here too, so the PTY survives the bridge reopening its port. Whatever the bridge writes to
+    the port is read and discarded while waiting, so its writes never block.
+    """
+
+    def __init__(self, link=None):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.name = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            # Replace a link left by an earlier replay, never a real device
+            if os.path.islink(link):
+                os.remove(link)
+            os.symlink(self.name, link)
+        self.discarded = 0
+
+    def send(self, payload):
+        os.write(self.master, payload)
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.master], [], [], timeout)
+        if ready:
+            self.discarded += len(os.read(self.master, 65536))
+
+    def close(self):
+        if self.link:
+            try:
+                os.remove(self.link)
+            except OSError:
+                pass
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class UdpSink:
+    """Sends each frame as one datagram to host:port, as the remote station would."""
+
+    def __init__(self, destination):
+        self.name = f"{destination[0]}:{destination[1]}"
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.connect(destination)
+
+    def send(self, payload):
+        self.socket.send(payload)
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        self.socket.close()
+
+
+def replay(frames, sink, speed=1.0, max_gap=None):
+    """Send frames to sink at their recorded spacing divided by speed (0 = as fast as possible).
+
+    Each frame is scheduled against the first one, so sleep overshoot never accumulates. max_gap
+    (seconds of capture time) shortens long idle stretches. Returns (frames, bytes, seconds, worst
+    lateness in seconds).
+    """
+    count = size = 0
+    worst = 0.0
+    started = origin = previous = None
+    for timestamp, _, payload in frames:
+        if started is None:
+            # Opening the source happens on the first next(); the schedule starts after it
+            started = time.monotonic()
+        if speed > 0:
+            if origin is None:
+                origin = timestamp
+            elif max_gap is not None and timestamp - previous > max_gap * 1e9:
+                origin += timestamp - previous - int(max_gap * 1e9)
+            previous = timestamp
+            due = started + (timestamp - origin) / 1e9 / speed
+            while True:
+                remaining = due - time.monotonic()
+                if remaining <= 0:
+                    break
+                if remaining > SPIN_SECONDS:
+                    sink.wait(remaining - SPIN_SECONDS)
+            worst = max(worst, time.monotonic() - due)
+        sink.send(payload)
+        count += 1
+        size += len(payload)
+    return count, size, time.monotonic() - started if started is not None else 0.0, worst
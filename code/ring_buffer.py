@@ -0,0 +1,65 @@
+import os
+
+import serial
+
+
+class RingBuffer:
+    """Preallocated byte ring that is filled straight from a file descriptor and drained as memoryview slices.
+
+    fill_from() reads with os.readv() into the free region, so serial bytes land in the ring without an
+    intermediate bytes object, and readable() hands out a view of the oldest contiguous data. Callers
+    consume() what they have sent; once the ring is empty both ends snap back to the start so the
+    next read gets the whole buffer.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def free(self):
+        return self.capacity - self.size
+
+    def writable(self):
+        """Contiguous free region after the newest byte."""
+        tail = self.head + self.size
+        if tail >= self.capacity:
+            tail -= self.capacity
+            return self.view[tail:self.head]
+        return self.view[tail:]
+
+    def readable(self):
+        """Contiguous run of the oldest unread bytes (the data may continue at the start of the ring)."""
+        end = min(self.head + self.size, self.capacity)
+        return self.view[self.head:end]
+
+    def fill_from(self, fd, max_bytes=None):
+        """Read whatever the fd has ready into the ring. Returns the number of bytes read (0 if none ready)."""
+        region = self.writable()
+        if max_bytes is not None and len(region) > max_bytes:
+            region = region[:max_bytes]
+        if not region:
+            return 0
+        try:
+            count = os.readv(fd, [region])
+        except (BlockingIOError, InterruptedError):
+            return 0
+        if count == 0:
+            # Same condition pyserial reports: select() said readable but the read hit EOF
+            raise serial.SerialException('device reports readiness to read but returned no data '
+                                         '(device disconnected or multiple access on port?)')
+        self.size += count
+        return count
+
+    def consume(self, count):
+        self.size -= count
+        if self.size == 0:
+            self.head = 0
+        else:
+            self.head = (self.head + count) % self.capacity
@@ -0,0 +1,199 @@
+import struct
+import time
+
+from udp_batch import BatcherWrapper
+
+# Link header: magic byte, 32-bit sequence number, low 32 bits of the sender's monotonic clock in microseconds
+HEADER = struct.Struct('!BII')
+SEQUENCE_MAGIC = 0x5E
+SEQUENCE_MASK = 0xFFFFFFFF
+# A jump larger than this (either way) means the peer restarted, not that packets were lost. Going back by more
+# than the reorder window means the same, unless the sequence is one that was given up as lost
+RESYNC_DISTANCE = 1 << 16
+# Senders tracked per receiver; the least recently added is forgotten beyond this
+MAX_PEERS = 64
+
+
+def monotonic_us():
+    return int(time.monotonic() * 1000000) & SEQUENCE_MASK
+
+
+def sequence_distance(sequence, expected):
+    """Signed distance from expected to sequence, modulo 2**32."""
+    distance = (sequence - expected) & SEQUENCE_MASK
+    return distance - (1 << 32) if distance & 0x80000000 else distance
+
+
+class SequenceBatcher(BatcherWrapper):
+    """Prefixes every datagram with a sequence number and a send timestamp before it reaches the batcher."""
+
+    def __init__(self, batcher):
+        super().__init__(batcher)
+        self.sequence = 0
+
+    def send(self, frame, arrived_at=None):
+        header = HEADER.pack(SEQUENCE_MAGIC, self.sequence, monotonic_us())
+        self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+        self.batcher.send(header + frame, arrived_at)
+
+
+class PeerSequence:
+    """Reorder state for the datagrams of one sender."""
+
+    def __init__(self):
+        self.expected = None
+        # sequence -> payload of datagrams that arrived ahead of a gap
+        self.pending = {}
+        self.gap_since = None
+        # Sequences given up as lost, so a late arrival is not mistaken for a duplicate
+        self.skipped = {}
+        self.base_delay = None
+
+
+class SequenceReceiver:
+    """Strips link headers, restores send order within a small window and drops duplicates.
+
+    A datagram that arrives ahead of a gap waits until the gap fills, until `window` datagrams are
+    waiting, or until the gap is `max_hold` seconds old; then the missing sequences are counted as lost
+    and delivery moves on. Callers fold timeout() into their wait and call flush_expired().
+
+    The sender's clock is unrelated to ours, so one-way delay is measured relative to the smallest
+    delay seen from that peer: `delay` records how much longer than the best case each datagram took.
+    """
+
+    def __init__(self, window=32, max_hold=0.02, delay=None):
+        self.window = window
+        self.max_hold = max_hold
+        self.delay = delay
+        self.peers = {}
+        self.datagrams = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+        self.resyncs = 0
+        self.errors = 0
+
+    def receive(self, data, addr):
+        """Payloads that can be delivered now, in send order."""
+        if len(data) < HEADER.size or data[0] != SEQUENCE_MAGIC:
+            self.errors += 1
+            return []
+        _, sequence, sent_us = HEADER.unpack_from(data)
+        payload = bytes(data[HEADER.size:])
+        self.datagrams += 1
+        peer = self.peer(addr)
+
+        if peer.expected is None:
+            peer.expected = sequence
+        distance = sequence_distance(sequence, peer.expected)
+        if abs(distance) > RESYNC_DISTANCE or (distance < -self.window and sequence not in peer.skipped):
+            delivered = self.resync(peer, sequence)
+            distance = 0
+        else:
+            delivered = []
+        self.record_delay(peer, sent_us)
+
+        if distance < 0:
+            if peer.skipped.pop(sequence, None) is not None:
+                self.late += 1
+            else:
+                self.duplicates += 1
+            return delivered
+        if distance == 0:
+            delivered.append(payload)
+            peer.expected = (peer.expected + 1) & SEQUENCE_MASK
+            delivered.extend(self.drain(peer))
+            return delivered
+        if sequence in peer.pending:
+            self.duplicates += 1
+            return delivered
+        peer.pending[sequence] = payload
+        self.reordered += 1
+        if peer.gap_since is None:
+            peer.gap_since = time.monotonic()
+        if len(peer.pending) >= self.window:
+            delivered.extend(self.skip_gap(peer))
+        return delivered
+
+    def peer(self, addr):
+        peer = self.peers.get(addr)
+        if peer is None:
+            if len(self.peers) >= MAX_PEERS:
+                del self.peers[next(iter(self.peers))]
+            peer = self.peers[addr] = PeerSequence()
+        return peer
+
+    def record_delay(self, peer, sent_us):
+        delay = (monotonic_us() - sent_us) & SEQUENCE_MASK
+        if peer.base_delay is None or delay < peer.base_delay:
+            peer.base_delay = delay
+        if self.delay is not None:
+            self.delay.observe((delay - peer.base_delay) / 1000000.0)
+
+    def drain(self, peer):
+        delivered = []
+        while peer.expected in peer.pending:
+            delivered.append(peer.pending.pop(peer.expected))
+            peer.expected = (peer.expected + 1) & SEQUENCE_MASK
+        peer.gap_since = time.monotonic() if peer.pending else None
+        return delivered
+
+    def skip_gap(self, peer):
+        """Give up on the sequences before the oldest waiting datagram and deliver from there."""
+        first = min(peer.pending, key=lambda sequence: sequence_distance(sequence, peer.expected))
+        while peer.expected != first:
+            self.lost += 1
+            peer.skipped[peer.expected] = True
+            peer.expected = (peer.expected + 1) & SEQUENCE_MASK
+        while len(peer.skipped) > 4 * self.window:
+            del peer.skipped[next(iter(peer.skipped))]
+        return self.drain(peer)
+
+    def resync(self, peer, sequence):
+        """The peer restarted (or jumped far ahead): flush what it had queued and follow the new numbering."""
+        self.resyncs += 1
+        delivered = []
+        while peer.pending:
+            delivered.extend(self.skip_gap(peer))
+        peer.expected = sequence
+        peer.skipped.clear()
+        peer.base_delay = None
+        return delivered
+
+    def timeout(self):
+        """Seconds until the oldest gap expires, or None when nothing is waiting."""
+        gaps = [peer.gap_since for peer in self.peers.values() if peer.gap_since is not None]
+        if not gaps:
+            return None
+        return max(0.0, min(gaps) + self.max_hold - time.monotonic())
+
+    def flush_expired(self):
+        """Payloads released because their gap waited max_hold without being filled."""
+        delivered = []
+        now = time.monotonic()
+        for peer in self.peers.values():
+            if peer.gap_since is not None and now - peer.gap_since >= self.max_hold:
+                # Everything behind the expired gap has waited at least as long, so release it all
+                while peer.pending:
+                    delivered.extend(self.skip_gap(peer))
+        return delivered
+
+
+def sequence_overhead(connection):
+    """Bytes the link header adds to every datagram of the connection."""
+    return HEADER.size if connection.get('sequence') else 0
+
+
+def create_sequence_batcher(connection, batcher):
+    if not connection.get('sequence'):
+        return batcher
+    return SequenceBatcher(batcher)
+
+
+def create_sequence_receiver(connection, metrics):
+    if not connection.get('sequence'):
+        return None
+    return SequenceReceiver(window=connection.get('reorder_window', 32),
+                            max_hold=connection.get('reorder_hold_ms', 20.0) / 1000.0,
+                            delay=metrics.link_delay)
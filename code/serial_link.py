@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+
+import serial
+
+from device_registry import devices, is_identity
+
+logger = logging.getLogger()
+
+# While the device is down, UDP ingress is either kept in the write queue until it is back or discarded
+OFFLINE_BUFFER = 'buffer'
+OFFLINE_DROP = 'drop'
+OFFLINE_POLICIES = (OFFLINE_BUFFER, OFFLINE_DROP)
+
+PARITY_MAPPING = {
+    'N': serial.PARITY_NONE,
+    'E': serial.PARITY_EVEN,
+    'O': serial.PARITY_ODD,
+    'M': serial.PARITY_MARK,
+    'S': serial.PARITY_SPACE
+}
+
+
+def open_serial(connection, path):
+    """Open the connection's serial port at `path` with its line settings, non-blocking."""
+    serial_conn = serial.Serial(
+        port=path,
+        baudrate=connection['baud_rate'],
+        bytesize={5: serial.FIVEBITS, 6: serial.SIXBITS, 7: serial.SEVENBITS, 8: serial.EIGHTBITS}[
+            connection['data_bits']],
+        parity=PARITY_MAPPING.get(connection['parity'][0].upper(), serial.PARITY_NONE),
+        stopbits={1: serial.STOPBITS_ONE, 1.5: serial.STOPBITS_ONE_POINT_FIVE, 2: serial.STOPBITS_TWO}[
+            connection['stop_bits']],
+        timeout=0
+    )
+    buffer_size = connection.get('buffer_size', 'default')
+    if buffer_size != 'default':
+        serial_conn.set_buffer_size(rx_size=int(buffer_size), tx_size=int(buffer_size))
+    return serial_conn
+
+
+class SerialLink:
+    """The serial port of one connection, reopened with exponential backoff when the device disappears.
+
+    Forwarding code takes `serial` (None while the device is down), reports an I/O error with fail()
+    and gets the port back from reopen() or wait_open(). Every thread of a connection shares one
+    link; the lock makes sure only one of them closes or reopens the port, and fail() ignores errors
+    on a handle that has already been replaced. With reconnect off, fail() returns False and the
+    caller lets the error end the connection as before.
+
+    serial_port may also name the device by identity (usb:VID:PID[:SERIAL] or usb-port:LOCATION);
+    it is then looked up in the device registry on every open, wherever the adapter enumerated.
+    """
+
+    def __init__(self, connection, reconnect=True, by_id=True, max_delay=30.0):
+        self.connection = connection
+        self.name = connection['name']
+        self.spec = connection['serial_ports'][0]
+        self.path = self.spec
+        self.reconnect = reconnect
+        self.by_id = by_id
+        self.max_delay = max_delay
+        self.offline_policy = connection.get('offline_policy', OFFLINE_DROP)
+        self.lock = threading.Lock()
+        self.serial = None
+        self.closed = False
+        self.retry_delay = 0.0
+        self.next_attempt = 0.0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.dropped = 0
+
+    def open(self):
+        """First open. Raises when the port cannot be opened and reconnect is off."""
+        with self.lock:
+            try:
+                self.connect()
+            except Exception as e:
+                if not self.reconnect:
+                    raise
+                self.schedule_retry()
+                logger.error(f"Serial port {self.path} of {self.name} is not available ({e}), "
+                             f"retrying in {self.retry_delay:.0f}s")
+        return self.serial
+
+    def connect(self):
+        if is_identity(self.spec):
+            self.path = devices.resolve(self.spec)
+            self.serial = open_serial(self.connection, self.path)
+            return
+        self.serial = open_serial(self.connection, self.path)
+        if self.by_id:
+            path = devices.stable_path(self.path)
+            if path != self.path:
+                logger.info(f"Serial port {self.path} of {self.name} will be reopened as {path}")
+                self.path = path
+
+    def schedule_retry(self):
+        self.retry_delay = min(max(self.retry_delay * 2, 1.0), self.max_delay)
+        self.next_attempt = time.monotonic() + self.retry_delay
+
+    def fail(self, serial_conn, error):
+        """Report an I/O error on serial_conn. Returns True when the link will reconnect."""
+        if not self.reconnect:
+            return False
+        with self.lock:
+            if self.closed:
+                # The connection is shutting down; let the error end the thread
+                return False
+            if self.serial is not serial_conn:
+                # Another thread already saw this disconnect
+                return True
+            self.disconnects += 1
+            self.serial = None
+            try:
+                serial_conn.close()
+            except Exception:
+                pass
+            self.schedule_retry()
+        logger.error(f"Serial port {self.path} of {self.name} disconnected ({error}), "
+                     f"reconnecting in {self.retry_delay:.0f}s")
+        return True
+
+    def timeout(self):
+        """Seconds until the next reopen attempt, or None while the port is open."""
+        if self.serial is not None or self.closed:
+            return None
+        return max(0.0, self.next_attempt - time.monotonic())
+
+    def reopen(self):
+        """Try to reopen the port if an attempt is due. Returns the open port or None."""
+        with self.lock:
+            if self.serial is not None or self.closed:
+                return self.serial
+            if time.monotonic() < self.next_attempt:
+                return None
+            try:
+                self.connect()
+            except Exception:
+                self.schedule_retry()
+                return None
+            self.reconnects += 1
+            self.retry_delay = 0.0
+        logger.info(f"Serial port {self.path} of {self.name} reconnected")
+        return self.serial
+
+    def wait_open(self, stop_event):
+        """Block until the port is open (reopening it as attempts fall due) or stop_event is set."""
+        while not stop_event.is_set() and not self.closed:
+            serial_conn = self.reopen()
+            if serial_conn is not None:
+                return serial_conn
+            stop_event.wait(self.timeout() or 0.05)
+        return None
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            serial_conn, self.serial = self.serial, None
+        if serial_conn is not None:
+            serial_conn.close()
+
+
+def create_serial_link(connection):
+    policy = connection.get('offline_policy', OFFLINE_DROP)
+    if policy not in OFFLINE_POLICIES:
+        raise ValueError(f"Unknown offline_policy: {policy}")
+    return SerialLink(connection,
+                      reconnect=connection.get('serial_reconnect', True),
+                      by_id=connection.get('serial_by_id', True),
+                      max_delay=connection.get('reconnect_max_delay', 30.0))
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import deque
+
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+BLOCK = 'block'
+WRITE_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+def serial_bytes_per_second(baud_rate, data_bits=8, parity='None', stop_bits=1):
+    """Payload bytes per second the line can carry: every character also costs a start bit, parity and stop bits."""
+    parity_bits = 0 if str(parity)[:1].upper() in ('', 'N') else 1
+    return baud_rate / (1 + data_bits + parity_bits + stop_bits)
+
+
+class SerialWriteQueue:
+    """Bounded FIFO of datagrams waiting for the serial writer, with a configurable overflow policy.
+
+    drop-oldest evicts queued datagrams to make room, drop-newest discards the incoming one and
+    block makes put() wait for the writer. Depth and drop counters are plain attributes so health
+    reports can read them without taking the lock.
+    """
+
+    def __init__(self, max_bytes=65536, policy=DROP_OLDEST):
+        if policy not in WRITE_POLICIES:
+            raise ValueError(f"Unknown write_policy: {policy}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.items = deque()
+        self.queued_bytes = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self.high_watermark = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def has_room(self, size):
+        return self.queued_bytes + size <= self.max_bytes
+
+    def put(self, data, block=True):
+        """Queue one datagram. Returns False when it was dropped."""
+        size = len(data)
+        with self.cond:
+            if self.closed:
+                return False
+            if size > self.max_bytes:
+                self.drop(size)
+                return False
+            if not self.has_room(size):
+                if self.policy == DROP_NEWEST or (self.policy == BLOCK and not block):
+                    self.drop(size)
+                    return False
+                if self.policy == DROP_OLDEST:
+                    while not self.has_room(size):
+                        self.drop(len(self.items.popleft()), dequeued=True)
+                else:
+                    while not self.closed and not self.has_room(size):
+                        self.cond.wait()
+                    if self.closed:
+                        return False
+            self.items.append(data)
+            self.queued_bytes += size
+            self.high_watermark = max(self.high_watermark, self.queued_bytes)
+            self.cond.notify_all()
+            return True
+
+    def drop(self, size, dequeued=False):
+        if dequeued:
+            self.queued_bytes -= size
+        self.dropped += 1
+        self.dropped_bytes += size
+
+    def get(self, timeout=None):
+        """Next datagram, or None once the queue is closed or the timeout expires."""
+        with self.cond:
+            if not self.closed and not self.items:
+                self.cond.wait(timeout)
+            if self.closed or not self.items:
+                return None
+            return self.pop()
+
+    def get_nowait(self):
+        with self.cond:
+            if not self.items:
+                return None
+            return self.pop()
+
+    def pop(self):
+        data = self.items.popleft()
+        self.queued_bytes -= len(data)
+        self.cond.notify_all()
+        return data
+
+    def clear(self):
+        """Discard everything queued. Returns the number of datagrams discarded."""
+        with self.cond:
+            count = len(self.items)
+            self.items.clear()
+            self.queued_bytes = 0
+            self.cond.notify_all()
+            return count
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class WritePacer:
+    """Tracks when the line will have shifted out everything written so far.
+
+    Writes are held back once more than max_lead seconds of data sit in the driver, so the backlog
+    stays in the SerialWriteQueue where the drop policy can act on it.
+    """
+
+    def __init__(self, bytes_per_second, max_lead=0.05):
+        self.bytes_per_second = bytes_per_second
+        self.max_lead = max_lead
+        self.line_free_at = 0.0
+
+    def wrote(self, size):
+        if not self.bytes_per_second:
+            return
+        now = time.monotonic()
+        self.line_free_at = max(self.line_free_at, now) + size / self.bytes_per_second
+
+    def delay(self):
+        """Seconds to wait before the next write."""
+        if not self.bytes_per_second:
+            return 0.0
+        return max(0.0, self.line_free_at - self.max_lead - time.monotonic())
+
+
+def create_write_queue(connection):
+    return SerialWriteQueue(connection.get('write_queue_bytes', 65536),
+                            connection.get('write_policy', DROP_OLDEST))
+
+
+def create_pacer(connection):
+    """Pacer for the connection's line settings; pace_writes = false disables pacing."""
+    if not connection.get('pace_writes', True):
+        return WritePacer(0)
+    return WritePacer(serial_bytes_per_second(connection.get('baud_rate', 9600), connection.get('data_bits', 8),
+                                              connection.get('parity', 'None'), connection.get('stop_bits', 1)))
@@ -0,0 +1,281 @@
+import argparse
+import json
+import logging
+import os
+import pty
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app_cli import AsyncSerialToUDPApp, SerialToUDPApp  # noqa: E402
+from serial_writer import serial_bytes_per_second  # noqa: E402
+
+# Every message carries its sequence number and the monotonic time it entered the bridge
+MESSAGE = struct.Struct('!Id')
+# Without --rate, drive this share of the line rate so UDP->serial measures the bridge, not a full queue
+DEFAULT_LINE_SHARE = 0.8
+
+
+def open_pty_pair():
+    """Create a raw PTY pair and return (master_fd, slave_fd, slave_name)."""
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    tty.setraw(master)
+    return master, slave, os.ttyname(slave)
+
+
+def free_udp_port():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Direction:
+    """Sent/received bookkeeping for one direction of one connection."""
+
+    def __init__(self, name, frame_size):
+        self.name = name
+        self.frame_size = frame_size
+        self.padding = b'x' * (frame_size - MESSAGE.size)
+        self.sent = 0
+        self.seen = set()
+        self.latencies = []
+        self.pending = bytearray()
+        self.first_arrival = None
+        self.last_arrival = None
+
+    def next_message(self):
+        message = MESSAGE.pack(self.sent, time.monotonic()) + self.padding
+        self.sent += 1
+        return message
+
+    def received(self, data):
+        """Reassemble frames from a byte stream (serial reads and datagrams do not keep frame boundaries)."""
+        arrival = time.monotonic()
+        if self.first_arrival is None:
+            self.first_arrival = arrival
+        self.last_arrival = arrival
+        self.pending += data
+        frame_size = self.frame_size
+        offset = 0
+        while len(self.pending) - offset >= frame_size:
+            sequence, sent_at = MESSAGE.unpack_from(self.pending, offset)
+            if sequence not in self.seen:
+                self.seen.add(sequence)
+                self.latencies.append(arrival - sent_at)
+            offset += frame_size
+        del self.pending[:offset]
+
+    def result(self, cpu_seconds, wall_seconds):
+        received = len(self.seen)
+        active = (self.last_arrival - self.first_arrival) if received > 1 else 0
+        return {
+            'direction': self.name,
+            'sent': self.sent,
+            'received': received,
+            'loss_pct': (self.sent - received) / self.sent * 100 if self.sent else 0.0,
+            'p50_ms': percentile(self.latencies, 50) * 1000,
+            'p99_ms': percentile(self.latencies, 99) * 1000,
+            'throughput_kBps': received * self.frame_size / active / 1000 if active else 0.0,
+            'cpu_pct': cpu_seconds / wall_seconds * 100 if cpu_seconds is not None else float('nan'),
+        }
+
+
+class BenchConnection:
+    """One bridge connection: a PTY pair, a UDP sink for serial->UDP and a UDP source for UDP->serial."""
+
+    def __init__(self, index, args):
+        self.name = f"bench{index}"
+        self.master_fd, self.slave_fd, slave_name = open_pty_pair()
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sink.bind(('127.0.0.1', 0))
+        self.source = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.listen_port = free_udp_port()
+        self.tx = Direction('serial->udp', args.frame_size)
+        self.rx = Direction('udp->serial', args.frame_size)
+        self.connection = {
+            'serial_ports': [slave_name],
+            'target_ports': [self.sink.getsockname()[1]],
+            'listen_ports': [self.listen_port],
+            'baud_rate': args.baud,
+            'data_bits': 8,
+            'parity': 'None',
+            'stop_bits': 1.0,
+            'name': self.name,
+            'buffer_size': 'default',
+            'mode': 'Tx/Rx',
+            'framing': args.framing,
+            'frame_length': args.frame_size,
+            'batch_size': args.batch_size,
+            'write_queue_bytes': args.write_queue_bytes,
+            'write_policy': 'block',
+        }
+
+    def drive(self, direction, send, rate, duration, stop_event):
+        """Send frames at `rate` per second (0 = as fast as the path accepts them) for `duration` seconds."""
+        period = 1.0 / rate if rate else 0.0
+        start = next_send = time.monotonic()
+        while time.monotonic() - start < duration and not stop_event.is_set():
+            send(direction.next_message())
+            if period:
+                next_send += period
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def write_serial(self, message):
+        os.write(self.master_fd, message)
+
+    def send_udp(self, message):
+        self.source.sendto(message, ('127.0.0.1', self.listen_port))
+        if not self.rx.sent % 32:
+            # Open loop UDP would just overrun the bridge's receive buffer; yield to its threads
+            time.sleep(0)
+
+    def collect(self, stop_event):
+        """Read both sinks until stop_event is set and they have been idle for a moment."""
+        idle_since = None
+        while True:
+            ready, _, _ = select.select([self.sink, self.master_fd], [], [], 0.1)
+            if self.sink in ready:
+                self.tx.received(self.sink.recv(65535))
+            if self.master_fd in ready:
+                self.rx.received(os.read(self.master_fd, 65536))
+            if ready:
+                idle_since = None
+            elif stop_event.is_set():
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > 0.5:
+                    return
+
+    def close(self):
+        self.sink.close()
+        self.source.close()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+def thread_cpu(threads):
+    """CPU seconds used so far by the given bridge threads (None once any of them has exited)."""
+    try:
+        return sum(time.clock_gettime(time.pthread_getcpuclockid(thread.ident)) for thread in threads)
+    except (OSError, TypeError):
+        return None
+
+
+def bridge_threads(app, bench):
+    """(serial->udp threads, udp->serial threads) of one connection."""
+    if isinstance(app, AsyncSerialToUDPApp):
+        # Every connection shares the loop thread; its CPU is split evenly in the report
+        return [app.loop_thread], []
+    threads = app.states[bench.name].threads
+    return threads[:1], threads[1:]
+
+
+def run(args):
+    bench = [BenchConnection(i, args) for i in range(args.connections)]
+    app_class = AsyncSerialToUDPApp if args.engine == 'asyncio' else SerialToUDPApp
+    app = app_class(connections=[b.connection for b in bench], target_ip='127.0.0.1', interval=args.interval)
+    app.start_bridge()
+    time.sleep(0.2)
+
+    stop_event = threading.Event()
+    collectors = [threading.Thread(target=b.collect, args=(stop_event,)) for b in bench]
+    drivers = []
+    for b in bench:
+        if args.direction in ('both', 'tx'):
+            drivers.append(threading.Thread(target=b.drive, args=(b.tx, b.write_serial, args.rate, args.duration,
+                                                                  stop_event)))
+        if args.direction in ('both', 'rx'):
+            drivers.append(threading.Thread(target=b.drive, args=(b.rx, b.send_udp, args.rate, args.duration,
+                                                                  stop_event)))
+
+    threads = {b.name: bridge_threads(app, b) for b in bench}
+    cpu_start = {name: (thread_cpu(tx), thread_cpu(rx)) for name, (tx, rx) in threads.items()}
+    wall_start = time.monotonic()
+    for thread in collectors + drivers:
+        thread.start()
+    for thread in drivers:
+        thread.join()
+    stop_event.set()
+    for thread in collectors:
+        thread.join()
+    wall = time.monotonic() - wall_start
+    cpu_end = {name: (thread_cpu(tx), thread_cpu(rx)) for name, (tx, rx) in threads.items()}
+    app.stop_bridge()
+
+    results = []
+    shared = args.engine == 'asyncio'
+    rows = sum(1 for b in bench for direction in (b.tx, b.rx) if direction.sent)
+    for b in bench:
+        (tx_start, rx_start), (tx_end, rx_end) = cpu_start[b.name], cpu_end[b.name]
+        tx_cpu = tx_end - tx_start if tx_start is not None and tx_end is not None else None
+        rx_cpu = rx_end - rx_start if rx_start is not None and rx_end is not None else None
+        if shared and tx_cpu is not None:
+            # The loop thread serves both directions of every connection
+            tx_cpu = rx_cpu = tx_cpu / max(rows, 1)
+        for direction, cpu in ((b.tx, tx_cpu), (b.rx, rx_cpu)):
+            if direction.sent:
+                results.append(dict(connection=b.name, **direction.result(cpu, wall)))
+        b.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end bridge benchmark over PTY pairs and loopback UDP (no hardware needed)")
+    parser.add_argument("--connections", type=int, default=1, help="Bridge connections to run side by side")
+    parser.add_argument("--baud", type=int, default=115200, help="Baud rate (paces UDP->serial writes)")
+    parser.add_argument("--frame-size", type=int, default=32, help="Bytes per frame (minimum 12)")
+    parser.add_argument("--rate", type=int, default=None,
+                        help="Frames per second per connection and direction (0 = as fast as possible, "
+                             "default: 80%% of what --baud carries)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to drive traffic")
+    parser.add_argument("--direction", choices=['both', 'tx', 'rx'], default='both',
+                        help="tx = serial->UDP, rx = UDP->serial")
+    parser.add_argument("--engine", choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument("--interval", type=int, default=1, help="Bridge interval in milliseconds")
+    parser.add_argument("--framing", default='none', help="Bridge framing mode (fixed uses --frame-size)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Bridge egress batch size")
+    parser.add_argument("--write-queue-bytes", type=int, default=65536, help="Bridge UDP->serial queue size")
+    parser.add_argument("--json", action='store_true', help="Print results as JSON for regression tracking")
+    args = parser.parse_args()
+    args.frame_size = max(args.frame_size, MESSAGE.size)
+    if args.rate is None:
+        args.rate = max(1, int(serial_bytes_per_second(args.baud) * DEFAULT_LINE_SHARE / args.frame_size))
+
+    # The bridge logs every connection start and stop; keep the report readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run(args)
+    if args.json:
+        print(json.dumps({'settings': vars(args), 'results': results}, indent=2))
+        return
+
+    print(f"engine={args.engine} connections={args.connections} baud={args.baud} frame={args.frame_size}B "
+          f"rate={args.rate or 'max'}/s duration={args.duration}s")
+    print(f"{'conn':<8} {'direction':<12} {'sent':>8} {'recv':>8} {'loss %':>7} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'kB/s':>9} {'cpu %':>7}")
+    for r in results:
+        print(f"{r['connection']:<8} {r['direction']:<12} {r['sent']:>8} {r['received']:>8} {r['loss_pct']:>7.2f} "
+              f"{r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['throughput_kBps']:>9.1f} {r['cpu_pct']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import logging
+import os
+import pty
+import socket
+import struct
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app_cli import ConnectionState, SerialToUDPApp  # noqa: E402
+from serial_link import create_serial_link  # noqa: E402
+
+# Every message carries its sequence number and the monotonic time it was written to the PTY
+MESSAGE = struct.Struct('!Id')
+
+
+def open_pty_pair():
+    """Create a raw PTY pair and return (master_fd, slave_fd, slave_name)."""
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    slave_name = os.ttyname(slave)
+    return master, slave, slave_name
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(read_mode, interval_ms, rate, duration, frame_size):
+    """Drive one read engine over a PTY pair and return its latency/CPU figures."""
+    master_fd, slave_fd, slave_name = open_pty_pair()
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(0.5)
+    target_port = receiver.getsockname()[1]
+
+    app = SerialToUDPApp(connections=[], target_ip='127.0.0.1', interval=interval_ms, read_mode=read_mode)
+    connection = {
+        'serial_ports': [slave_name],
+        'target_ports': [target_port],
+        'listen_ports': [],
+        'baud_rate': 115200,
+        'data_bits': 8,
+        'parity': 'None',
+        'stop_bits': 1.0,
+        'name': read_mode,
+        'buffer_size': 'default',
+        'mode': 'Tx',
+    }
+    state = ConnectionState(connection)
+    state.link = create_serial_link(connection)
+    state.link.open()
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    forward_thread = threading.Thread(target=app.read_and_send_serial_data,
+                                      args=(state, state.link, [udp_socket], None))
+    forward_thread.start()
+    # Let the thread reach its wait state before taking the CPU baseline
+    time.sleep(0.2)
+    cpu_clock = time.pthread_getcpuclockid(forward_thread.ident)
+    cpu_start = time.clock_gettime(cpu_clock)
+    wall_start = time.monotonic()
+
+    latencies = []
+    padding = b'x' * max(0, frame_size - MESSAGE.size)
+
+    def receive():
+        pending = b''
+        while True:
+            try:
+                data = receiver.recv(65535)
+            except socket.timeout:
+                return
+            arrival = time.monotonic()
+            pending += data
+            while len(pending) >= frame_size:
+                _, sent_at = MESSAGE.unpack_from(pending)
+                latencies.append(arrival - sent_at)
+                pending = pending[frame_size:]
+
+    receive_thread = threading.Thread(target=receive)
+    receive_thread.start()
+
+    sent = 0
+    period = 1.0 / rate
+    next_send = time.monotonic()
+    while time.monotonic() - wall_start < duration:
+        os.write(master_fd, MESSAGE.pack(sent, time.monotonic()) + padding)
+        sent += 1
+        next_send += period
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    receive_thread.join()
+    cpu_used = time.clock_gettime(cpu_clock) - cpu_start
+    wall_used = time.monotonic() - wall_start
+    state.stop()
+    forward_thread.join()
+    state.join()
+    receiver.close()
+    os.close(master_fd)
+    os.close(slave_fd)
+
+    return {
+        'mode': read_mode,
+        'sent': sent,
+        'received': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else float('nan'),
+        'cpu_pct': cpu_used / wall_used * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the event-driven and polling serial read engines")
+    parser.add_argument("--interval", type=int, default=1, help="Interval in milliseconds passed to the bridge")
+    parser.add_argument("--rate", type=int, default=200, help="Frames written to the PTY per second")
+    parser.add_argument("--frame-size", type=int, default=32, help="Bytes per frame (minimum 12)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run each engine")
+    args = parser.parse_args()
+
+    # The bridge logs every datagram; keep the benchmark output readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    frame_size = max(args.frame_size, MESSAGE.size)
+    print(f"interval={args.interval}ms rate={args.rate}/s frame={frame_size}B duration={args.duration}s")
+    print(f"{'mode':<8} {'sent':>7} {'recv':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'cpu %':>7}")
+    for read_mode in ('polling', 'event'):
+        r = run_mode(read_mode, args.interval, args.rate, args.duration, frame_size)
+        print(f"{r['mode']:<8} {r['sent']:>7} {r['received']:>7} {r['p50_ms']:>8.3f} "
+              f"{r['p99_ms']:>8.3f} {r['max_ms']:>8.3f} {r['cpu_pct']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import os
+import pty
+import select
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import tty
+
+import serial
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app_cli import drain_ring  # noqa: E402
+from framing import Framer  # noqa: E402
+from ring_buffer import RingBuffer  # noqa: E402
+from udp_batch import DatagramBatcher  # noqa: E402
+
+
+def feed_pty(master_fd, total_bytes, chunk_size):
+    """Write total_bytes into the PTY master as fast as the tty layer accepts them."""
+    chunk = b'\x55' * chunk_size
+    written = 0
+    while written < total_bytes:
+        written += os.write(master_fd, chunk[:min(chunk_size, total_bytes - written)])
+
+
+def copy_path(slave_name, sink_port, read_size):
+    """The original hot path: pyserial read() -> new bytes -> sendto() with an address tuple -> f-string log line."""
+    serial_conn = serial.Serial(port=slave_name, baudrate=115200, timeout=0)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = ('127.0.0.1', sink_port)
+
+    def step():
+        data = serial_conn.read(read_size)
+        sock.sendto(data, target)
+        message = f"Sent: {data}"  # noqa: F841 - formatted eagerly, as logger.info(f"...") does
+        return len(data)
+
+    def close():
+        sock.close()
+        serial_conn.close()
+
+    return serial_conn.fileno(), step, close
+
+
+def ring_path(slave_name, sink_port, read_size):
+    """The ring path: os.readv() into a preallocated ring, memoryview slices to a connected socket."""
+    serial_conn = serial.Serial(port=slave_name, baudrate=115200, timeout=0)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect(('127.0.0.1', sink_port))
+    ring = RingBuffer(read_size)
+    framer = Framer(read_size)
+    batcher = DatagramBatcher(sock)
+    fd = serial_conn.fileno()
+
+    def step():
+        count = ring.fill_from(fd)
+        drain_ring(ring, framer, batcher)
+        return count
+
+    def close():
+        batcher.close()
+        serial_conn.close()
+
+    return fd, step, close
+
+
+def run(label, make_path, total_bytes, read_size, trace):
+    master_fd, slave_fd = pty.openpty()
+    tty.setraw(slave_fd)
+    slave_name = os.ttyname(slave_fd)
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    fd, step, close = make_path(slave_name, sink.getsockname()[1], read_size)
+
+    writer = threading.Thread(target=feed_pty, args=(master_fd, total_bytes, read_size))
+    if trace:
+        tracemalloc.start()
+    writer.start()
+    cpu_start = time.thread_time()
+    start = time.monotonic()
+    received = reads = 0
+    while received < total_bytes:
+        ready, _, _ = select.select([fd], [], [], 1.0)
+        if not ready:
+            break
+        received += step()
+        reads += 1
+    elapsed = time.monotonic() - start
+    cpu = time.thread_time() - cpu_start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    writer.join()
+    close()
+    sink.close()
+    os.close(master_fd)
+    os.close(slave_fd)
+    return {'label': label, 'mb_s': received / elapsed / 1e6, 'reads': reads,
+            'cpu_us_per_read': cpu / max(reads, 1) * 1e6, 'peak_kib': peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocation/throughput comparison of the serial->UDP copy and ring paths")
+    parser.add_argument("--megabytes", type=float, default=20, help="Data pushed through each path")
+    parser.add_argument("--read-size", type=int, default=1024, help="Bytes per read / datagram")
+    args = parser.parse_args()
+
+    total = int(args.megabytes * 1e6)
+    print(f"bytes={total} read_size={args.read_size}")
+    print(f"{'path':<6} {'MB/s':>8} {'reads':>8} {'cpu us/read':>12} {'traced peak KiB':>16}")
+    for label, make_path in (('copy', copy_path), ('ring', ring_path)):
+        r = run(label, make_path, total, args.read_size, trace=False)
+        traced = run(label, make_path, total // 10, args.read_size, trace=True)
+        print(f"{r['label']:<6} {r['mb_s']:>8.1f} {r['reads']:>8} {r['cpu_us_per_read']:>12.1f} "
+              f"{traced['peak_kib']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
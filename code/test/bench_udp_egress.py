@@ -0,0 +1,109 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from udp_batch import DatagramBatcher, libc_sendmmsg  # noqa: E402
+
+
+def start_receiver():
+    """Loopback sink that counts datagrams until it has been idle for half a second."""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(0.5)
+    result = {'received': 0}
+
+    def drain():
+        while True:
+            try:
+                receiver.recv(65535)
+            except socket.timeout:
+                receiver.close()
+                return
+            result['received'] += 1
+
+    thread = threading.Thread(target=drain)
+    thread.start()
+    return receiver.getsockname()[1], thread, result
+
+
+def run(label, frames, frame_size, send):
+    """Push `frames` datagrams through `send` and return the rate figures."""
+    port, receive_thread, result = start_receiver()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payload = b'x' * frame_size
+    flush, count_syscalls = send(sock, port)
+
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    for _ in range(frames):
+        flush(payload)
+    flush(None)
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu_start
+
+    receive_thread.join()
+    sock.close()
+    syscalls = count_syscalls()
+    return {
+        'label': label,
+        'syscalls': syscalls,
+        'syscalls_per_s': syscalls / elapsed,
+        'datagrams_per_s': frames / elapsed,
+        'received': result['received'],
+        'cpu_s': cpu,
+    }
+
+
+def per_datagram_sendto(sock, port):
+    """The original egress path: one sendto() with a destination tuple per datagram."""
+    calls = [0]
+
+    def send(frame):
+        if frame is not None:
+            sock.sendto(frame, ('127.0.0.1', port))
+            calls[0] += 1
+
+    return send, lambda: calls[0]
+
+
+def batched(max_batch):
+    def setup(sock, port):
+        sock.connect(('127.0.0.1', port))
+        batcher = DatagramBatcher(sock, max_batch=max_batch, max_delay=0.002)
+
+        def send(frame):
+            if frame is None:
+                batcher.flush()
+            else:
+                batcher.send(frame)
+                batcher.flush_expired()
+
+        return send, lambda: batcher.syscalls
+
+    return setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-datagram sendto() with batched sendmmsg() egress")
+    parser.add_argument("--frames", type=int, default=200000, help="Datagrams to send per run")
+    parser.add_argument("--frame-size", type=int, default=32, help="Payload bytes per datagram")
+    parser.add_argument("--batch", type=int, nargs='+', default=[1, 8, 32, 64], help="Batch sizes to measure")
+    args = parser.parse_args()
+
+    print(f"frames={args.frames} size={args.frame_size}B sendmmsg={'yes' if libc_sendmmsg else 'no (fallback)'}")
+    print(f"{'path':<14} {'syscalls':>9} {'syscalls/s':>11} {'dgrams/s':>10} {'recv':>8} {'cpu s':>7}")
+    runs = [run('sendto', args.frames, args.frame_size, per_datagram_sendto)]
+    for max_batch in args.batch:
+        runs.append(run(f'batch={max_batch}', args.frames, args.frame_size, batched(max_batch)))
+    for r in runs:
+        print(f"{r['label']:<14} {r['syscalls']:>9} {r['syscalls_per_s']:>11.0f} {r['datagrams_per_s']:>10.0f} "
+              f"{r['received']:>8} {r['cpu_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# The bridge modules live next to this directory, not in an installed package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class ListBatcher:
+    """Stands in for a DatagramBatcher at the bottom of an egress chain and keeps what it is sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, frame, arrived_at=None):
+        self.sent.append(bytes(frame))
+
+    def timeout(self):
+        return None
+
+    def flush_expired(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def list_batcher():
+    return ListBatcher()
@@ -0,0 +1,88 @@
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from control_protocol import (AckCache, decode_ack, decode_request, encode_ack, encode_request,  # noqa: E402
+                              is_control_packet, send_request)
+
+
+class CodecTest(unittest.TestCase):
+
+    def test_request_round_trip(self):
+        packet = encode_request('start', 0xDEADBEEF, '10.0.0.7', ['Radio 1', 'Radio 2'])
+        self.assertTrue(is_control_packet(packet))
+        self.assertEqual(decode_request(packet), ('start', 0xDEADBEEF, '10.0.0.7', ['Radio 1', 'Radio 2']))
+
+    def test_request_without_names_means_every_connection(self):
+        self.assertEqual(decode_request(encode_request('stop', 1)), ('stop', 1, '0.0.0.0', []))
+
+    def test_text_packets_are_not_control_packets(self):
+        self.assertFalse(is_control_packet(b'10.0.0.7 start'))
+        self.assertFalse(is_control_packet(b''))
+
+    def test_invalid_requests(self):
+        packet = encode_request('status', 5)
+        for data in (packet[:3], b'\x00' + packet[1:], packet[:1] + b'\x09' + packet[2:],
+                     packet[:2] + b'\x7f' + packet[3:]):
+            with self.assertRaises(ValueError):
+                decode_request(data)
+
+    def test_ack_round_trip(self):
+        self.assertEqual(decode_ack(encode_ack(7, True, 'started Radio 1')), (7, True, 'started Radio 1'))
+        self.assertEqual(decode_ack(encode_ack(8, False, 'no such connection')), (8, False, 'no such connection'))
+
+    def test_request_is_not_an_ack(self):
+        with self.assertRaises(ValueError):
+            decode_ack(encode_request('start', 1))
+
+    def test_ack_cache_keeps_the_newest(self):
+        cache = AckCache(size=2)
+        for request_id in range(3):
+            cache.put(('10.0.0.7', 7000), request_id, encode_ack(request_id, True))
+        self.assertIsNone(cache.get(('10.0.0.7', 7000), 0))
+        self.assertEqual(decode_ack(cache.get(('10.0.0.7', 7000), 2))[0], 2)
+
+
+class SendRequestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.addCleanup(self.server.close)
+
+    def serve(self, ignore_first):
+        """Answer one request, after dropping the first ignore_first copies of it, as a lossy link would."""
+        def run():
+            for _ in range(ignore_first):
+                self.server.recvfrom(2048)
+            data, addr = self.server.recvfrom(2048)
+            command, request_id, _, _ = decode_request(data)
+            self.server.sendto(encode_ack(request_id, True, command), addr)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_acked(self):
+        thread = self.serve(0)
+        ok, detail, round_trip = send_request(self.server.getsockname(), 'status', timeout=0.5)
+        thread.join()
+        self.assertTrue(ok)
+        self.assertEqual(detail, 'status')
+        self.assertGreaterEqual(round_trip, 0)
+
+    def test_retransmits_after_a_lost_request(self):
+        thread = self.serve(1)
+        ok, _, _ = send_request(self.server.getsockname(), 'reload', timeout=0.05)
+        thread.join()
+        self.assertTrue(ok)
+
+    def test_times_out(self):
+        with self.assertRaises(TimeoutError):
+            send_request(self.server.getsockname(), 'stop', timeout=0.01, retries=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from conftest import ListBatcher  # noqa: E402
+from envelope import (ENVELOPE_MAGIC, FLAG_COMPRESSED, EnvelopeBatcher, EnvelopeDecoder,  # noqa: E402
+                      decode_varint, encode_varint, envelope_overhead)
+from framing import MAX_DATAGRAM_SIZE  # noqa: E402
+
+
+class VarintTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for value in (0, 1, 127, 128, 300, 65535, 1 << 28):
+            encoded = encode_varint(value)
+            self.assertEqual(decode_varint(encoded + b'tail', 0), (value, len(encoded)))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            decode_varint(b'\x80\x80', 0)
+
+
+class EnvelopeTest(unittest.TestCase):
+
+    def round_trip(self, frames, **options):
+        batcher = ListBatcher()
+        envelopes = EnvelopeBatcher(batcher, **options)
+        for frame in frames:
+            envelopes.send(frame)
+        envelopes.flush()
+        decoder = EnvelopeDecoder(options.get('dictionary', b''))
+        decoded = []
+        for datagram in batcher.sent:
+            decoded.extend(decoder.decode(datagram))
+        self.assertEqual(decoder.errors, 0)
+        return batcher.sent, decoded
+
+    def test_packs_frames_into_one_datagram(self):
+        frames = [b'alpha', b'', b'beta' * 50]
+        sent, decoded = self.round_trip(frames)
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0][0], ENVELOPE_MAGIC)
+        self.assertEqual(decoded, frames)
+
+    def test_seals_at_mtu(self):
+        frames = [bytes([index]) * 100 for index in range(30)]
+        sent, decoded = self.round_trip(frames, mtu=512)
+        self.assertGreater(len(sent), 1)
+        self.assertTrue(all(len(datagram) <= 512 for datagram in sent))
+        self.assertEqual(decoded, frames)
+
+    def test_compressed(self):
+        frames = [b'$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47\r\n'] * 10
+        sent, decoded = self.round_trip(frames, compress=True)
+        self.assertTrue(sent[0][0] & FLAG_COMPRESSED)
+        self.assertLess(len(sent[0]), sum(len(frame) for frame in frames))
+        self.assertEqual(decoded, frames)
+
+    def test_compressed_with_dictionary(self):
+        dictionary = b'$GPGGA,$GPRMC,*47\r\n'
+        frames = [b'$GPRMC,081836,A,3751.65,S,14507.36,E*47\r\n'] * 3
+        _, decoded = self.round_trip(frames, compress=True, dictionary=dictionary)
+        self.assertEqual(decoded, frames)
+
+    def test_incompressible_body_is_sent_plain(self):
+        frames = [os.urandom(200)]
+        sent, decoded = self.round_trip(frames, compress=True)
+        self.assertFalse(sent[0][0] & FLAG_COMPRESSED)
+        self.assertEqual(decoded, frames)
+
+    def test_largest_frame_fits_a_datagram(self):
+        connection = {'aggregate': True}
+        largest = b'x' * (MAX_DATAGRAM_SIZE - envelope_overhead(connection))
+        frames = [b'small', largest, b'after']
+        sent, decoded = self.round_trip(frames, mtu=1 << 20)
+        self.assertEqual([len(datagram) for datagram in sent], [7, MAX_DATAGRAM_SIZE, 7])
+        self.assertEqual(decoded, frames)
+
+    def test_malformed_datagrams_are_counted(self):
+        decoder = EnvelopeDecoder()
+        for datagram in (b'', b'\x00plain', bytes((ENVELOPE_MAGIC,)) + b'\x05ab',
+                         bytes((ENVELOPE_MAGIC | FLAG_COMPRESSED,)) + b'not deflate'):
+            self.assertEqual(decoder.decode(datagram), [])
+        self.assertEqual(decoder.errors, 4)
+        self.assertEqual(decoder.envelopes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
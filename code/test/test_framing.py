@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from framing import (DelimiterFramer, EndMarkerFramer, FixedLengthFramer, Framer, IdleGapFramer,  # noqa: E402
+                     LengthPrefixFramer, create_framer, parse_delimiter)
+
+
+def feed_bytewise(framer, data):
+    """Feed one byte per read, the worst split a serial port can produce."""
+    frames = []
+    for index in range(len(data)):
+        frames.extend(framer.feed(data[index:index + 1]))
+    return frames
+
+
+class FramerTest(unittest.TestCase):
+
+    def test_passthrough_splits_oversized_reads(self):
+        self.assertEqual(Framer(4).feed(b'0123456789'), [b'0123', b'4567', b'89'])
+        self.assertEqual(Framer(4).feed(b''), [])
+
+    def test_delimiter_keeps_delimiter_and_buffers_the_rest(self):
+        framer = DelimiterFramer(b'\n')
+        self.assertEqual(framer.feed(b'one\ntwo\nthr'), [b'one\n', b'two\n'])
+        self.assertEqual(framer.feed(b'ee\n'), [b'three\n'])
+        self.assertEqual(framer.flush(), [])
+
+    def test_delimiter_split_across_reads(self):
+        framer = DelimiterFramer(b'\r\n')
+        self.assertEqual(feed_bytewise(framer, b'ab\r\ncd\r\n'), [b'ab\r\n', b'cd\r\n'])
+
+    def test_delimiter_caps_runaway_frames(self):
+        framer = DelimiterFramer(b'\n', max_frame_size=4)
+        self.assertEqual(framer.feed(b'abcdefghij'), [b'abcd', b'efgh'])
+        self.assertEqual(framer.feed(b'\n'), [b'ij\n'])
+
+    def test_reset_discards_partial_frame(self):
+        framer = DelimiterFramer(b'\n')
+        framer.feed(b'cut off')
+        framer.reset()
+        self.assertEqual(framer.feed(b'next\n'), [b'next\n'])
+
+    def test_fixed_length(self):
+        framer = FixedLengthFramer(3)
+        self.assertEqual(framer.feed(b'abcdefg'), [b'abc', b'def'])
+        self.assertEqual(framer.feed(b'hi'), [b'ghi'])
+        with self.assertRaises(ValueError):
+            FixedLengthFramer(0)
+
+    def test_length_prefix(self):
+        framer = LengthPrefixFramer(prefix_size=2)
+        stream = b'\x00\x03abc' + b'\x00\x01z'
+        self.assertEqual(feed_bytewise(framer, stream), [b'\x00\x03abc', b'\x00\x01z'])
+
+    def test_length_prefix_skips_oversized_length(self):
+        framer = LengthPrefixFramer(prefix_size=1, max_frame_size=8)
+        # 0xff cannot be a length that fits; the framer drops it and finds the frame after it
+        self.assertEqual(framer.feed(b'\xff\x02hi'), [b'\x02hi'])
+
+    def test_slip_skips_empty_frames(self):
+        framer = EndMarkerFramer(b'\xc0')
+        self.assertEqual(framer.feed(b'\xc0abc\xc0\xc0de\xc0'), [b'abc\xc0', b'de\xc0'])
+
+    def test_idle_gap(self):
+        framer = IdleGapFramer(0.01)
+        self.assertEqual(framer.feed(b'abc'), [])
+        self.assertEqual(framer.flush_expired(), [])
+        self.assertGreater(framer.timeout(), 0)
+        time.sleep(0.02)
+        self.assertEqual(framer.timeout(), 0.0)
+        self.assertEqual(framer.flush_expired(), [b'abc'])
+        self.assertIsNone(framer.timeout())
+
+
+class CreateFramerTest(unittest.TestCase):
+
+    def test_modes(self):
+        self.assertTrue(create_framer({}).passthrough)
+        self.assertIsInstance(create_framer({'framing': 'slip'}), EndMarkerFramer)
+        self.assertEqual(create_framer({'framing': 'delimiter', 'frame_delimiter': '0x0d0a'}).delimiter, b'\r\n')
+        with self.assertRaises(ValueError):
+            create_framer({'framing': 'bogus'})
+
+    def test_frames_fit_the_datagram_budget(self):
+        self.assertEqual(create_framer({}, 1000).max_frame_size, 1000)
+        self.assertEqual(create_framer({'buffer_size': 200000}, 1000).max_frame_size, 1000)
+        self.assertEqual(create_framer({'buffer_size': 512}, 1000).max_frame_size, 512)
+
+    def test_parse_delimiter(self):
+        self.assertEqual(parse_delimiter('\\n'), b'\n')
+        self.assertEqual(parse_delimiter('\\r\\n'), b'\r\n')
+        self.assertEqual(parse_delimiter('0x7E'), b'\x7e')
+
+
+if __name__ == '__main__':
+    unittest.main()
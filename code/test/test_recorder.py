@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from recorder import (INDEX_ENTRY, INDEX_SUFFIX, SEGMENT_SUFFIX, SERIAL_TO_UDP, UDP_TO_SERIAL,  # noqa: E402
+                      Recorder, list_segments, load_index, read_capture, read_segment, segment_start)
+
+
+class RecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = self.directory.name
+
+    def record(self, frames, **options):
+        """Record (direction, payload) pairs and return the (time, direction, payload) read back."""
+        recorder = Recorder(self.path, **options)
+        for direction, payload in frames:
+            recorder.record(direction, memoryview(bytearray(payload)))
+        recorder.close()
+        self.assertEqual(recorder.dropped, 0)
+        return [(timestamp, direction, bytes(payload)) for timestamp, direction, payload in read_capture(self.path)]
+
+    def test_round_trip_both_directions(self):
+        frames = [(SERIAL_TO_UDP, b'from the radio'), (UDP_TO_SERIAL, b'to the radio'), (SERIAL_TO_UDP, b'')]
+        records = self.record(frames)
+        self.assertEqual([(direction, payload) for _, direction, payload in records], frames)
+        times = [timestamp for timestamp, _, _ in records]
+        self.assertEqual(times, sorted(times))
+
+    def test_rotates_segments(self):
+        frames = [(SERIAL_TO_UDP, bytes([index]) * 100) for index in range(50)]
+        records = self.record(frames, segment_bytes=1024)
+        self.assertGreater(len(list_segments(self.path)), 1)
+        self.assertEqual([payload for _, _, payload in records], [payload for _, payload in frames])
+
+    def test_max_segments_removes_oldest(self):
+        self.record([(SERIAL_TO_UDP, b'x' * 100)] * 50, segment_bytes=1024, max_segments=2)
+        segments = list_segments(self.path)
+        self.assertEqual(len(segments), 2)
+        self.assertEqual(len([name for name in os.listdir(self.path) if name.endswith(INDEX_SUFFIX)]), 2)
+
+    def test_seek_by_index(self):
+        # An index entry for every record, so a seek starts exactly at the record it needs
+        records = self.record([(SERIAL_TO_UDP, bytes([index])) for index in range(20)], index_interval=0)
+        segment = list_segments(self.path)[0]
+        times, offsets = load_index(segment)
+        self.assertEqual(times, [timestamp for timestamp, _, _ in records])
+        self.assertEqual(offsets, sorted(offsets))
+        start = records[10][0]
+        sliced = [bytes(payload) for _, _, payload in read_segment(segment, start, records[15][0])]
+        self.assertEqual(sliced, [bytes([index]) for index in range(10, 15)])
+
+    def test_slice_of_capture(self):
+        records = self.record([(SERIAL_TO_UDP, bytes([index]) * 100) for index in range(50)], segment_bytes=1024)
+        start, end = records[20][0] / 1e9, records[40][0] / 1e9
+        sliced = [bytes(payload) for _, _, payload in read_capture(self.path, start, end)]
+        # Bounds are seconds as floats, so compare against the same ns values read_capture works with
+        self.assertEqual(sliced, [payload for timestamp, _, payload in records
+                                  if int(start * 1e9) <= timestamp < int(end * 1e9)])
+        self.assertTrue(sliced)
+
+    def test_truncated_tail_is_ignored(self):
+        self.record([(SERIAL_TO_UDP, b'complete'), (SERIAL_TO_UDP, b'cut off')])
+        segment = list_segments(self.path)[0]
+        with open(segment, 'r+b') as file:
+            file.truncate(os.path.getsize(segment) - 3)
+        with open(segment[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'ab') as index:
+            index.write(b'\x00' * (INDEX_ENTRY.size // 2))
+        self.assertEqual([bytes(payload) for _, _, payload in read_capture(self.path)], [b'complete'])
+        self.assertEqual(len(load_index(segment)[0]), 1)
+
+    def test_foreign_file_is_not_a_segment(self):
+        path = os.path.join(self.path, 'notes' + SEGMENT_SUFFIX)
+        with open(path, 'wb') as file:
+            file.write(b'not a capture segment at all')
+        with self.assertRaises(ValueError):
+            segment_start(path)
+        self.assertEqual(list(read_capture(self.path)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
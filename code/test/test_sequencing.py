@@ -0,0 +1,125 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from conftest import ListBatcher  # noqa: E402
+from framing import MAX_DATAGRAM_SIZE, create_framer  # noqa: E402
+from sequencing import (SEQUENCE_MASK, SequenceBatcher, SequenceReceiver, sequence_distance,  # noqa: E402
+                        sequence_overhead)
+
+PEER = ('192.0.2.1', 5000)
+
+
+def sender(start=0):
+    """SequenceBatcher numbering from start, and the list its datagrams end up in."""
+    batcher = ListBatcher()
+    sequenced = SequenceBatcher(batcher)
+    sequenced.sequence = start
+    return sequenced, batcher.sent
+
+
+def deliver(receiver, datagrams, order=None):
+    delivered = []
+    for index in order if order is not None else range(len(datagrams)):
+        delivered.extend(receiver.receive(datagrams[index], PEER))
+    return delivered
+
+
+class SequenceDistanceTest(unittest.TestCase):
+
+    def test_wraps_around(self):
+        self.assertEqual(sequence_distance(0, SEQUENCE_MASK), 1)
+        self.assertEqual(sequence_distance(SEQUENCE_MASK, 0), -1)
+        self.assertEqual(sequence_distance(10, 4), 6)
+
+
+class SequenceOverheadTest(unittest.TestCase):
+
+    def test_largest_frame_fits_a_datagram(self):
+        connection = {'sequence': True}
+        framer = create_framer(connection, MAX_DATAGRAM_SIZE - sequence_overhead(connection))
+        sequenced, sent = sender()
+        for frame in framer.feed(b'x' * 100000):
+            sequenced.send(frame)
+        self.assertEqual(max(len(datagram) for datagram in sent), MAX_DATAGRAM_SIZE)
+        self.assertEqual(sequence_overhead({}), 0)
+
+
+class SequenceReceiverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sequenced, self.sent = sender()
+        self.receiver = SequenceReceiver(window=8, max_hold=60.0)
+
+    def send(self, count):
+        payloads = [f"frame {index}".encode() for index in range(count)]
+        for payload in payloads:
+            self.sequenced.send(payload)
+        return payloads
+
+    def test_in_order(self):
+        payloads = self.send(5)
+        self.assertEqual(deliver(self.receiver, self.sent), payloads)
+        self.assertEqual(self.receiver.reordered, 0)
+
+    def test_restores_order(self):
+        payloads = self.send(4)
+        self.assertEqual(deliver(self.receiver, self.sent, [0, 2, 3, 1]), payloads)
+        self.assertEqual(self.receiver.reordered, 2)
+        self.assertEqual(self.receiver.lost, 0)
+
+    def test_drops_duplicates(self):
+        payloads = self.send(3)
+        self.assertEqual(deliver(self.receiver, self.sent, [0, 1, 1, 0, 2]), payloads)
+        self.assertEqual(self.receiver.duplicates, 2)
+
+    def test_full_window_skips_the_gap(self):
+        payloads = self.send(11)
+        delivered = deliver(self.receiver, self.sent, [0] + list(range(2, 11)))
+        self.assertEqual(delivered, payloads[:1] + payloads[2:])
+        self.assertEqual(self.receiver.lost, 1)
+        # The datagram given up as lost is late, not a duplicate, and is not delivered twice
+        self.assertEqual(self.receiver.receive(self.sent[1], PEER), [])
+        self.assertEqual(self.receiver.late, 1)
+        self.assertEqual(self.receiver.duplicates, 0)
+
+    def test_expired_gap_is_released(self):
+        receiver = SequenceReceiver(window=8, max_hold=0.0)
+        payloads = self.send(3)
+        self.assertEqual(deliver(receiver, self.sent, [0, 2]), payloads[:1])
+        self.assertIsNotNone(receiver.timeout())
+        self.assertEqual(receiver.flush_expired(), payloads[2:])
+        self.assertIsNone(receiver.timeout())
+
+    def test_sender_restart_with_lower_sequence(self):
+        self.send(500)
+        deliver(self.receiver, self.sent)
+        restarted, sent = sender()
+        payloads = [f"after restart {index}".encode() for index in range(500)]
+        for payload in payloads:
+            restarted.send(payload)
+        self.assertEqual(deliver(self.receiver, sent), payloads)
+        self.assertEqual(self.receiver.resyncs, 1)
+
+    def test_far_jump_ahead_resyncs(self):
+        self.send(3)
+        deliver(self.receiver, self.sent)
+        jumped, sent = sender(1 << 20)
+        jumped.send(b'far ahead')
+        self.assertEqual(deliver(self.receiver, sent), [b'far ahead'])
+        self.assertEqual(self.receiver.resyncs, 1)
+
+    def test_numbering_wraps(self):
+        self.sequenced.sequence = SEQUENCE_MASK - 1
+        payloads = self.send(4)
+        self.assertEqual(deliver(self.receiver, self.sent), payloads)
+        self.assertEqual(self.receiver.resyncs, 0)
+
+    def test_rejects_datagrams_without_header(self):
+        self.assertEqual(self.receiver.receive(b'plain payload', PEER), [])
+        self.assertEqual(self.receiver.errors, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
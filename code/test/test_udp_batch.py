@@ -0,0 +1,33 @@
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from udp_batch import DatagramBatcher  # noqa: E402
+
+
+class DatagramBatcherErrorTest(unittest.TestCase):
+    """A socket that cannot send (here: never connected, so EDESTADDRREQ) drops datagrams instead of raising."""
+
+    def setUp(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(self.sock.close)
+
+    def test_send_one_counts_the_drop(self):
+        batcher = DatagramBatcher(self.sock)
+        batcher.send(b'payload')
+        batcher.send(b'payload')
+        self.assertEqual((batcher.dropped, batcher.datagrams), (2, 0))
+
+    def test_batch_counts_every_drop(self):
+        for use_sendmmsg in (True, False):
+            batcher = DatagramBatcher(self.sock, max_batch=8, use_sendmmsg=use_sendmmsg)
+            for index in range(5):
+                batcher.send(bytes([index]) * 10)
+            batcher.flush()
+            self.assertEqual((batcher.dropped, batcher.datagrams), (5, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,389 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import socket
+import threading
+import time
+
+from framing import MAX_DATAGRAM_SIZE
+
+logger = logging.getLogger()
+
+
+class IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(IOVec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', MsgHdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+def load_sendmmsg():
+    """Return libc's sendmmsg() or None where it is not available (non-Linux, old libc)."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+libc_sendmmsg = load_sendmmsg()
+
+
+class DatagramBatcher:
+    """Queues frames for one connected UDP socket and flushes them with a single sendmmsg() call.
+
+    A batch leaves when it reaches max_batch frames or max_bytes, or when its oldest frame has waited
+    max_delay seconds - callers fold timeout() into their select()/timer and call flush_expired().
+    With max_batch = 1 every frame is sent immediately, which is the classic one-send-per-datagram path.
+
+    Frames may be short-lived memoryviews (e.g. slices of a RingBuffer): send() either transmits them
+    at once or copies them into a preallocated staging buffer, so the caller can reuse the memory
+    as soon as send() returns.
+
+    When a ConnectionMetrics is given, every send syscall records the time since the oldest frame in
+    it arrived on the serial port (the `arrived_at` passed to send()) in metrics.latency.
+    """
+
+    def __init__(self, sock, max_batch=1, max_delay=0.002, max_bytes=65536, use_sendmmsg=True, metrics=None):
+        self.sock = sock
+        self.fd = sock.fileno()
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+        # (offset, size) of each queued frame inside the staging buffer
+        self.queue = []
+        self.queued_bytes = 0
+        self.first_queued_at = None
+        self.first_arrived_at = None
+        self.latency = metrics.latency if metrics is not None else None
+        self.sendmmsg = libc_sendmmsg if use_sendmmsg else None
+        if self.max_batch > 1:
+            # Holds a full batch plus one maximum-size datagram that may push it over max_bytes
+            self.staging = bytearray(max_bytes + MAX_DATAGRAM_SIZE)
+            self.staging_mv = memoryview(self.staging)
+        if self.max_batch > 1 and self.sendmmsg is not None:
+            # Holding the ctypes view keeps the bytearray pinned (it cannot be resized while exported)
+            self.staging_view = (ctypes.c_char * len(self.staging)).from_buffer(self.staging)
+            self.staging_address = ctypes.addressof(self.staging_view)
+            self.iovecs = (IOVec * self.max_batch)()
+            self.msgs = (MMsgHdr * self.max_batch)()
+            for i in range(self.max_batch):
+                self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovecs[i])
+                self.msgs[i].msg_hdr.msg_iovlen = 1
+        self.syscalls = 0
+        self.datagrams = 0
+        self.bytes = 0
+        self.dropped = 0
+
+    def send(self, frame, arrived_at=None):
+        if self.max_batch == 1:
+            self.send_one(frame, arrived_at)
+            return
+        if not self.queue:
+            self.first_queued_at = time.monotonic()
+            self.first_arrived_at = arrived_at
+        offset = self.queued_bytes
+        size = len(frame)
+        self.staging_mv[offset:offset + size] = frame
+        self.queue.append((offset, size))
+        self.queued_bytes += size
+        if len(self.queue) >= self.max_batch or self.queued_bytes >= self.max_bytes:
+            self.flush()
+
+    def timeout(self):
+        """Seconds until the queued batch is due, or None when nothing is queued."""
+        if not self.queue:
+            return None
+        return max(0.0, self.first_queued_at + self.max_delay - time.monotonic())
+
+    def flush_expired(self):
+        if self.queue and time.monotonic() - self.first_queued_at >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        frames = self.queue
+        if not frames:
+            return
+        arrived_at = self.first_arrived_at
+        self.queue = []
+        self.queued_bytes = 0
+        self.first_queued_at = None
+        self.first_arrived_at = None
+        if self.sendmmsg is None:
+            for offset, size in frames:
+                self.send_one(self.staging_mv[offset:offset + size], arrived_at)
+            return
+        sent = 0
+        refusals = 0
+        while sent < len(frames):
+            try:
+                sent += self.send_batch(frames, sent, arrived_at)
+            except ConnectionRefusedError:
+                # ICMP port unreachable from an earlier datagram surfaces on the next send; the peer
+                # is simply not listening yet. Retry once, then give the batch up.
+                refusals += 1
+                if refusals > 1:
+                    self.dropped += len(frames) - sent
+                    return
+            except BlockingIOError:
+                self.dropped += len(frames) - sent
+                return
+            except OSError as e:
+                # sendmmsg() stops at the first datagram it cannot send (EMSGSIZE, ENETUNREACH, ...);
+                # drop that one and go on with the rest, the serial side must not see a UDP error
+                logger.error(f"Error in send_batch: {e}")
+                self.dropped += 1
+                sent += 1
+
+    def send_batch(self, frames, start, arrived_at=None):
+        count = len(frames) - start
+        iovecs = self.iovecs
+        base = self.staging_address
+        total = 0
+        for i in range(count):
+            offset, size = frames[start + i]
+            iovec = iovecs[i]
+            iovec.iov_base = base + offset
+            iovec.iov_len = size
+            total += size
+        self.syscalls += 1
+        result = self.sendmmsg(self.fd, self.msgs, count, 0)
+        if result < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                return 0
+            raise OSError(err, os.strerror(err))
+        self.datagrams += result
+        if result < count:
+            total = sum(size for _, size in frames[start:start + result])
+        self.bytes += total
+        if arrived_at is not None and self.latency is not None:
+            self.latency.observe(time.monotonic() - arrived_at)
+        return result
+
+    def send_one(self, frame, arrived_at=None):
+        self.syscalls += 1
+        try:
+            self.sock.send(frame)
+        except (ConnectionRefusedError, BlockingIOError):
+            self.dropped += 1
+            return
+        except OSError as e:
+            logger.error(f"Error in send_one: {e}")
+            self.dropped += 1
+            return
+        self.datagrams += 1
+        self.bytes += len(frame)
+        if arrived_at is not None and self.latency is not None:
+            self.latency.observe(time.monotonic() - arrived_at)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.sock.close()
+
+
+class FanOutBatcher:
+    """Sends every frame to several destinations through one DatagramBatcher (and connected socket) each.
+
+    Serial data is read and framed once; only the send is repeated per destination. Exposes the same
+    interface and counters as a single DatagramBatcher, summed over the destinations (including those
+    removed since). retarget() changes the destinations while frames are flowing: it may be called
+    from another thread, and the thread that sends applies the change before its next frame.
+    """
+
+    def __init__(self, batchers, destinations=()):
+        self.batchers = batchers
+        self.destinations = list(destinations)
+        self.lock = threading.Lock()
+        # destination -> batcher to send to from the next frame on, or None when nothing changed
+        self.pending = None
+        # Counters of the batchers removed by retarget()
+        self.retired = {'syscalls': 0, 'datagrams': 0, 'bytes': 0, 'dropped': 0}
+
+    def retarget(self, destinations, open_batcher):
+        """Send to `destinations` from the next frame on; open_batcher(destination) builds the batcher of a new one."""
+        with self.lock:
+            current = self.pending if self.pending is not None else dict(zip(self.destinations, self.batchers))
+            batchers = {}
+            try:
+                for destination in destinations:
+                    batcher = current.get(destination)
+                    batchers[destination] = open_batcher(destination) if batcher is None else batcher
+            except Exception:
+                for destination, batcher in batchers.items():
+                    if batcher is not current.get(destination):
+                        batcher.close()
+                raise
+            # Batchers queued by an earlier retarget that never took effect have nothing to flush
+            if self.pending is not None:
+                for destination, batcher in self.pending.items():
+                    if batchers.get(destination) is not batcher and batcher not in self.batchers:
+                        batcher.close()
+            self.pending = batchers
+
+    def apply_pending(self):
+        """Switch to the destinations of the last retarget(). Only the sending thread calls this."""
+        with self.lock:
+            batchers, self.pending = self.pending, None
+        if batchers is None:
+            return
+        for destination, batcher in zip(self.destinations, self.batchers):
+            if batchers.get(destination) is not batcher:
+                try:
+                    batcher.close()
+                finally:
+                    for counter in self.retired:
+                        self.retired[counter] += getattr(batcher, counter)
+        self.destinations = list(batchers)
+        self.batchers = list(batchers.values())
+
+    def send(self, frame, arrived_at=None):
+        if self.pending is not None:
+            self.apply_pending()
+        for batcher in self.batchers:
+            batcher.send(frame, arrived_at)
+
+    def timeout(self):
+        pending = [timeout for timeout in (batcher.timeout() for batcher in self.batchers) if timeout is not None]
+        return min(pending) if pending else None
+
+    def flush_expired(self):
+        if self.pending is not None:
+            self.apply_pending()
+        for batcher in self.batchers:
+            batcher.flush_expired()
+
+    def flush(self):
+        for batcher in self.batchers:
+            batcher.flush()
+
+    def close(self):
+        errors = []
+        with self.lock:
+            pending, self.pending = self.pending or {}, None
+        for batcher in self.batchers + [batcher for batcher in pending.values() if batcher not in self.batchers]:
+            try:
+                batcher.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    @property
+    def syscalls(self):
+        return self.retired['syscalls'] + sum(batcher.syscalls for batcher in self.batchers)
+
+    @property
+    def datagrams(self):
+        return self.retired['datagrams'] + sum(batcher.datagrams for batcher in self.batchers)
+
+    @property
+    def bytes(self):
+        return self.retired['bytes'] + sum(batcher.bytes for batcher in self.batchers)
+
+    @property
+    def dropped(self):
+        return self.retired['dropped'] + sum(batcher.dropped for batcher in self.batchers)
+
+
+def fan_out_of(batcher):
+    """The FanOutBatcher at the bottom of a chain of BatcherWrapper stages."""
+    while isinstance(batcher, BatcherWrapper):
+        batcher = batcher.batcher
+    return batcher
+
+
+class BatcherWrapper:
+    """Base for egress stages that transform datagrams before handing them to a batcher.
+
+    Forwards the batcher interface and counters to the wrapped batcher; subclasses override send()
+    and, if they hold data themselves, timeout()/flush_expired()/flush()/close().
+    """
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    def send(self, frame, arrived_at=None):
+        self.batcher.send(frame, arrived_at)
+
+    def timeout(self):
+        return self.batcher.timeout()
+
+    def flush_expired(self):
+        self.batcher.flush_expired()
+
+    def flush(self):
+        self.batcher.flush()
+
+    def close(self):
+        self.batcher.close()
+
+    @property
+    def syscalls(self):
+        return self.batcher.syscalls
+
+    @property
+    def datagrams(self):
+        return self.batcher.datagrams
+
+    @property
+    def bytes(self):
+        return self.batcher.bytes
+
+    @property
+    def dropped(self):
+        return self.batcher.dropped
+
+
+class DatagramReceiver:
+    """Drains every datagram waiting on a UDP socket into one preallocated buffer.
+
+    recvmsg_into() reports MSG_TRUNC when a datagram was larger than the buffer, so truncation is
+    counted instead of passing silently. The memoryview handed to the handler is only valid until
+    the next datagram is received.
+    """
+
+    def __init__(self, sock, max_datagram_size=MAX_DATAGRAM_SIZE, max_batch=64):
+        self.sock = sock
+        self.max_batch = max_batch
+        self.buffer = bytearray(max_datagram_size)
+        self.view = memoryview(self.buffer)
+        self.datagrams = 0
+        self.bytes = 0
+        self.truncated = 0
+        self.wakeups = 0
+
+    def drain(self, handler):
+        """Receive up to max_batch ready datagrams and pass each to handler(data, addr)."""
+        self.wakeups += 1
+        for _ in range(self.max_batch):
+            try:
+                nbytes, _, flags, addr = self.sock.recvmsg_into([self.buffer])
+            except (BlockingIOError, InterruptedError):
+                return
+            self.datagrams += 1
+            self.bytes += nbytes
+            if flags & socket.MSG_TRUNC:
+                self.truncated += 1
+            if nbytes:
+                handler(self.view[:nbytes], addr)
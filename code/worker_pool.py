@@ -0,0 +1,281 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+
+from config_reload import diff_connections
+from control_api import CommandQueue
+from metrics import registry
+
+logger = logging.getLogger()
+
+
+def parse_workers(value):
+    """'auto' -> one worker per core, otherwise an integer (0 and 1 both mean single-process)."""
+    if str(value).strip().lower() == 'auto':
+        return os.cpu_count() or 1
+    return int(value)
+
+
+def group_connections(connections, workers):
+    """Split connections into at most `workers` groups.
+
+    Connections that share a `group` value always land in the same worker; the rest are spread so
+    every worker ends up with a similar number of connections.
+    """
+    buckets = [[] for _ in range(max(1, workers))]
+    pinned = {}
+    unpinned = []
+    for connection in connections:
+        if connection.get('group'):
+            pinned.setdefault(connection['group'], []).append(connection)
+        else:
+            unpinned.append(connection)
+    for members in sorted(pinned.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(members)
+    for connection in unpinned:
+        min(buckets, key=len).append(connection)
+    return [bucket for bucket in buckets if bucket]
+
+
+class Worker:
+    """One worker process and its restart bookkeeping."""
+
+    def __init__(self, index, connections, control_queue):
+        self.index = index
+        self.connections = connections
+        self.names = [connection['name'] for connection in connections]
+        # Carries the worker's new connection list after a config reload
+        self.control_queue = control_queue
+        self.process = None
+        self.restarts = 0
+        self.restart_delay = 0.0
+        self.next_restart = None
+
+
+class WorkerPool:
+    """Runs groups of connections in separate processes so they do not share one GIL.
+
+    The parent opens no ports: it starts one process per group, restarts a process that dies (with
+    the same exponential backoff the supervisor uses for connections), forwards signals and folds the
+    metrics each worker sends over stats_queue into the parent's registry. `target` is called in the
+    child as target(index, connections, stats_queue, control_queue) and must be picklable (workers are
+    spawned, not forked, so each one starts with fresh logging and no inherited threads). On a config
+    reload each worker is sent its new share of the connections over control_queue and restarts only
+    the ones that changed.
+    """
+
+    def __init__(self, target, groups, max_restart_delay=60.0, max_workers=None):
+        self.target = target
+        self.context = multiprocessing.get_context('spawn')
+        self.stats_queue = self.context.Queue()
+        self.workers = [Worker(index, group, self.context.Queue()) for index, group in enumerate(groups)]
+        self.next_index = len(self.workers)
+        self.max_workers = max_workers or len(self.workers)
+        self.max_restart_delay = max_restart_delay
+        self.exit_code = 0
+        self.stopping = False
+        self.reload_requested = False
+        # Self-pipe so a signal handler can wake the supervisor out of connection.wait()
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        # Control API commands, run on the supervisor thread
+        self.commands = CommandQueue(lambda: os.write(self.wakeup_w, b'\0'))
+        self.stats_thread = threading.Thread(target=self.collect_stats, name="worker-stats", daemon=True)
+
+    @property
+    def connections(self):
+        """Every connection currently assigned to a worker."""
+        return [connection for worker in self.workers for connection in worker.connections]
+
+    def start_worker(self, worker):
+        worker.process = self.context.Process(target=self.target,
+                                              args=(worker.index, worker.connections, self.stats_queue,
+                                                    worker.control_queue),
+                                              name=f"bridge-worker-{worker.index}")
+        worker.process.start()
+        worker.next_restart = None
+        logger.info(f"Worker {worker.index} (pid {worker.process.pid}) started for {', '.join(worker.names)}")
+
+    def start_bridge(self):
+        self.stats_thread.start()
+        for worker in self.workers:
+            self.start_worker(worker)
+
+    def collect_stats(self):
+        while True:
+            item = self.stats_queue.get()
+            if item is None:
+                return
+            _, exported = item
+            for metrics in exported:
+                registry.update(metrics)
+
+    def request_stop(self, exit_code=0):
+        """Ask the supervisor to stop every worker. Safe to call from a signal handler."""
+        self.exit_code = exit_code
+        self.stopping = True
+        os.write(self.wakeup_w, b'\0')
+
+    def request_reload(self):
+        """Ask the supervisor to re-read the config. Safe to call from a signal handler."""
+        self.reload_requested = True
+        os.write(self.wakeup_w, b'\0')
+
+    def send_signal(self, sig):
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                os.kill(worker.process.pid, sig)
+
+    def supervise(self, health_interval=60.0, reloader=None):
+        """Block until asked to stop, restarting workers that exit. Returns the exit code."""
+        next_health = time.monotonic() + health_interval
+        while not self.stopping:
+            timeout = next_health - time.monotonic()
+            pending = [worker.next_restart for worker in self.workers if worker.next_restart is not None]
+            if reloader is not None and reloader.timeout() is not None:
+                pending.append(time.monotonic() + reloader.timeout())
+            if pending:
+                timeout = min(timeout, min(pending) - time.monotonic())
+            sentinels = [worker.process.sentinel for worker in self.workers
+                         if worker.process is not None and worker.next_restart is None]
+            ready = multiprocessing.connection.wait(sentinels + [self.wakeup_r], timeout=max(timeout, 0))
+            if self.wakeup_r in ready:
+                os.read(self.wakeup_r, 64)
+            if self.stopping:
+                break
+            self.commands.run_pending()
+            if reloader is not None and (self.reload_requested or reloader.due()):
+                self.reload_requested = False
+                try:
+                    self.reload(reloader.load())
+                except Exception as e:
+                    logger.error(f"Error in reload, keeping the running connections: {e}")
+            self.restart_dead_workers()
+            if time.monotonic() >= next_health:
+                self.report_health()
+                next_health = time.monotonic() + health_interval
+        self.stop_bridge()
+        return self.exit_code
+
+    def reload(self, connections):
+        """Hand every worker its share of the new connection list.
+
+        Connections stay on the worker that already runs them, so a reload never moves a healthy
+        connection between processes. New connections join their `group` if it already has a worker,
+        otherwise a new worker (up to max_workers) or the least loaded one. Workers left with nothing
+        are stopped.
+        """
+        added, removed, changed, retargeted = diff_connections(self.connections, connections)
+        if not (added or removed or changed or retargeted):
+            logger.info("Config reloaded, no connection changes")
+            return
+        logger.info(f"Config reloaded: {len(added)} added, {len(removed)} removed, {len(changed)} changed, "
+                    f"{len(retargeted)} retargeted")
+        by_name = {connection['name']: connection for connection in connections}
+        assignments = {worker.index: [by_name[connection['name']] for connection in worker.connections
+                                      if connection['name'] in by_name]
+                       for worker in self.workers}
+        new_workers = []
+        for connection in added:
+            worker = self.place(connection, assignments)
+            if worker is None:
+                worker = Worker(self.next_index, [], self.context.Queue())
+                self.next_index += 1
+                new_workers.append(worker)
+                self.workers.append(worker)
+                assignments[worker.index] = []
+            assignments[worker.index].append(connection)
+
+        for name in removed:
+            registry.remove(name)
+        for worker in list(self.workers):
+            assigned = assignments[worker.index]
+            if worker in new_workers:
+                worker.connections = assigned
+                worker.names = [connection['name'] for connection in assigned]
+                self.start_worker(worker)
+            elif not assigned:
+                logger.info(f"Worker {worker.index} has no connections left, stopping it")
+                self.workers.remove(worker)
+                self.stop_worker(worker)
+            elif assigned != worker.connections:
+                worker.connections = assigned
+                worker.names = [connection['name'] for connection in assigned]
+                # A worker that is waiting to be restarted picks the new list up when it starts
+                worker.control_queue.put(assigned)
+
+    def place(self, connection, assignments):
+        """Existing worker for a new connection, or None when a new worker should be started."""
+        group = connection.get('group')
+        if group:
+            for worker in self.workers:
+                if any(member.get('group') == group for member in assignments[worker.index]):
+                    return worker
+        if len(self.workers) < self.max_workers or not self.workers:
+            return None
+        return min(self.workers, key=lambda worker: len(assignments[worker.index]))
+
+    def stop_worker(self, worker, timeout=10.0):
+        if worker.process is None:
+            return
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(timeout)
+        if worker.process.is_alive():
+            logger.error(f"Worker {worker.index} did not stop, killing it")
+            worker.process.kill()
+            worker.process.join()
+
+    def restart_dead_workers(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.next_restart is None:
+                if worker.process.is_alive():
+                    continue
+                worker.restart_delay = min(max(worker.restart_delay * 2, 1.0), self.max_restart_delay)
+                worker.next_restart = now + worker.restart_delay
+                logger.error(f"Worker {worker.index} exited with code {worker.process.exitcode}, "
+                             f"restarting in {worker.restart_delay:.0f}s")
+                worker.process.join()
+            elif now >= worker.next_restart:
+                worker.restarts += 1
+                self.start_worker(worker)
+
+    def connection_status(self):
+        """Per-connection state for the control API; a connection is as alive as its worker process."""
+        status = {}
+        for worker in self.workers:
+            alive = worker.process is not None and worker.process.is_alive()
+            for name in worker.names:
+                status[name] = {'running': alive, 'worker': worker.index,
+                                'pid': worker.process.pid if alive else None, 'restarts': worker.restarts}
+        return status
+
+    def report_health(self):
+        for worker in self.workers:
+            alive = worker.process is not None and worker.process.is_alive()
+            pid = worker.process.pid if alive else '-'
+            logger.info(f"Health worker {worker.index} (pid {pid}): {'running' if alive else 'down'}, "
+                        f"{worker.restarts} restarts, connections {', '.join(worker.names)}")
+
+    def stop_bridge(self, timeout=10.0):
+        """SIGTERM every worker, wait for them to close their ports, then kill any that hang."""
+        self.stopping = True
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.error(f"Worker {worker.index} did not stop, killing it")
+                worker.process.kill()
+                worker.process.join()
+        if self.stats_thread.is_alive():
+            self.stats_queue.put(None)
+            self.stats_thread.join()
+        logger.info("All workers stopped.")
@@ -38,6 +38,22 @@ mkdir -p ../builds
 
 # Copy application files
 cp ../code/app_cli.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/framing.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/udp_batch.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/serial_writer.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/ring_buffer.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/log_pipeline.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/metrics.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/worker_pool.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/envelope.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/sequencing.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/config_reload.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/serial_link.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/device_registry.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/control_api.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/control_protocol.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/recorder.py Serial_Bridge_RPI/usr/local/my_app/
+cp ../code/replay.py Serial_Bridge_RPI/usr/local/my_app/
 cp ../code/packet_listener.py Serial_Bridge_RPI/usr/local/my_app/
 cp ../configs/config_cli.ini Serial_Bridge_RPI/usr/local/my_app/
 
@@ -62,13 +78,15 @@ set -e
 echo "Reloading systemd manager configuration..."
 systemctl daemon-reload
 
-echo "Enabling packet_listener service to start on boot..."
+echo "Enabling serial_udp_bridge and packet_listener services to start on boot..."
+systemctl enable serial_udp_bridge
 systemctl enable packet_listener
 
-echo "Starting packet_listener service..."
+echo "Starting serial_udp_bridge and packet_listener services..."
+systemctl start serial_udp_bridge
 systemctl start packet_listener
 
-echo "packet_listener service has been enabled and started."
+echo "serial_udp_bridge and packet_listener services have been enabled and started."
 
 echo "changing permissions in /usr/local/my_app/ directory"
 chmod +x /usr/local/my_app/*
@@ -81,7 +99,8 @@ chmod 755 Serial_Bridge_RPI/DEBIAN/postinst
 cat <<EOL > Serial_Bridge_RPI/etc/systemd/system/packet_listener.service
 [Unit]
 Description=Packet Listener Service
-After=network.target
+After=network.target serial_udp_bridge.service
+Wants=serial_udp_bridge.service
 
 [Service]
 WorkingDirectory=/usr/local/my_app
@@ -94,6 +113,23 @@ Group=nogroup
 WantedBy=multi-user.target
 EOL
 
+# The bridge runs as a resident daemon; packet_listener (group nogroup) drives it over the control socket
+cat <<EOL > Serial_Bridge_RPI/etc/systemd/system/serial_udp_bridge.service
+[Unit]
+Description=Serial UDP Bridge Daemon
+After=network.target
+
+[Service]
+WorkingDirectory=/usr/local/my_app
+ExecStart=/usr/bin/python3 /usr/local/my_app/app_cli.py --config config_cli.ini daemon
+Restart=always
+Group=nogroup
+RuntimeDirectory=serial_udp_bridge
+
+[Install]
+WantedBy=multi-user.target
+EOL
+
 # Create a Dockerfile for building the .deb package
 cat <<EOL > Dockerfile
 FROM --platform=linux/arm/v7  debian:bullseye-20220328-slim